@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+김치 프리미엄 계산 벤치마크
+심볼 N개 × 거래소 4곳의 전체 쌍 프리미엄을 심볼별 파이썬 루프, NumPy 전체 계산,
+틱이 들어온 심볼만 다시 계산하는 증분 계산으로 비교한다
+
+    python bench_premium.py [--symbols 250] [--dirty 10] [--rounds 200]
+"""
+
+import argparse
+import random
+import time
+
+from crypto.engine import EXCHANGES, QUOTES, MarketEngine
+from crypto.premium import PremiumCalculator
+
+RATE = 1_350.0
+
+
+def build_engine(symbols: int) -> MarketEngine:
+    engine = MarketEngine()
+    for i in range(symbols):
+        krw = random.uniform(10, 100_000_000)
+        for exchange in EXCHANGES:
+            price = krw if QUOTES[exchange] == "KRW" else krw / RATE
+            engine.update(exchange, f"S{i:04d}", (price * random.uniform(0.97, 1.03),) + (None,) * 5)
+    return engine
+
+
+def python_loop(engine: MarketEngine):
+    """심볼마다 거래소 쌍을 파이썬으로 도는 방식 (비교 기준)"""
+    prices = engine.columns["price"]
+    fx = [RATE if QUOTES[exchange] == "USDT" else 1.0 for exchange in engine.exchanges]
+    result = {}
+    for i, symbol in enumerate(engine.symbols):
+        krw = [prices[e, i] * fx[e] for e in range(len(engine.exchanges))]
+        result[symbol] = [
+            [(krw[b] / krw[c] - 1) * 100 for c in range(len(krw))] for b in range(len(krw))
+        ]
+    return result
+
+
+def measure(fn, rounds: int) -> float:
+    """호출당 밀리초"""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="김치 프리미엄 계산 벤치마크")
+    parser.add_argument("--symbols", type=int, default=250)
+    parser.add_argument("--dirty", type=int, default=10, help="갱신 사이에 틱이 들어오는 심볼 수")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = build_engine(args.symbols)
+    calculator = PremiumCalculator(engine, rate=RATE)
+    pairs = len(EXCHANGES) * (len(EXCHANGES) - 1)
+    print(f"심볼: {args.symbols}, 거래소 쌍: {pairs}, 증분 심볼: {args.dirty}, 반복: {args.rounds}")
+
+    def full():
+        # 크기가 바뀐 것처럼 만들어 매번 전체 계산
+        calculator.krw_prices = calculator.krw_prices[:, :0]
+        calculator.version = 0
+        calculator.refresh()
+
+    symbols = engine.symbols
+
+    def incremental(rounds: int) -> float:
+        """틱 반영(engine.update)은 빼고 refresh 시간만 잰다"""
+        elapsed = 0.0
+        for _ in range(rounds):
+            for symbol in random.sample(symbols, args.dirty):
+                engine.update("binance", symbol, (random.uniform(0.01, 100_000),) + (None,) * 5)
+            started = time.perf_counter()
+            calculator.refresh()
+            elapsed += time.perf_counter() - started
+        return elapsed / rounds * 1000
+
+    loop_ms = measure(lambda: python_loop(engine), max(1, args.rounds // 10))
+    full_ms = measure(full, args.rounds)
+    calculator.refresh()
+    incremental_ms = incremental(args.rounds)
+
+    print(f"{'method':<24}{'ms/refresh':>12}{'vs loop':>10}")
+    rows = (
+        ("python loop", loop_ms),
+        ("numpy full", full_ms),
+        (f"numpy incremental({args.dirty})", incremental_ms),
+    )
+    for name, ms in rows:
+        print(f"{name:<24}{ms:>12.3f}{loop_ms / ms if ms > 0 else float('inf'):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
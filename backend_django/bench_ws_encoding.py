@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+WebSocket 프레임 인코딩 벤치마크
+
+1. 프레임 크기: 대표 프레임의 JSON / MessagePack 바이트 수 (압축 전)
+2. 서버 측정: ws_fastapi 서버를 실제로 띄우고 loadtest_ws.py로 같은 브로드캐스트 부하를
+   인코딩별로 (JSON, JSON + permessage-deflate, MessagePack) 걸어서 서버 CPU 시간과 소켓에 쓴 바이트를 비교
+
+    python bench_ws_encoding.py [--clients 1000] [--rate 20] [--duration 15]
+
+서버 CPU/바이트는 /proc에서 읽으므로 Linux에서 실행해야 한다.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from ws_fastapi import JSON_BACKEND, json_dumps, json_to_msgpack, msgpack
+
+
+def sample_frames():
+    """브로드캐스트에서 실제로 나가는 대표 프레임"""
+    now = datetime.now().isoformat()
+    chat = {
+        "type": "message",
+        "id": f"msg_{time.time()}_1234567890",
+        "user": "비트코인러버",
+        "message": "오늘 김프 3% 넘었네요 다들 조심하세요",
+        "timestamp": now,
+        "seq": 123456,
+    }
+    user_count = {"type": "user_count", "count": 4821, "timestamp": now}
+    frames = {
+        "chat": json_dumps(chat),
+        "user_count": json_dumps(user_count),
+    }
+    # 마이크로 배치 모드의 배열 프레임 (채팅 20개)
+    frames["batch_20"] = "[" + ",".join([frames["chat"]] * 20) + "]"
+    return frames
+
+
+def frame_sizes():
+    print(f"JSON 백엔드: {JSON_BACKEND}")
+    if msgpack is None:
+        print("msgpack 미설치 - JSON만 측정")
+    print(f"{'frame':<12}{'json':>8}{'msgpack':>10}")
+    for name, frame in sample_frames().items():
+        packed = len(json_to_msgpack(frame)) if msgpack is not None else None
+        print(f"{name:<12}{len(frame.encode('utf-8')):>8}{packed if packed is not None else '-':>10}")
+
+
+# (이름, 인코딩, deflate 협상)
+MODES = [
+    ("json", "json", False),
+    ("json+deflate", "json", True),
+    ("msgpack", "msgpack", False),
+]
+
+
+def run_loadtest(args, encoding: str, deflate: bool) -> dict:
+    """loadtest_ws.py --spawn 으로 서버를 띄워 측정한 리포트"""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        output = f.name
+    command = [
+        sys.executable, "loadtest_ws.py", "--spawn", "--port", str(args.port),
+        "--clients", str(args.clients), "--rate", str(args.rate),
+        "--duration", str(args.duration), "--output", output, "--encoding", encoding,
+    ]
+    if not deflate:
+        command.append("--no-deflate")
+    # 채팅 팬아웃만 재도록 시세 피드와 DB 저장은 끔
+    env = dict(os.environ, WS_MARKET_FEED="false", WS_PERSIST_MESSAGES="false")
+    try:
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, env=env,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+        with open(output, encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.remove(output)
+
+
+def measure_on_server(args):
+    print(f"\n서버 측정: 클라이언트 {args.clients}, 초당 {args.rate}개, {args.duration}s")
+    print(f"{'mode':<14}{'delivered':>11}{'CPU s':>9}{'CPU ms/1k':>11}{'written KB':>12}{'B/frame':>9}{'p99 ms':>9}")
+    for name, encoding, deflate in MODES:
+        if encoding == "msgpack" and msgpack is None:
+            print(f"{name:<14}msgpack 미설치 - 건너뜀")
+            continue
+        report = run_loadtest(args, encoding, deflate)
+        server = report["server"] or {}
+        delivered = report["delivered"] or 1
+        written = server.get("written_bytes")
+        print(
+            f"{name:<14}{report['delivered']:>11}"
+            f"{server.get('cpu_seconds', 0):>9.2f}"
+            f"{server.get('cpu_seconds', 0) * 1000 / delivered * 1000:>11.2f}"
+            f"{written / 1024 if written is not None else 0:>12.1f}"
+            f"{written / delivered if written is not None else 0:>9.0f}"
+            f"{report['latency_ms']['p99'] or 0:>9.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket 프레임 인코딩 벤치마크")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=20, help="전체 초당 채팅 메시지 수")
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--sizes-only", action="store_true", help="서버 측정 없이 프레임 크기만")
+    args = parser.parse_args()
+
+    frame_sizes()
+    if not args.sizes_only:
+        measure_on_server(args)
+
+
+if __name__ == "__main__":
+    main()
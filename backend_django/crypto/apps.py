@@ -0,0 +1,31 @@
+import os
+import sys
+
+from django.apps import AppConfig
+
+# 시세 수집을 바로 시작하는 서버 (migrate/shell/test 같은 명령이나 ws_fastapi의 django.setup()은 제외)
+SERVER_PROGRAMS = {'gunicorn'}
+SERVER_COMMANDS = {'runserver'}
+
+
+def is_server_process() -> bool:
+    """Django 요청을 처리할 프로세스인지 - 자동 리로더의 감시 프로세스는 제외"""
+    program = os.path.basename(sys.argv[0]) if sys.argv else ''
+    if program in SERVER_PROGRAMS:
+        return True
+    if program != 'manage.py' or len(sys.argv) < 2 or sys.argv[1] not in SERVER_COMMANDS:
+        return False
+    # runserver는 자동 리로더가 자식 프로세스(RUN_MAIN=true)에서 실제 서버를 띄움
+    return '--noreload' in sys.argv or os.environ.get('RUN_MAIN') == 'true'
+
+
+class CryptoConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'crypto'
+
+    def ready(self):
+        # 첫 요청이 빈 시세를 받지 않도록 서버 프로세스가 뜰 때 바로 수집 시작
+        if is_server_process():
+            from .service import get_market_service
+
+            get_market_service()
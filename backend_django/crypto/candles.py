@@ -0,0 +1,160 @@
+"""
+틱 → 캔들(OHLCV) 집계
+엔진 틱을 받아 (거래소, 심볼)마다 1m/5m/15m/1h 봉을 만든다
+
+마감된 봉은 주기별로 (시리즈 수, CANDLE_CAPACITY) 크기의 NumPy 링 버퍼에 쌓는다.
+시리즈마다 최근 CANDLE_CAPACITY개만 남으므로 메모리는 시리즈 수에만 비례하고, 틱 하나는
+진행 중인 봉 갱신 또는 링 다음 칸에 기록이라 O(1)이다. 틱이 없던 구간은 봉을 만들지 않는다.
+
+거래량: 시세(ticker)에는 체결별 수량이 없어서 24시간 누적 거래대금이 늘어난 만큼을
+그 봉의 거래대금으로 본다 (24시간 창에서 빠져나가 줄어드는 경우는 0으로 처리).
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .engine import MarketEngine
+
+INTERVALS = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600}
+# 시리즈(거래소, 심볼, 주기)당 보관하는 마감된 봉 수 (+ 진행 중인 봉 하나)
+CANDLE_CAPACITY = int(os.getenv("CRYPTO_CANDLE_CAPACITY", "500"))
+# 봉을 만들 거래소 (쉼표 구분) - 시리즈 수가 곧 메모리라 기본은 Upbit만
+CANDLE_EXCHANGES = os.getenv("CRYPTO_CANDLE_EXCHANGES", "upbit")
+OHLCV = ("open", "high", "low", "close", "volume")
+INITIAL_SERIES = 256
+
+
+class CandleRing:
+    """주기 하나의 링 버퍼 - 행은 시리즈, 열은 마감된 봉 (head가 가장 최근 봉)
+
+    진행 중인 봉은 파이썬 리스트로 들고 있다가 다음 구간 틱이 오면 링에 기록한다
+    (틱마다 NumPy 스칼라 인덱싱을 하지 않도록).
+    """
+
+    def __init__(self, seconds: int, capacity: int = CANDLE_CAPACITY, series: int = INITIAL_SERIES):
+        self.seconds = seconds
+        self.capacity = capacity
+        self.rows = series
+        self.start = np.zeros((series, capacity), dtype=np.int64)
+        self.values = {field: np.zeros((series, capacity)) for field in OHLCV}
+        self.head = np.full(series, -1, dtype=np.int64)
+        self.count = np.zeros(series, dtype=np.int64)
+        # 시리즈별 진행 중인 봉 [시작, open, high, low, close, volume]
+        self.current: List[Optional[list]] = [None] * series
+
+    def grow(self, series: int):
+        while self.rows < series:
+            self.rows *= 2
+        for name in ("start", "head", "count"):
+            column = getattr(self, name)
+            fill = -1 if name == "head" else 0
+            grown = np.full((self.rows,) + column.shape[1:], fill, dtype=column.dtype)
+            grown[:column.shape[0]] = column
+            setattr(self, name, grown)
+        for field, column in self.values.items():
+            grown = np.zeros((self.rows, self.capacity))
+            grown[:column.shape[0]] = column
+            self.values[field] = grown
+        self.current.extend([None] * (self.rows - len(self.current)))
+
+    def add(self, row: int, price: float, volume: float, timestamp: float):
+        """틱 반영 (timestamp는 초) - 현재 봉보다 이전 구간의 늦은 틱은 버림"""
+        bucket = int(timestamp) // self.seconds * self.seconds
+        bar = self.current[row]
+        if bar is not None:
+            if bucket == bar[0]:
+                if price > bar[2]:
+                    bar[2] = price
+                if price < bar[3]:
+                    bar[3] = price
+                bar[4] = price
+                bar[5] += volume
+                return
+            if bucket < bar[0]:
+                return
+            self._commit(row, bar)
+        self.current[row] = [bucket, price, price, price, price, volume]
+
+    def _commit(self, row: int, bar: list):
+        """마감된 봉을 링의 다음 칸에 기록 (가장 오래된 봉을 덮어씀)"""
+        head = (int(self.head[row]) + 1) % self.capacity
+        self.head[row] = head
+        if self.count[row] < self.capacity:
+            self.count[row] += 1
+        self.start[row, head] = bar[0]
+        for field, value in zip(OHLCV, bar[1:]):
+            self.values[field][row, head] = value
+
+    def read(self, row: int, limit: int) -> List[list]:
+        """오래된 것부터 최근 limit개 [시작, open, high, low, close, volume] (진행 중인 봉 포함)"""
+        current = self.current[row]
+        count = min(int(self.count[row]), limit - (current is not None))
+        positions = (int(self.head[row]) - np.arange(count - 1, -1, -1)) % self.capacity
+        columns = [self.start[row, positions].tolist()]
+        columns += [self.values[field][row, positions].tolist() for field in OHLCV]
+        bars = [list(bar) for bar in zip(*columns)]
+        if current is not None and limit > 0:
+            bars.append(list(current))
+        return bars
+
+
+class CandleAggregator:
+    """엔진 리스너 - 시세가 바뀔 때마다 모든 주기의 봉을 갱신"""
+
+    def __init__(self, engine: MarketEngine, exchanges: str = CANDLE_EXCHANGES,
+                 capacity: int = CANDLE_CAPACITY):
+        self.engine = engine
+        self.capacity = capacity
+        selected = {name.strip() for name in exchanges.split(",")}
+        self.exchanges = {e for e, name in enumerate(engine.exchanges) if name in selected}
+        self.rings = {name: CandleRing(seconds, capacity) for name, seconds in INTERVALS.items()}
+        # (거래소 인덱스, 심볼 인덱스) → 시리즈 행
+        self.series: Dict[Tuple[int, int], int] = {}
+        self._last_volume: List[float] = []
+        self._lock = threading.Lock()
+        engine.add_listener(self.on_tick)
+
+    def on_tick(self, e: int, i: int):
+        if e not in self.exchanges:
+            return
+        engine = self.engine
+        price = float(engine.columns["price"][e, i])
+        if price != price:
+            return
+        volume = float(engine.columns["volume"][e, i])
+        timestamp = float(engine.updated_at[e, i]) / 1000 or time.time()
+        with self._lock:
+            row = self.series.get((e, i))
+            if row is None:
+                row = self.series[(e, i)] = len(self.series)
+                self._last_volume.append(volume)
+                for ring in self.rings.values():
+                    if row >= ring.rows:
+                        ring.grow(row + 1)
+            # 24시간 누적 거래대금 증가분 = 이번 틱의 거래대금 (NaN이면 비교가 거짓이라 0)
+            traded = 0.0
+            if volume == volume:
+                previous = self._last_volume[row]
+                if volume > previous:
+                    traded = volume - previous
+                self._last_volume[row] = volume
+            for ring in self.rings.values():
+                ring.add(row, price, traded, timestamp)
+
+    def candles(self, exchange: str, symbol: str, interval: str, limit: int) -> Optional[List[dict]]:
+        """최근 limit개 봉 (오래된 것부터) - 시리즈가 없으면 None"""
+        e = self.engine.exchange_index[exchange]
+        i = self.engine.symbol_index.get(symbol)
+        with self._lock:
+            row = self.series.get((e, i))
+            if row is None:
+                return None
+            bars = self.rings[interval].read(row, limit)
+        return [
+            {"timestamp": bar[0] * 1000, **dict(zip(OHLCV, bar[1:]))}
+            for bar in bars
+        ]
@@ -0,0 +1,165 @@
+"""
+멀티 거래소 시세 엔진
+Upbit/빗썸/바이낸스/바이비트 시세를 심볼 인덱스 기반 컬럼 배열(NumPy) 하나로 정규화한다
+
+필드마다 (거래소 수, 심볼 수) 배열을 두고, 틱 하나는 해당 칸만 제자리에서 갱신한다 (O(1)).
+가격은 거래소 호가 통화 그대로 보관한다 (KRW 거래소는 원, USDT 거래소는 USDT).
+"""
+
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EXCHANGES = ("upbit", "bithumb", "binance", "bybit")
+QUOTES = {"upbit": "KRW", "bithumb": "KRW", "binance": "USDT", "bybit": "USDT"}
+FIELDS = ("price", "change", "change_percent", "volume", "high", "low")
+INITIAL_CAPACITY = 256
+
+# (거래소 인덱스, 심볼 인덱스) 변경 알림
+TickListener = Callable[[int, int], None]
+
+
+class MarketSnapshot:
+    """특정 버전의 엔진 상태 복사본 - 읽기 전용으로 공유한다"""
+
+    __slots__ = ("version", "exchanges", "symbols", "columns", "updated_at", "tick_version")
+
+    def __init__(self, version: int, exchanges: Tuple[str, ...], symbols: Tuple[str, ...],
+                 columns: Dict[str, np.ndarray], updated_at: np.ndarray, tick_version: np.ndarray):
+        self.version = version
+        self.exchanges = exchanges
+        self.symbols = symbols
+        self.columns = columns
+        self.updated_at = updated_at
+        self.tick_version = tick_version
+
+    def to_dict(self, exchanges: Optional[Sequence[str]] = None) -> dict:
+        """JSON 응답용 - 거래소별 컬럼 리스트 (값이 없으면 None)"""
+        selected = exchanges or self.exchanges
+        data = {}
+        for exchange in selected:
+            e = self.exchanges.index(exchange)
+            data[exchange] = {field: _to_list(self.columns[field][e]) for field in FIELDS}
+        return {
+            "version": self.version,
+            "symbols": list(self.symbols),
+            "quotes": {exchange: QUOTES.get(exchange) for exchange in selected},
+            "data": data,
+        }
+
+
+def _to_list(values: np.ndarray) -> List[Optional[float]]:
+    return [None if value != value else value for value in values.tolist()]
+
+
+class MarketEngine:
+    def __init__(self, exchanges: Sequence[str] = EXCHANGES, capacity: int = INITIAL_CAPACITY):
+        self.exchanges = tuple(exchanges)
+        self.exchange_index = {exchange: i for i, exchange in enumerate(self.exchanges)}
+        self.symbols: List[str] = []
+        self.symbol_index: Dict[str, int] = {}
+        self.capacity = capacity
+        shape = (len(self.exchanges), capacity)
+        self.columns: Dict[str, np.ndarray] = {field: np.full(shape, np.nan) for field in FIELDS}
+        self.updated_at = np.zeros(shape)
+        # 칸마다 마지막으로 바뀐 엔진 버전 - 증분 계산/델타 전송의 기준
+        self.tick_version = np.zeros(shape, dtype=np.int64)
+        self.version = 0
+        self.listeners: List[TickListener] = []
+        # 갱신은 수집 스레드, 읽기는 요청 스레드에서 일어나므로 복사할 때만 잠금
+        self.lock = threading.Lock()
+        self._last: Dict[Tuple[int, int], tuple] = {}
+        self._snapshot: Optional[MarketSnapshot] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.symbols)
+
+    def _grow(self):
+        self.capacity *= 2
+        for field, column in self.columns.items():
+            grown = np.full((len(self.exchanges), self.capacity), np.nan)
+            grown[:, :column.shape[1]] = column
+            self.columns[field] = grown
+        for name in ("updated_at", "tick_version"):
+            column = getattr(self, name)
+            grown = np.zeros((len(self.exchanges), self.capacity), dtype=column.dtype)
+            grown[:, :column.shape[1]] = column
+            setattr(self, name, grown)
+
+    def symbol_id(self, symbol: str) -> int:
+        """심볼 인덱스 (처음 보는 심볼이면 새 칸 할당)"""
+        index = self.symbol_index.get(symbol)
+        if index is None:
+            if len(self.symbols) >= self.capacity:
+                self._grow()
+            index = self.symbol_index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return index
+
+    def update(self, exchange: str, symbol: str, values: Sequence[Optional[float]],
+               timestamp: Optional[float] = None) -> bool:
+        """틱 하나 반영 (values는 FIELDS 순서) - 값이 그대로면 False"""
+        e = self.exchange_index.get(exchange)
+        if e is None:
+            return False
+        values = tuple(values)
+        with self.lock:
+            i = self.symbol_id(symbol)
+            if self._last.get((e, i)) == values:
+                return False
+            self._last[(e, i)] = values
+            for field, value in zip(FIELDS, values):
+                self.columns[field][e, i] = math.nan if value is None else value
+            self.version += 1
+            self.tick_version[e, i] = self.version
+            if timestamp is not None:
+                self.updated_at[e, i] = timestamp
+        for listener in self.listeners:
+            listener(e, i)
+        return True
+
+    def on_tick(self, exchange: str, symbol: str, values, timestamp=None):
+        """피드 콜백 (TickerFeed.on_tick 시그니처)"""
+        self.update(exchange, symbol, values, timestamp)
+
+    def add_listener(self, listener: TickListener):
+        self.listeners.append(listener)
+
+    def snapshot(self) -> MarketSnapshot:
+        """현재 버전의 복사본 - 버전이 그대로면 이전 스냅샷 재사용"""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self.version:
+            return snapshot
+        with self.lock:
+            n = len(self.symbols)
+            snapshot = MarketSnapshot(
+                self.version,
+                self.exchanges,
+                tuple(self.symbols),
+                {field: column[:, :n].copy() for field, column in self.columns.items()},
+                self.updated_at[:, :n].copy(),
+                self.tick_version[:, :n].copy(),
+            )
+        self._snapshot = snapshot
+        return snapshot
+
+    def symbol(self, symbol: str) -> Optional[dict]:
+        """심볼 하나의 거래소별 시세"""
+        i = self.symbol_index.get(symbol)
+        if i is None:
+            return None
+        with self.lock:
+            result = {}
+            for e, exchange in enumerate(self.exchanges):
+                if not self.tick_version[e, i]:
+                    continue
+                row = {field: float(self.columns[field][e, i]) for field in FIELDS}
+                result[exchange] = {
+                    key: None if value != value else value for key, value in row.items()
+                }
+                result[exchange]["quote"] = QUOTES.get(exchange)
+                result[exchange]["timestamp"] = float(self.updated_at[e, i]) or None
+        return {"symbol": symbol, "version": self.version, "exchanges": result}
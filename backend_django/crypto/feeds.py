@@ -0,0 +1,195 @@
+"""
+거래소 시세 웹소켓 피드 공통 처리
+연결/재연결/구독은 TickerFeed가 맡고, 거래소별 클래스는 구독 메시지와 프레임 파싱만 구현한다
+"""
+
+import asyncio
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 재연결 대기 시간 (초) - 실패할 때마다 두 배, 최대값까지
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+# 신규 상장을 반영하려고 이 주기(초)마다 마켓 목록을 다시 받아 재구독
+MARKET_REFRESH_INTERVAL = 3600.0
+
+BINANCE_WS_URL = "wss://stream.binance.com:9443/ws/!ticker@arr"
+BYBIT_WS_URL = "wss://stream.bybit.com/v5/public/spot"
+USDT_SUFFIX = "USDT"
+
+# 정규화된 시세 값 순서 (MarketEngine.FIELDS와 같음) - 없는 값은 None
+# (price, change, change_percent, volume, high, low)
+TickValues = Tuple[Optional[float], ...]
+# (거래소, 심볼, 값, 타임스탬프 ms)
+TickHandler = Callable[[str, str, TickValues, Optional[float]], None]
+
+
+def _float(value) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class TickerFeed(ABC):
+    """거래소 웹소켓 하나 - 끊기면 지수 백오프로 재연결"""
+
+    name = ""
+    url = ""
+
+    def __init__(self, on_tick: Optional[TickHandler] = None, url: Optional[str] = None,
+                 market_refresh_interval: float = MARKET_REFRESH_INTERVAL):
+        self.on_tick = on_tick
+        if url is not None:
+            self.url = url
+        self.market_refresh_interval = market_refresh_interval
+        self.connected = False
+        self.messages = 0
+        self.reconnects = 0
+        self.last_message_at: Optional[float] = None
+        self._stopped = False
+
+    async def prepare(self):
+        """연결 전에 필요한 준비 (마켓 목록 등) - 재연결할 때마다 호출"""
+
+    def subscription_messages(self) -> List[str]:
+        return []
+
+    @abstractmethod
+    def parse(self, data) -> Iterable[Tuple[str, TickValues, Optional[float]]]:
+        """업스트림 프레임 → (심볼, 값, 타임스탬프) 목록"""
+
+    async def keepalive(self, ws):
+        """애플리케이션 레벨 ping이 필요한 거래소만 구현"""
+
+    def handle_message(self, raw):
+        data = json.loads(raw)
+        for symbol, values, timestamp in self.parse(data):
+            self.messages += 1
+            if self.on_tick is not None:
+                self.on_tick(self.name, symbol, values, timestamp)
+        self.last_message_at = time.time()
+
+    async def run(self):
+        import websockets
+
+        delay = RECONNECT_DELAY
+        while not self._stopped:
+            keepalive = None
+            try:
+                await self.prepare()
+                async with websockets.connect(self.url, max_queue=None) as ws:
+                    for message in self.subscription_messages():
+                        await ws.send(message)
+                    self.connected = True
+                    delay = RECONNECT_DELAY
+                    logger.info(f"{self.name} 시세 구독 시작")
+                    keepalive = asyncio.create_task(self.keepalive(ws))
+                    refresh_at = time.monotonic() + self.market_refresh_interval
+                    async for raw in ws:
+                        self.handle_message(raw)
+                        if time.monotonic() >= refresh_at:
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"{self.name} 시세 연결 오류: {str(e) or type(e).__name__}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+            finally:
+                if keepalive is not None:
+                    keepalive.cancel()
+                if self.connected:
+                    self.reconnects += 1
+                self.connected = False
+
+    def stop(self):
+        self._stopped = True
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "messages": self.messages,
+            "reconnects": self.reconnects,
+            "last_message_at": self.last_message_at,
+        }
+
+
+class BinanceTickerFeed(TickerFeed):
+    """바이낸스 전체 마켓 ticker 스트림 (USDT 페어만, 가격은 USDT 그대로)"""
+
+    name = "binance"
+    url = BINANCE_WS_URL
+
+    def parse(self, data):
+        if not isinstance(data, list):
+            return
+        for ticker in data:
+            pair = ticker.get("s", "")
+            if not pair.endswith(USDT_SUFFIX):
+                continue
+            yield pair[:-len(USDT_SUFFIX)], (
+                _float(ticker.get("c")),
+                _float(ticker.get("p")),
+                _float(ticker.get("P")),
+                _float(ticker.get("q")),
+                _float(ticker.get("h")),
+                _float(ticker.get("l")),
+            ), ticker.get("E")
+
+
+class BybitTickerFeed(TickerFeed):
+    """바이비트 현물 ticker - 심볼별 구독이 필요해서 KRW 마켓 심볼 목록으로 구독"""
+
+    name = "bybit"
+    url = BYBIT_WS_URL
+    # 구독 메시지 하나에 넣을 수 있는 토픽 수
+    ARGS_PER_MESSAGE = 10
+    PING_INTERVAL = 20.0
+
+    def __init__(self, symbol_loader: Callable[[], List[str]], **kwargs):
+        super().__init__(**kwargs)
+        self.symbol_loader = symbol_loader
+        self.symbols: List[str] = []
+
+    async def prepare(self):
+        self.symbols = await asyncio.to_thread(self.symbol_loader)
+
+    def subscription_messages(self):
+        topics = [f"tickers.{symbol}{USDT_SUFFIX}" for symbol in self.symbols]
+        return [
+            json.dumps({"op": "subscribe", "args": topics[i:i + self.ARGS_PER_MESSAGE]})
+            for i in range(0, len(topics), self.ARGS_PER_MESSAGE)
+        ]
+
+    async def keepalive(self, ws):
+        while True:
+            await asyncio.sleep(self.PING_INTERVAL)
+            await ws.send(json.dumps({"op": "ping"}))
+
+    def parse(self, data):
+        topic = data.get("topic", "") if isinstance(data, dict) else ""
+        ticker = data.get("data") if topic.startswith("tickers.") else None
+        if not ticker:
+            return
+        pair = ticker.get("symbol", "")
+        if not pair.endswith(USDT_SUFFIX):
+            return
+        price = _float(ticker.get("lastPrice"))
+        prev_price = _float(ticker.get("prevPrice24h"))
+        change_rate = _float(ticker.get("price24hPcnt"))
+        yield pair[:-len(USDT_SUFFIX)], (
+            price,
+            price - prev_price if price is not None and prev_price is not None else None,
+            change_rate * 100 if change_rate is not None else None,
+            _float(ticker.get("turnover24h")),
+            _float(ticker.get("highPrice24h")),
+            _float(ticker.get("lowPrice24h")),
+        ), data.get("ts")
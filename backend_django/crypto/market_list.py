@@ -0,0 +1,121 @@
+"""
+Upbit 마켓 목록 캐시 (/v1/market/all)
+거의 바뀌지 않는 목록이라 요청마다 Upbit에 가지 않고 Redis(Django 기본 캐시)에 JSON 본문을 둔다
+
+    MARKET_LIST_TTL 이내        캐시 그대로
+    TTL 지남 (stale)            캐시를 바로 응답하고 백그라운드 스레드 하나가 새로 받아 옴
+    캐시 없음 / Redis 장애      요청 안에서 직접 받아 옴
+
+ETag는 본문 해시라 목록이 그대로면 새로 받아 와도 바뀌지 않고, Last-Modified는 본문이 바뀐 시각이다.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+import requests
+
+from .upbit_feed import UPBIT_MARKET_URL
+
+logger = logging.getLogger(__name__)
+
+# 새로 받아 오기 전까지 그대로 쓰는 시간(초)
+MARKET_LIST_TTL = int(os.getenv("CRYPTO_MARKET_LIST_TTL", "3600"))
+# TTL이 지난 뒤에도 갱신이 끝날 때까지 응답에 쓰는 시간(초) - 이것도 지나면 캐시에서 사라짐
+MARKET_LIST_STALE_TTL = int(os.getenv("CRYPTO_MARKET_LIST_STALE_TTL", "86400"))
+CACHE_KEY = "crypto:upbit_market_all"
+# 여러 워커가 동시에 갱신하지 않도록 잡는 키 (갱신이 실패해도 이 시간 뒤에는 다시 시도)
+REFRESH_LOCK_KEY = CACHE_KEY + ":refresh"
+REFRESH_LOCK_SECONDS = 30
+
+
+def fetch_market_all(url: str = UPBIT_MARKET_URL) -> str:
+    """Upbit 전체 마켓 목록 JSON 본문"""
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    return json.dumps(response.json(), ensure_ascii=False, separators=(",", ":"))
+
+
+class MarketListCache:
+    """캐시 항목: {"body": JSON 문자열, "etag", "last_modified": 본문이 바뀐 시각, "fetched_at"}"""
+
+    def __init__(self, cache=None, fetch: Callable[[], str] = fetch_market_all,
+                 ttl: int = MARKET_LIST_TTL, stale_ttl: int = MARKET_LIST_STALE_TTL):
+        if cache is None:
+            from django.core.cache import cache
+        self.cache = cache
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.fetches = 0
+        self.background_refreshes = 0
+
+    def _cache_get(self) -> Optional[dict]:
+        try:
+            return self.cache.get(CACHE_KEY)
+        except Exception as e:
+            logger.warning(f"마켓 목록 캐시 읽기 실패: {e}")
+            return None
+
+    def refresh(self, previous: Optional[dict] = None) -> dict:
+        """새로 받아서 캐시에 저장 - 본문이 그대로면 ETag/Last-Modified 유지"""
+        body = self.fetch()
+        self.fetches += 1
+        now = time.time()
+        etag = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+        unchanged = previous is not None and previous["etag"] == etag
+        entry = {
+            "body": body,
+            "etag": etag,
+            "last_modified": previous["last_modified"] if unchanged else int(now),
+            "fetched_at": now,
+        }
+        try:
+            self.cache.set(CACHE_KEY, entry, timeout=self.ttl + self.stale_ttl)
+        except Exception as e:
+            logger.warning(f"마켓 목록 캐시 저장 실패: {e}")
+        return entry
+
+    def _refresh_in_background(self, previous: dict):
+        try:
+            if not self.cache.add(REFRESH_LOCK_KEY, 1, timeout=REFRESH_LOCK_SECONDS):
+                return
+        except Exception:
+            return
+        self.background_refreshes += 1
+
+        def run():
+            try:
+                self.refresh(previous)
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Upbit 마켓 목록 갱신 실패 (이전 목록 유지): {e}")
+            finally:
+                try:
+                    self.cache.delete(REFRESH_LOCK_KEY)
+                except Exception:
+                    pass
+
+        threading.Thread(target=run, name="market-list-refresh", daemon=True).start()
+
+    def get(self) -> dict:
+        """캐시 항목 - 없으면 직접 받아 오고 (RequestException 그대로), TTL이 지났으면 갱신을 걸고 바로 반환"""
+        entry = self._cache_get()
+        if entry is None:
+            return self.refresh()
+        if time.time() - entry["fetched_at"] >= self.ttl:
+            self._refresh_in_background(entry)
+        return entry
+
+
+_market_list: Optional[MarketListCache] = None
+
+
+def get_market_list() -> MarketListCache:
+    global _market_list
+    if _market_list is None:
+        _market_list = MarketListCache()
+    return _market_list
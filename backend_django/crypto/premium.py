@@ -0,0 +1,116 @@
+"""
+김치 프리미엄 계산
+모든 심볼 × 모든 거래소 쌍의 프리미엄을 엔진 가격 배열 위에서 한 번의 NumPy 연산으로 계산한다
+
+    premium[base, compare, symbol] = (base 원화 가격 / compare 원화 가격 - 1) × 100
+
+USDT 거래소 가격은 환율을 곱해 원화로 바꾼다. 환율은 CRYPTO_USD_KRW_RATE가 있으면 그 값,
+없으면 Upbit KRW-USDT 시세를 쓴다. 계산은 조회할 때 하며, 엔진 버전이 그대로면 건너뛰고
+바뀌었으면 마지막 계산 이후 틱이 들어온 심볼 열만 다시 계산한다 (환율이 바뀌면 전체 재계산).
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .engine import QUOTES, MarketEngine, _to_list
+
+USD_KRW_RATE = float(os.getenv("CRYPTO_USD_KRW_RATE", "0")) or None
+# 환율을 시세에서 가져올 때 쓰는 마켓
+RATE_EXCHANGE = "upbit"
+RATE_SYMBOL = "USDT"
+
+
+def premium_matrix(krw_prices: np.ndarray) -> np.ndarray:
+    """(거래소, 심볼) 원화 가격 → (base, compare, 심볼) 프리미엄 %"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        premium = (krw_prices[:, None, :] / krw_prices[None, :, :] - 1.0) * 100.0
+    premium[~np.isfinite(premium)] = np.nan
+    return premium
+
+
+class PremiumCalculator:
+    def __init__(self, engine: MarketEngine, rate: Optional[float] = USD_KRW_RATE):
+        self.engine = engine
+        self.fixed_rate = rate
+        self.rate: Optional[float] = None
+        n_exchanges = len(engine.exchanges)
+        self.usdt_mask = np.array([QUOTES.get(exchange) == "USDT" for exchange in engine.exchanges])
+        self.krw_prices = np.full((n_exchanges, 0), np.nan)
+        self.premium = np.full((n_exchanges, n_exchanges, 0), np.nan)
+        self.version = 0
+        self.full_updates = 0
+        self.incremental_updates = 0
+        self._lock = threading.Lock()
+
+    def _engine_rate(self) -> Optional[float]:
+        """Upbit KRW-USDT 시세 (engine.lock 안에서 호출)"""
+        symbol = self.engine.symbol_index.get(RATE_SYMBOL)
+        exchange = self.engine.exchange_index.get(RATE_EXCHANGE)
+        if symbol is None or exchange is None:
+            return None
+        rate = self.engine.columns["price"][exchange, symbol]
+        return None if np.isnan(rate) else float(rate)
+
+    def _fx(self, rate: Optional[float]) -> np.ndarray:
+        fx = np.ones(len(self.engine.exchanges))
+        fx[self.usdt_mask] = rate if rate else np.nan
+        return fx
+
+    def refresh(self):
+        """엔진 버전이 바뀌었으면 마지막 계산 이후 틱이 들어온 심볼 열만 다시 계산"""
+        engine = self.engine
+        if engine.version == self.version:
+            return
+        with self._lock:
+            with engine.lock:
+                version = engine.version
+                n = engine.size
+                rate = self.fixed_rate or self._engine_rate()
+                if n != self.krw_prices.shape[1] or rate != self.rate:
+                    index = None
+                    prices = engine.columns["price"][:, :n].copy()
+                else:
+                    # 칸별 마지막 변경 버전으로 바뀐 심볼을 찾는다 (리스너 없이 잠금 안에서 일관되게)
+                    changed = engine.tick_version[:, :n].max(axis=0) > self.version
+                    index = np.flatnonzero(changed)
+                    prices = engine.columns["price"][:, index]
+            if index is None:
+                self.rate = rate
+                self.krw_prices = prices * self._fx(rate)[:, None]
+                self.premium = premium_matrix(self.krw_prices)
+                self.full_updates += 1
+            elif len(index):
+                krw = prices * self._fx(rate)[:, None]
+                self.krw_prices[:, index] = krw
+                self.premium[:, :, index] = premium_matrix(krw)
+                self.incremental_updates += 1
+            self.version = version
+
+    def result(self, pairs: Sequence[Tuple[str, str]]) -> dict:
+        self.refresh()
+        exchanges = self.engine.exchanges
+        with self._lock:
+            n = self.premium.shape[2]
+            symbols = self.engine.symbols[:n]
+            data: Dict[str, List[Optional[float]]] = {}
+            for base, compare in pairs:
+                b, c = exchanges.index(base), exchanges.index(compare)
+                data[f"{base}/{compare}"] = _to_list(np.round(self.premium[b, c], 4))
+            return {
+                "version": self.version,
+                "usd_krw": self.rate,
+                "rate_source": "fixed" if self.fixed_rate else f"{RATE_EXCHANGE}:KRW-{RATE_SYMBOL}",
+                "symbols": list(symbols),
+                "premium": data,
+            }
+
+    def default_pairs(self) -> List[Tuple[str, str]]:
+        """원화 거래소를 기준으로 나머지 모든 거래소와의 쌍"""
+        return [
+            (base, compare)
+            for base in self.engine.exchanges if QUOTES.get(base) == "KRW"
+            for compare in self.engine.exchanges if compare != base
+        ]
@@ -0,0 +1,97 @@
+"""
+시세 목록 정렬
+엔진 스냅샷 버전마다 (거래소, 컬럼, 방향)별 정렬 순서(argsort)를 한 번만 만들어 두고,
+같은 버전의 정렬 요청은 모두 그 순서에서 offset/limit 구간만 잘라 응답한다
+
+틱이 초당 수백 번 들어오면 버전이 매번 바뀌므로, 스냅샷은 CRYPTO_PRICES_MAX_AGE_MS 동안
+재사용한다 (그 사이 요청은 모두 같은 정렬 결과를 공유).
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .engine import MarketEngine, MarketSnapshot
+from .upbit_feed import KRW_PREFIX, TickerTable
+
+PRICES_MAX_AGE_MS = int(os.getenv("CRYPTO_PRICES_MAX_AGE_MS", "250"))
+
+# 응답 필드 → 엔진 컬럼 (symbol은 심볼 이름순)
+SORT_FIELDS = {
+    "symbol": None,
+    "price": "price",
+    "change24h": "change",
+    "changePercent24h": "change_percent",
+    "volume": "volume",
+    "high24h": "high",
+    "low24h": "low",
+}
+RESPONSE_FIELDS = tuple(name for name in SORT_FIELDS if name != "symbol")
+
+
+class PriceList:
+    def __init__(self, engine: MarketEngine, tickers: Optional[TickerTable] = None,
+                 max_age_ms: int = PRICES_MAX_AGE_MS):
+        self.engine = engine
+        self.max_age = max_age_ms / 1000
+        # 한글/영문 이름은 Upbit 마켓 목록에서
+        self.tickers = tickers
+        # (스냅샷, {(거래소, 필드, 내림차순): 심볼 인덱스 배열})
+        self._orderings: Tuple[Optional[MarketSnapshot], Dict[tuple, np.ndarray]] = (None, {})
+        self._snapshot_at = 0.0
+        self._lock = threading.Lock()
+        self.sorts = 0
+
+    def ordering(self, exchange: str, field: str, descending: bool) -> Tuple[MarketSnapshot, np.ndarray]:
+        """정렬된 심볼 인덱스 - 해당 거래소에 시세가 있는 심볼만, 값이 없으면 방향과 관계없이 맨 뒤"""
+        with self._lock:
+            snapshot, orderings = self._orderings
+            now = time.monotonic()
+            if snapshot is None or (snapshot.version != self.engine.version
+                                    and now - self._snapshot_at >= self.max_age):
+                snapshot, orderings = self.engine.snapshot(), {}
+                self._orderings = (snapshot, orderings)
+                self._snapshot_at = now
+            key = (exchange, field, descending)
+            order = orderings.get(key)
+            if order is None:
+                order = orderings[key] = self._sort(snapshot, exchange, field, descending)
+                self.sorts += 1
+        return snapshot, order
+
+    @staticmethod
+    def _sort(snapshot: MarketSnapshot, exchange: str, field: str, descending: bool) -> np.ndarray:
+        e = snapshot.exchanges.index(exchange)
+        listed = np.flatnonzero(snapshot.tick_version[e])
+        column = SORT_FIELDS[field]
+        if column is None:
+            names = np.array(snapshot.symbols, dtype=object)[listed]
+            order = np.argsort(names, kind="stable")
+            return listed[order[::-1] if descending else order]
+        values = snapshot.columns[column][e, listed]
+        # NaN은 argsort에서 항상 뒤로 가므로 내림차순은 부호를 뒤집어 정렬
+        order = np.argsort(-values if descending else values, kind="stable")
+        return listed[order]
+
+    def page(self, exchange: str, field: str, descending: bool, offset: int, limit: int) -> Tuple[int, List[dict]]:
+        """(전체 개수, 정렬된 구간의 행)"""
+        snapshot, order = self.ordering(exchange, field, descending)
+        e = snapshot.exchanges.index(exchange)
+        selected = order[offset:offset + limit]
+        columns = {
+            name: snapshot.columns[SORT_FIELDS[name]][e, selected].tolist() for name in RESPONSE_FIELDS
+        }
+        markets = self.tickers.markets if self.tickers is not None else {}
+        rows = []
+        for position, i in enumerate(selected.tolist()):
+            symbol = snapshot.symbols[i]
+            korean_name, english_name = markets.get(KRW_PREFIX + symbol, ("", ""))
+            row = {"symbol": symbol, "name": english_name or symbol, "koreanName": korean_name or symbol}
+            for name in RESPONSE_FIELDS:
+                value = columns[name][position]
+                row[name] = None if value != value else value
+            rows.append(row)
+        return len(order), rows
@@ -0,0 +1,92 @@
+"""
+상승률 순위 인덱스
+거래소별로 등락률 내림차순 정렬 리스트를 유지해서 틱마다 전체 정렬 없이 순위를 갱신한다
+
+틱 하나는 이전 키 삭제 + 새 키 삽입 (bisect 탐색 O(log n), 리스트 이동은 C memmove).
+상위 N개의 구성이나 순서가 바뀐 경우에만 on_change로 알린다.
+"""
+
+import math
+import os
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .engine import MarketEngine
+
+# 변경 알림 기준이 되는 상위 개수 (TopGainers 화면 = 5개)
+TOP_GAINERS_N = int(os.getenv("CRYPTO_TOP_GAINERS_N", "5"))
+RANK_FIELD = "change_percent"
+
+
+class RankIndex:
+    """값 내림차순 정렬 - 키는 (-값, 심볼)이라 값이 같으면 심볼 순"""
+
+    def __init__(self):
+        self.keys: List[Tuple[float, str]] = []
+        self.values: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def update(self, symbol: str, value: Optional[float]) -> Tuple[int, int]:
+        """값 반영 - (이전 순위, 새 순위), 없으면 -1"""
+        old_position = -1
+        old = self.values.pop(symbol, None)
+        if old is not None:
+            old_position = bisect_left(self.keys, (-old, symbol))
+            del self.keys[old_position]
+        if value is None or math.isnan(value):
+            return old_position, -1
+        key = (-value, symbol)
+        position = bisect_left(self.keys, key)
+        self.keys.insert(position, key)
+        self.values[symbol] = value
+        return old_position, position
+
+    def top(self, n: int) -> List[Tuple[str, float]]:
+        return [(symbol, -key) for key, symbol in self.keys[:n]]
+
+
+class GainersIndex:
+    """엔진 틱 → 거래소별 RankIndex"""
+
+    def __init__(self, engine: MarketEngine, push_n: int = TOP_GAINERS_N,
+                 on_change: Optional[Callable[[str], None]] = None):
+        self.engine = engine
+        self.push_n = push_n
+        self.on_change = on_change
+        self.indexes = [RankIndex() for _ in engine.exchanges]
+        # 거래소별 마지막 상위 N개 심볼 (구성/순서 변경 판단용)
+        self._top: List[List[str]] = [[] for _ in engine.exchanges]
+        self._lock = threading.Lock()
+        engine.add_listener(self.on_tick)
+
+    def on_tick(self, e: int, i: int):
+        value = float(self.engine.columns[RANK_FIELD][e, i])
+        symbol = self.engine.symbols[i]
+        with self._lock:
+            old_position, position = self.indexes[e].update(symbol, value)
+            if not (0 <= old_position < self.push_n or 0 <= position < self.push_n):
+                return
+            top = [symbol for symbol, _ in self.indexes[e].top(self.push_n)]
+            if top == self._top[e]:
+                return
+            self._top[e] = top
+        if self.on_change is not None:
+            self.on_change(self.engine.exchanges[e])
+
+    def top(self, exchange: str, n: int) -> List[dict]:
+        """상위 n개 (심볼, 등락률, 현재가)"""
+        e = self.engine.exchange_index[exchange]
+        with self._lock:
+            ranked = self.indexes[e].top(n)
+        prices = self.engine.columns["price"]
+        index = self.engine.symbol_index
+        return [
+            {"symbol": symbol, RANK_FIELD: value, "price": float(prices[e, index[symbol]])}
+            for symbol, value in ranked
+        ]
+
+    def result(self, exchange: str, n: int) -> dict:
+        return {"exchange": exchange, "version": self.engine.version, "gainers": self.top(exchange, n)}
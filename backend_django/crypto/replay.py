@@ -0,0 +1,160 @@
+"""
+기록된 틱 재생
+틱 로그(crypto.ticklog)를 라이브 피드와 같은 경로로 다시 흘려보낸다
+
+    Upbit 레코드   → SIMPLE 포맷 프레임 → UpbitTickerFeed.handle_message → 시세 테이블/중계 + 엔진
+    그 외 거래소    → on_tick → 엔진 (→ 프리미엄/순위/캔들 리스너)
+
+기록된 시각 간격을 speed배로 줄여서 재생하고, speed가 0이면 기다리지 않고 최대한 빨리 보낸다.
+네트워크 없이 바쁜 시장 구간을 똑같이 재현해서 ws_fastapi와 시세 API를 측정하는 용도.
+
+    # 엔진 파이프라인만 최대 속도로 재생해서 처리량 측정
+    python -m crypto.replay ./ticks --speed max
+    # ws_fastapi를 재생 데이터로 띄우기
+    CRYPTO_REPLAY_DIR=./ticks CRYPTO_REPLAY_SPEED=10 uvicorn ws_fastapi:app --port 8001
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from typing import Optional
+
+from .engine import EXCHANGES
+from .feeds import TickerFeed
+from .ticklog import TickLog
+from .upbit_feed import KRW_PREFIX, UpbitTickerFeed
+
+# 비어 있으면 라이브 피드, 있으면 이 디렉터리의 틱 로그를 재생
+REPLAY_DIR = os.getenv("CRYPTO_REPLAY_DIR", "")
+# 1, 10, 100, ... 배속 또는 max
+REPLAY_SPEED = os.getenv("CRYPTO_REPLAY_SPEED", "1")
+# 최대 속도로 재생할 때도 이 개수마다 이벤트 루프에 양보 (중계/소켓 전송이 돌 수 있게)
+YIELD_EVERY = 512
+# 레코드를 파이썬 값으로 바꾸는 단위 (세그먼트 전체를 한 번에 리스트로 만들지 않도록)
+CHUNK_RECORDS = 8192
+UPBIT_ID = EXCHANGES.index("upbit")
+
+
+def parse_speed(value) -> float:
+    """"max"/"0" → 0 (기다리지 않음), 그 외는 배속"""
+    if str(value).lower() == "max":
+        return 0.0
+    speed = float(value)
+    if speed < 0:
+        raise ValueError("speed는 0 이상이어야 합니다")
+    return speed
+
+
+def _value(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+class ReplayFeed(TickerFeed):
+    """틱 로그를 읽어 라이브 피드 대신 틱을 만들어 내는 피드"""
+
+    name = "replay"
+
+    def __init__(self, directory: str, upbit: UpbitTickerFeed, speed: float = 1.0,
+                 start: Optional[int] = None, end: Optional[int] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.log = TickLog(directory)
+        self.upbit = upbit
+        self.speed = speed
+        self.start = start
+        self.end = end
+        self.replayed = 0
+        self.finished = False
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # 재생 일정보다 늦은 정도 (배속 재생일 때)
+        self.max_lag = 0.0
+
+    def _set_markets(self):
+        """심볼 사전의 마켓 코드로 Upbit 마켓 목록을 채움 (이름은 없으므로 심볼로 표시됨)"""
+        self.upbit.table.set_markets([{"market": code} for code in self.log.symbols.codes if code])
+
+    def dispatch(self, timestamp: int, exchange_id: int, symbol: str, price: float, volume: float):
+        price, volume = _value(price), _value(volume)
+        if exchange_id == UPBIT_ID:
+            # 라이브와 같은 파싱/테이블 갱신 경로를 타도록 Upbit SIMPLE 프레임으로 만든다
+            self.upbit.handle_message(json.dumps({
+                "ty": "ticker", "cd": KRW_PREFIX + symbol, "tp": price, "atp24h": volume, "tms": timestamp,
+            }))
+        elif self.on_tick is not None:
+            self.on_tick(EXCHANGES[exchange_id], symbol, (price, None, None, volume, None, None), timestamp)
+
+    def parse(self, data):
+        """레코드 구간 → (시각, 거래소 id, 심볼 id, 가격, 거래대금) 파이썬 값"""
+        return zip(data["timestamp"].tolist(), data["exchange"].tolist(), data["symbol"].tolist(),
+                   data["price"].tolist(), data["volume"].tolist())
+
+    async def run(self):
+        self._set_markets()
+        self.connected = True
+        self.started_at = time.monotonic()
+        first: Optional[int] = None
+        try:
+            for records in self.log.scan(self.start, self.end):
+                for offset in range(0, len(records), CHUNK_RECORDS):
+                    rows = self.parse(records[offset:offset + CHUNK_RECORDS])
+                    for timestamp, exchange_id, symbol_id, price, volume in rows:
+                        if self._stopped:
+                            return
+                        if first is None:
+                            first = timestamp
+                        if self.speed:
+                            ahead = (timestamp - first) / 1000 / self.speed - (time.monotonic() - self.started_at)
+                            if ahead > 0.001:
+                                await asyncio.sleep(ahead)
+                            else:
+                                self.max_lag = max(self.max_lag, -ahead)
+                        self.dispatch(timestamp, exchange_id, self.log.symbol(symbol_id), price, volume)
+                        self.replayed += 1
+                        self.messages += 1
+                        if self.replayed % YIELD_EVERY == 0:
+                            await asyncio.sleep(0)
+            self.finished = True
+        finally:
+            self.connected = False
+            self.finished_at = time.monotonic()
+            self.last_message_at = time.time()
+
+    def stats(self) -> dict:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return {
+            **super().stats(),
+            "speed": self.speed or "max",
+            "replayed": self.replayed,
+            "finished": self.finished,
+            "elapsed": round(elapsed, 3) if elapsed is not None else None,
+            "ticks_per_second": round(self.replayed / elapsed) if elapsed else None,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+        }
+
+
+def main():
+    from .service import MarketService
+
+    parser = argparse.ArgumentParser(description="틱 로그 재생 (엔진 파이프라인 처리량 측정)")
+    parser.add_argument("directory")
+    parser.add_argument("--speed", default="max", help="1, 10, 100 ... 배속 또는 max")
+    args = parser.parse_args()
+
+    service = MarketService(enabled=True, replay_dir=args.directory, replay_speed=parse_speed(args.speed))
+    asyncio.run(service.run())
+    feed = service.feeds[0]
+    print(json.dumps({
+        "replay": feed.stats(),
+        "engine": {"symbols": service.engine.size, "version": service.engine.version},
+        "tickers": service.tickers.version,
+        "candle_series": len(service.candles.series),
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+시세 수집 서비스
+거래소 피드 → Upbit 최신 시세 테이블 + 멀티 거래소 엔진을 프로세스당 한 벌만 유지한다
+
+- Django: 서버 프로세스가 뜰 때 (CryptoConfig.ready) 백그라운드 스레드에서 이벤트 루프를 띄워 실행
+- ws_fastapi: 서버 이벤트 루프에서 run()을 태스크로 실행
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Callable, List, Optional
+
+from .candles import CandleAggregator
+from .engine import MarketEngine
+from .feeds import BinanceTickerFeed, BybitTickerFeed, TickerFeed
+from .premium import PremiumCalculator
+from .prices import PriceList
+from .ranking import GainersIndex
+from .replay import REPLAY_DIR, REPLAY_SPEED, ReplayFeed, parse_speed
+from .ticklog import TickRecorder, create_recorder
+from .upbit_feed import KRW_PREFIX, BithumbTickerFeed, TickerTable, UpbitTickerFeed, fetch_krw_markets
+
+logger = logging.getLogger(__name__)
+
+# false면 업스트림에 연결하지 않음 (테이블은 빈 상태로 응답)
+MARKET_FEED_ENABLED = os.getenv("CRYPTO_MARKET_FEED", "true").lower() == "true"
+# 구독할 거래소 (쉼표 구분)
+MARKET_EXCHANGES = os.getenv("CRYPTO_MARKET_EXCHANGES", "upbit,bithumb,binance,bybit")
+
+
+def fetch_krw_symbols() -> List[str]:
+    """바이비트 구독용 심볼 목록 (Upbit KRW 마켓 기준)"""
+    return [market["market"][len(KRW_PREFIX):] for market in fetch_krw_markets()]
+
+
+class MarketService:
+    def __init__(self, enabled: bool = MARKET_FEED_ENABLED, exchanges: str = MARKET_EXCHANGES,
+                 on_upbit_update: Optional[Callable[[str], None]] = None,
+                 replay_dir: str = REPLAY_DIR, replay_speed: Optional[float] = None):
+        self.enabled = enabled
+        self.replaying = bool(replay_dir)
+        self.tickers = TickerTable()
+        self.engine = MarketEngine()
+        self.premium = PremiumCalculator(self.engine)
+        self.gainers = GainersIndex(self.engine)
+        self.prices = PriceList(self.engine, self.tickers)
+        self.candles = CandleAggregator(self.engine)
+        # CRYPTO_TICK_LOG_DIR가 있으면 수집을 시작할 때 붙임
+        self.recorder: Optional[TickRecorder] = None
+        on_tick = self.engine.on_tick
+        self.upbit = UpbitTickerFeed(self.tickers, on_update=on_upbit_update, on_tick=on_tick)
+        self.feeds: List[TickerFeed] = [self.upbit]
+        if self.replaying:
+            # 업스트림 대신 기록된 틱을 같은 경로(Upbit 피드 → 테이블/엔진)로 재생
+            speed = parse_speed(REPLAY_SPEED) if replay_speed is None else replay_speed
+            self.feeds = [ReplayFeed(replay_dir, self.upbit, speed=speed, on_tick=on_tick)]
+            exchanges = ""
+        selected = {name.strip() for name in exchanges.split(",")}
+        if "bithumb" in selected:
+            self.feeds.append(BithumbTickerFeed(TickerTable(), on_tick=on_tick))
+        if "binance" in selected:
+            self.feeds.append(BinanceTickerFeed(on_tick=on_tick))
+        if "bybit" in selected:
+            self.feeds.append(BybitTickerFeed(fetch_krw_symbols, on_tick=on_tick))
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._task: Optional[asyncio.Future] = None
+
+    async def run(self):
+        """모든 피드를 현재 이벤트 루프에서 실행"""
+        await asyncio.gather(*(feed.run() for feed in self.feeds))
+
+    def _start_recorder(self):
+        # 재생 중인 틱을 다시 기록하지 않음
+        if self.recorder is None and not self.replaying:
+            self.recorder = create_recorder(self.engine, self.tickers)
+
+    def start_task(self):
+        """이미 돌고 있는 이벤트 루프(ws_fastapi)에서 시작"""
+        if self.enabled and self._task is None:
+            self._start_recorder()
+            self._task = asyncio.ensure_future(self.run())
+
+    def start(self):
+        """전용 스레드에서 시작 (Django)"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._start_recorder()
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="market-feed", daemon=True)
+        self._thread.start()
+        logger.info("시세 수집 스레드 시작")
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.run())
+
+    def stop(self):
+        for feed in self.feeds:
+            feed.stop()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "engine": {"symbols": self.engine.size, "version": self.engine.version},
+            "feeds": {feed.name: feed.stats() for feed in self.feeds},
+            "tick_log": self.recorder.stats() if self.recorder is not None else None,
+        }
+
+
+_service: Optional[MarketService] = None
+# 서비스를 시작한 프로세스 - fork된 워커(gunicorn --preload)에는 수집 스레드가 없으므로 새로 시작
+_service_pid: Optional[int] = None
+_service_lock = threading.Lock()
+
+
+def get_market_service() -> MarketService:
+    """프로세스 전역 서비스 (CryptoConfig.ready 또는 처음 호출할 때 시작)"""
+    global _service, _service_pid
+    if _service is None or _service_pid != os.getpid():
+        with _service_lock:
+            if _service is None or _service_pid != os.getpid():
+                service = MarketService()
+                service.start()
+                _service = service
+                _service_pid = os.getpid()
+    return _service
@@ -0,0 +1,74 @@
+import json
+import threading
+import time
+from unittest.mock import patch
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from crypto.market_list import CACHE_KEY, MarketListCache
+
+MARKETS = [{"market": "KRW-BTC", "korean_name": "비트코인", "english_name": "Bitcoin"}]
+
+
+class UpbitMarketAllTests(TestCase):
+    url = '/api/crypto/upbit/market/all'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.bodies = [json.dumps(MARKETS)]
+        self.list_cache = MarketListCache(LocMemCache('market-list-view-test', {}),
+                                          fetch=lambda: self.bodies.pop(0), ttl=60)
+        patcher = patch('crypto.views.get_market_list', return_value=self.list_cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_returns_body_with_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), MARKETS)
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response['Last-Modified'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_if_modified_since_returns_304(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.list_cache.fetches, 1)
+
+    def test_stale_entry_is_served_while_refreshing(self):
+        first = self.client.get(self.url)
+        entry = self.list_cache.cache.get(CACHE_KEY)
+        entry['fetched_at'] -= 61
+        self.list_cache.cache.set(CACHE_KEY, entry)
+        # 백그라운드 갱신이 끝나지 않아도 이전 목록을 바로 응답
+        release, refreshed = threading.Event(), threading.Event()
+
+        def slow_fetch():
+            release.wait(5)
+            refreshed.set()
+            return json.dumps(MARKETS + MARKETS)
+
+        self.list_cache.fetch = slow_fetch
+        stale = self.client.get(self.url)
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(stale.content, first.content)
+        self.assertEqual(stale['ETag'], first['ETag'])
+        self.assertEqual(self.list_cache.background_refreshes, 1)
+
+        release.set()
+        self.assertTrue(refreshed.wait(5))
+        for _ in range(100):
+            if self.list_cache.cache.get(CACHE_KEY)['etag'] != first['ETag']:
+                break
+            time.sleep(0.01)
+        self.assertEqual(json.loads(self.client.get(self.url).content), MARKETS + MARKETS)
@@ -0,0 +1,271 @@
+"""
+틱 기록 (append-only 바이너리 로그)
+엔진에 들어온 틱을 고정 길이 레코드로 세그먼트 파일에 이어 쓰고, 읽을 때는 mmap(np.memmap)으로
+복사 없이 범위를 스캔한다. DB 없이 며칠치 틱을 보관/재생하기 위한 용도.
+
+    <디렉터리>/ticks-<세그먼트 번호 8자리>-<첫 레코드 시각 ms>.bin   레코드 배열
+    <디렉터리>/symbols.jsonl                                    심볼 id → 심볼/마켓 코드
+    <디렉터리>/.lock                                            기록 중인 프로세스 (하나만)
+
+레코드 시각은 서버가 받은 시각이라 파일 안에서 단조 증가하고, 시각 범위는 이분 탐색으로 찾는다.
+거래소 id는 engine.EXCHANGES 순서, 심볼 id는 symbols.jsonl에 처음 기록된 순서 (재시작해도 유지).
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .engine import EXCHANGES, MarketEngine
+from .upbit_feed import KRW_PREFIX, TickerTable
+
+logger = logging.getLogger(__name__)
+
+# 비어 있으면 기록하지 않음
+TICK_LOG_DIR = os.getenv("CRYPTO_TICK_LOG_DIR", "")
+# 세그먼트 최대 크기 - 넘으면 다음 파일로
+TICK_LOG_SEGMENT_BYTES = int(os.getenv("CRYPTO_TICK_LOG_SEGMENT_MB", "64")) * 1024 * 1024
+# 보관할 세그먼트 수 (0이면 무제한) - 오래된 것부터 삭제
+TICK_LOG_MAX_SEGMENTS = int(os.getenv("CRYPTO_TICK_LOG_MAX_SEGMENTS", "0"))
+# 모아서 쓰는 레코드 수 / 최대 대기 시간(초)
+FLUSH_RECORDS = 4096
+FLUSH_INTERVAL = 1.0
+
+# 32바이트 고정 길이 레코드 (정렬을 맞추려고 8바이트 필드 먼저)
+RECORD = np.dtype([
+    ("timestamp", "<i8"),   # 수신 시각 (ms)
+    ("price", "<f8"),
+    ("volume", "<f8"),      # 24시간 누적 거래대금 (엔진 volume 컬럼)
+    ("symbol", "<u4"),
+    ("exchange", "<u2"),
+    ("_pad", "<u2"),
+])
+SEGMENT_PATTERN = re.compile(r"^ticks-(\d{8})-(\d+)\.bin$")
+SYMBOLS_FILE = "symbols.jsonl"
+
+
+def list_segments(directory: str) -> List[Tuple[int, int, str]]:
+    """(세그먼트 번호, 첫 레코드 시각, 경로) - 번호순"""
+    segments = []
+    for name in os.listdir(directory):
+        match = SEGMENT_PATTERN.match(name)
+        if match:
+            segments.append((int(match.group(1)), int(match.group(2)), os.path.join(directory, name)))
+    return sorted(segments)
+
+
+class SymbolDictionary:
+    """심볼 id ↔ 심볼 (append-only JSON lines)"""
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, SYMBOLS_FILE)
+        self.symbols: List[str] = []
+        self.codes: List[Optional[str]] = []
+        self.ids: Dict[str, int] = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._add(entry["symbol"], entry.get("code"))
+
+    def _add(self, symbol: str, code: Optional[str]) -> int:
+        symbol_id = self.ids[symbol] = len(self.symbols)
+        self.symbols.append(symbol)
+        self.codes.append(code)
+        return symbol_id
+
+    def id(self, symbol: str, code: Optional[str] = None) -> int:
+        """심볼 id (처음 보는 심볼이면 파일에 추가)"""
+        symbol_id = self.ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self._add(symbol, code)
+            with open(self.path, "a", encoding="utf-8") as f:
+                entry = {"id": symbol_id, "symbol": symbol, "code": code}
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return symbol_id
+
+
+def lock_exclusive(file):
+    """파일에 배타 잠금 (기다리지 않음) - 다른 프로세스가 잡고 있으면 BlockingIOError
+
+    기록을 켤 때만 필요하므로 플랫폼별 모듈은 여기서 가져온다 (fcntl은 POSIX 전용).
+    """
+    if os.name == "nt":
+        import msvcrt
+
+        try:
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError as e:
+            raise BlockingIOError(*e.args) from e
+    else:
+        import fcntl
+
+        fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+class TickRecorder:
+    """엔진 리스너 - 틱을 버퍼에 모았다가 현재 세그먼트 끝에 이어 쓴다"""
+
+    def __init__(self, directory: str, segment_bytes: int = TICK_LOG_SEGMENT_BYTES,
+                 max_segments: int = TICK_LOG_MAX_SEGMENTS, tickers: Optional[TickerTable] = None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        # 한 디렉터리에는 한 프로세스만 기록 (Django와 ws_fastapi가 같은 설정을 읽어도 안전하게)
+        self._lock_file = open(os.path.join(directory, ".lock"), "w")
+        try:
+            lock_exclusive(self._lock_file)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise
+        self.segment_records = max(1, segment_bytes // RECORD.itemsize)
+        self.max_segments = max_segments
+        # Upbit 마켓 목록 (/v1/market/all) - 심볼 사전에 마켓 코드를 남기는 데 사용
+        self.tickers = tickers
+        self.symbols = SymbolDictionary(directory)
+        segments = list_segments(directory)
+        self._next_segment = segments[-1][0] + 1 if segments else 0
+        self._file = None
+        self._file_records = 0
+        # (timestamp, price, volume, symbol, exchange, pad) - 쓸 때 한 번에 레코드 배열로 변환
+        self._pending: List[tuple] = []
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.records = 0
+        self.segments = 0
+
+    def attach(self, engine: MarketEngine):
+        """엔진 틱을 기록 - 엔진의 거래소 순서가 EXCHANGES와 같아야 id가 유지됨"""
+        self._exchange_ids = [EXCHANGES.index(name) for name in engine.exchanges]
+        self._engine = engine
+        engine.add_listener(self.on_tick)
+
+    def on_tick(self, e: int, i: int):
+        engine = self._engine
+        symbol = engine.symbols[i]
+        self.append(self._exchange_ids[e], symbol, float(engine.columns["price"][e, i]),
+                    float(engine.columns["volume"][e, i]))
+
+    def append(self, exchange_id: int, symbol: str, price: float, volume: float,
+               timestamp: Optional[int] = None):
+        with self._lock:
+            symbol_id = self.symbols.ids.get(symbol)
+            if symbol_id is None:
+                code = KRW_PREFIX + symbol
+                markets = self.tickers.markets if self.tickers is not None else {}
+                symbol_id = self.symbols.id(symbol, code if code in markets else None)
+            if timestamp is None:
+                timestamp = int(time.time() * 1000)
+            self._pending.append((timestamp, price, volume, symbol_id, exchange_id, 0))
+            if (len(self._pending) >= FLUSH_RECORDS
+                    or time.monotonic() - self._flushed_at >= FLUSH_INTERVAL):
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        """버퍼를 세그먼트에 기록 - 세그먼트가 차면 나눠서 다음 파일로"""
+        records = np.array(self._pending, dtype=RECORD)
+        self._pending = []
+        offset = 0
+        while offset < len(records):
+            if self._file is None or self._file_records >= self.segment_records:
+                self._roll(int(records[offset]["timestamp"]))
+            count = min(len(records) - offset, self.segment_records - self._file_records)
+            self._file.write(records[offset:offset + count].tobytes())
+            self._file_records += count
+            offset += count
+        if self._file is not None:
+            self._file.flush()
+        self.records += len(records)
+        self._flushed_at = time.monotonic()
+
+    def _roll(self, first_timestamp: int):
+        if self._file is not None:
+            self._file.close()
+        name = f"ticks-{self._next_segment:08d}-{first_timestamp}.bin"
+        self._file = open(os.path.join(self.directory, name), "ab")
+        self._file_records = 0
+        self._next_segment += 1
+        self.segments += 1
+        if self.max_segments:
+            for _, _, path in list_segments(self.directory)[:-self.max_segments]:
+                os.remove(path)
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        self._lock_file.close()
+
+    def stats(self) -> dict:
+        return {"directory": self.directory, "records": self.records, "segments": self.segments,
+                "buffered": len(self._pending)}
+
+
+class TickLog:
+    """기록된 틱 읽기 - 세그먼트를 np.memmap으로 열어 복사 없이 구간을 잘라 준다"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.symbols = SymbolDictionary(directory)
+
+    def scan(self, start: Optional[int] = None, end: Optional[int] = None) -> Iterator[np.ndarray]:
+        """[start, end) 시각(ms) 범위의 레코드 - 세그먼트별 memmap 뷰 (복사 없음)"""
+        segments = list_segments(self.directory)
+        for n, (_, first, path) in enumerate(segments):
+            # 다음 세그먼트가 start 이전에 시작하면 이 세그먼트는 통째로 건너뜀
+            if start is not None and n + 1 < len(segments) and segments[n + 1][1] <= start:
+                continue
+            if end is not None and first >= end:
+                break
+            count = os.path.getsize(path) // RECORD.itemsize
+            if count == 0:
+                continue
+            records = np.memmap(path, dtype=RECORD, mode="r", shape=(count,))
+            timestamps = records["timestamp"]
+            lo = int(np.searchsorted(timestamps, start, side="left")) if start is not None else 0
+            hi = int(np.searchsorted(timestamps, end, side="left")) if end is not None else count
+            if lo < hi:
+                yield records[lo:hi]
+
+    def symbol(self, symbol_id: int) -> str:
+        if symbol_id >= len(self.symbols.symbols):
+            # 기록 중에 새로 추가된 심볼
+            self.symbols = SymbolDictionary(self.directory)
+        return self.symbols.symbols[symbol_id]
+
+    def stats(self) -> dict:
+        segments = list_segments(self.directory)
+        size = sum(os.path.getsize(path) for _, _, path in segments)
+        return {
+            "segments": len(segments),
+            "records": size // RECORD.itemsize,
+            "bytes": size,
+            "symbols": len(self.symbols.symbols),
+            "first": segments[0][1] if segments else None,
+        }
+
+
+def create_recorder(engine: MarketEngine, tickers: Optional[TickerTable] = None,
+                    directory: str = TICK_LOG_DIR) -> Optional[TickRecorder]:
+    """CRYPTO_TICK_LOG_DIR가 설정돼 있으면 엔진에 붙인 기록기 (다른 프로세스가 기록 중이면 None)"""
+    if not directory:
+        return None
+    try:
+        recorder = TickRecorder(directory, tickers=tickers)
+    except BlockingIOError:
+        logger.info(f"틱 기록은 다른 프로세스가 담당: {directory}")
+        return None
+    recorder.attach(engine)
+    logger.info(f"틱 기록 시작: {directory}")
+    return recorder
@@ -0,0 +1,205 @@
+"""
+Upbit 실시간 시세 수집
+서버가 KRW 마켓 전체를 업스트림 연결 하나로 구독하고, 최신 시세만 메모리 테이블에 유지한다
+(브라우저마다 Upbit에 직접 연결하던 것을 서버 한 곳으로 모음)
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from .feeds import TickerFeed
+
+logger = logging.getLogger(__name__)
+
+UPBIT_WS_URL = "wss://api.upbit.com/websocket/v1"
+UPBIT_MARKET_URL = "https://api.upbit.com/v1/market/all"
+BITHUMB_WS_URL = "wss://ws-api.bithumb.com/websocket/v1"
+BITHUMB_MARKET_URL = "https://api.bithumb.com/v1/market/all"
+KRW_PREFIX = "KRW-"
+
+# SIMPLE 포맷 약어 → DEFAULT 포맷 필드명
+SIMPLE_FIELDS = {
+    "ty": "type",
+    "cd": "code",
+    "tp": "trade_price",
+    "scp": "signed_change_price",
+    "scr": "signed_change_rate",
+    "atp24h": "acc_trade_price_24h",
+    "hp": "high_price",
+    "lp": "low_price",
+    "h52wp": "highest_52_week_price",
+    "l52wp": "lowest_52_week_price",
+    "tms": "timestamp",
+}
+
+# 테이블에 보관하는 값 (프론트엔드 CryptoData 필드명) ← Upbit 필드
+TICKER_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("price", "trade_price"),
+    ("change24h", "signed_change_price"),
+    ("changePercent24h", "signed_change_rate"),
+    ("volume", "acc_trade_price_24h"),
+    ("high24h", "high_price"),
+    ("low24h", "low_price"),
+    ("high52w", "highest_52_week_price"),
+    ("low52w", "lowest_52_week_price"),
+)
+FIELD_NAMES = tuple(name for name, _ in TICKER_FIELDS)
+
+
+def fetch_krw_markets(url: str = UPBIT_MARKET_URL) -> List[dict]:
+    """Upbit KRW 마켓 목록 (market, korean_name, english_name)"""
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    return [market for market in response.json() if market["market"].startswith(KRW_PREFIX)]
+
+
+def fetch_bithumb_krw_markets() -> List[dict]:
+    """빗썸 KRW 마켓 목록 (Upbit와 같은 형식)"""
+    return fetch_krw_markets(BITHUMB_MARKET_URL)
+
+
+def normalize_ticker(data: dict) -> dict:
+    """SIMPLE 포맷이면 DEFAULT 필드명으로 변환"""
+    if "cd" in data:
+        return {SIMPLE_FIELDS.get(key, key): value for key, value in data.items()}
+    return data
+
+
+class TickerTable:
+    """마켓 코드 → 최신 시세 (필드 순서가 고정된 리스트로 보관)
+
+    갱신은 한 스레드(수집 루프)에서만 하고, 읽기는 다른 스레드에서 해도 되도록
+    스냅샷은 항상 새 리스트로 만든다. 스냅샷은 버전별로 한 번만 만들어 재사용한다.
+    """
+
+    def __init__(self):
+        self.rows: Dict[str, list] = {}
+        self.markets: Dict[str, Tuple[str, str]] = {}
+        self.updated_at: Dict[str, int] = {}
+        self.version = 0
+        self._snapshot: Tuple[int, List[dict]] = (-1, [])
+
+    def set_markets(self, markets: List[dict]):
+        self.markets = {
+            market["market"]: (market.get("korean_name", ""), market.get("english_name", ""))
+            for market in markets
+        }
+
+    @property
+    def codes(self) -> List[str]:
+        return list(self.markets)
+
+    def update(self, ticker: dict) -> Optional[str]:
+        """시세 반영 - 값이 바뀌었으면 마켓 코드, 그대로면 None"""
+        code = ticker.get("code")
+        if not code:
+            return None
+        values = [ticker.get(source) for _, source in TICKER_FIELDS]
+        # 등락률은 프론트엔드와 같은 퍼센트 단위로 보관
+        if values[2] is not None:
+            values[2] = values[2] * 100
+        if self.rows.get(code) == values:
+            return None
+        self.rows[code] = values
+        self.updated_at[code] = ticker.get("timestamp") or int(time.time() * 1000)
+        self.version += 1
+        return code
+
+    def get(self, code: str) -> Optional[dict]:
+        values = self.rows.get(code)
+        if values is None:
+            return None
+        korean_name, english_name = self.markets.get(code, ("", ""))
+        symbol = code[len(KRW_PREFIX):] if code.startswith(KRW_PREFIX) else code
+        row = {
+            "code": code,
+            "symbol": symbol,
+            "koreanName": korean_name or symbol,
+            "englishName": english_name or symbol,
+        }
+        row.update(zip(FIELD_NAMES, values))
+        row["timestamp"] = self.updated_at.get(code)
+        return row
+
+    def snapshot(self) -> List[dict]:
+        """전체 시세 - 마지막으로 만든 뒤 바뀐 게 없으면 캐시된 리스트 그대로"""
+        version, rows = self._snapshot
+        if version == self.version:
+            return rows
+        version = self.version
+        rows = [self.get(code) for code in list(self.rows)]
+        self._snapshot = (version, rows)
+        return rows
+
+
+class UpbitTickerFeed(TickerFeed):
+    """Upbit 웹소켓 ticker 구독 - KRW 마켓 전체를 SIMPLE 포맷으로"""
+
+    name = "upbit"
+    url = UPBIT_WS_URL
+
+    def __init__(self, table: TickerTable, on_update: Optional[Callable[[str], None]] = None,
+                 market_loader: Callable[[], List[dict]] = fetch_krw_markets, **kwargs):
+        super().__init__(**kwargs)
+        self.table = table
+        self.on_update = on_update
+        self.market_loader = market_loader
+
+    async def prepare(self):
+        self.table.set_markets(await asyncio.to_thread(self.market_loader))
+
+    def subscription_messages(self):
+        return [json.dumps([
+            {"ticket": f"whyup-{self.name}-{int(time.time())}"},
+            {"type": "ticker", "codes": self.table.codes},
+            {"format": "SIMPLE"},
+        ])]
+
+    def parse(self, data):
+        """ticker 프레임을 테이블에 반영 - 값이 바뀐 경우에만 (심볼, 값, 타임스탬프) 하나"""
+        code = self.table.update(data)
+        if code is None:
+            return []
+        symbol = code[len(KRW_PREFIX):] if code.startswith(KRW_PREFIX) else code
+        return [(symbol, tuple(self.table.rows[code][:6]), self.table.updated_at.get(code))]
+
+    def handle_message(self, raw) -> Optional[str]:
+        """업스트림 프레임 하나 처리 - 바뀐 마켓 코드 반환"""
+        data = normalize_ticker(json.loads(raw))
+        if data.get("type") != "ticker":
+            return None
+        self.messages += 1
+        self.last_message_at = time.time()
+        ticks = self.parse(data)
+        if not ticks:
+            return None
+        if self.on_tick is not None:
+            for symbol, values, timestamp in ticks:
+                self.on_tick(self.name, symbol, values, timestamp)
+        code = data["code"]
+        if self.on_update is not None:
+            self.on_update(code)
+        return code
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "markets": len(self.table.markets),
+            "tickers": len(self.table.rows),
+            "version": self.table.version,
+        }
+
+
+class BithumbTickerFeed(UpbitTickerFeed):
+    """빗썸 v1 웹소켓 - Upbit와 같은 구독/프레임 형식"""
+
+    name = "bithumb"
+    url = BITHUMB_WS_URL
+
+    def __init__(self, table: TickerTable, market_loader: Callable[[], List[dict]] = None, **kwargs):
+        super().__init__(table, market_loader=market_loader or fetch_bithumb_krw_markets, **kwargs)
@@ -3,5 +3,13 @@ from . import views
 
 urlpatterns = [
     path('upbit/market/all', views.upbit_market_all, name='upbit-market-all'),
+    path('tickers', views.tickers, name='tickers'),
+    path('tickers/<str:code>', views.ticker_detail, name='ticker-detail'),
+    path('market', views.market_snapshot, name='market-snapshot'),
+    path('candles', views.candles, name='candles'),
+    path('prices', views.prices, name='prices'),
+    path('top-gainers', views.top_gainers, name='top-gainers'),
+    path('premium', views.premium, name='premium'),
+    path('market/<str:symbol>', views.market_symbol, name='market-symbol'),
 ]
 
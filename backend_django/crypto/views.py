@@ -1,24 +1,187 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
-from rest_framework.response import Response
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 import requests
 import logging
 
+from .candles import INTERVALS
+from .market_list import get_market_list
+from .prices import SORT_FIELDS
+from .ranking import TOP_GAINERS_N
+from .service import get_market_service
+
 logger = logging.getLogger(__name__)
 
+# top-gainers 한 번에 받을 수 있는 최대 개수
+TOP_GAINERS_MAX_N = 100
+# prices 페이지 크기
+PRICES_DEFAULT_LIMIT = 100
+PRICES_MAX_LIMIT = 500
+# candles 한 번에 받을 수 있는 봉 수
+CANDLES_DEFAULT_LIMIT = 200
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def upbit_market_all(request):
-    """Upbit 마켓 목록 프록시"""
+    """Upbit 마켓 목록 프록시 (Redis 캐시, ETag/Last-Modified로 304 응답)"""
     try:
-        response = requests.get('https://api.upbit.com/v1/market/all', timeout=10)
-        response.raise_for_status()
-        return JsonResponse(response.json(), safe=False)
+        entry = get_market_list().get()
     except requests.exceptions.RequestException as e:
         logger.error(f'Upbit API 요청 실패: {e}')
         return JsonResponse(
             {'error': 'Upbit API 요청에 실패했습니다.'},
             status=500
         )
+    response = HttpResponse(entry['body'], content_type='application/json')
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    # 브라우저는 매번 재검증 (바뀌지 않았으면 본문 없이 304)
+    patch_cache_control(response, no_cache=True)
+    return get_conditional_response(
+        request, etag=entry['etag'], last_modified=entry['last_modified'], response=response
+    ) or response
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def tickers(request):
+    """서버가 유지하는 Upbit KRW 마켓 최신 시세 스냅샷 (첫 화면용)"""
+    service = get_market_service()
+    return JsonResponse({
+        'version': service.tickers.version,
+        'tickers': service.tickers.snapshot(),
+        'feed': service.upbit.stats(),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def ticker_detail(request, code):
+    """마켓 하나의 최신 시세 (예: KRW-BTC)"""
+    row = get_market_service().tickers.get(code.upper())
+    if row is None:
+        return JsonResponse({'error': '시세 정보가 없습니다.'}, status=404)
+    return JsonResponse(row)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def market_snapshot(request):
+    """멀티 거래소 시세 스냅샷 (심볼 인덱스 기준 컬럼 형식)
+
+    ?exchange=upbit,binance 로 거래소를 고를 수 있다. 가격은 거래소 호가 통화(quotes) 기준.
+    """
+    engine = get_market_service().engine
+    exchanges = [name for name in request.GET.get('exchange', '').split(',') if name]
+    unknown = [name for name in exchanges if name not in engine.exchange_index]
+    if unknown:
+        return JsonResponse({'error': f'지원하지 않는 거래소입니다: {", ".join(unknown)}'}, status=400)
+    return JsonResponse(engine.snapshot().to_dict(exchanges or None))
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def market_symbol(request, symbol):
+    """심볼 하나의 거래소별 시세 (예: BTC)"""
+    result = get_market_service().engine.symbol(symbol.upper())
+    if result is None:
+        return JsonResponse({'error': '시세 정보가 없습니다.'}, status=404)
+    return JsonResponse(result)
+
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def premium(request):
+    """거래소 쌍별 김치 프리미엄 % (심볼 순서는 symbols 기준)
+
+    ?base=upbit&compare=binance 로 쌍 하나만 고를 수 있다. 없으면 원화 거래소 기준 전체 쌍.
+    """
+    calculator = get_market_service().premium
+    exchanges = calculator.engine.exchange_index
+    base = request.GET.get('base')
+    compare = request.GET.get('compare')
+    if base is None and compare is None:
+        return JsonResponse(calculator.result(calculator.default_pairs()))
+    if base not in exchanges or compare not in exchanges:
+        return JsonResponse({'error': 'base와 compare에 지원하는 거래소를 지정해주세요.'}, status=400)
+    if base == compare:
+        return JsonResponse({'error': 'base와 compare는 서로 달라야 합니다.'}, status=400)
+    return JsonResponse(calculator.result([(base, compare)]))
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def top_gainers(request):
+    """등락률 상위 n개 (?n=5&exchange=upbit) - 서버가 유지하는 순위 인덱스에서 바로 읽음"""
+    gainers = get_market_service().gainers
+    exchange = request.GET.get('exchange', 'upbit')
+    if exchange not in gainers.engine.exchange_index:
+        return JsonResponse({'error': f'지원하지 않는 거래소입니다: {exchange}'}, status=400)
+    try:
+        n = int(request.GET.get('n', TOP_GAINERS_N))
+    except ValueError:
+        return JsonResponse({'error': 'n은 정수여야 합니다.'}, status=400)
+    n = max(1, min(n, TOP_GAINERS_MAX_N))
+    return JsonResponse(gainers.result(exchange, n))
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def prices(request):
+    """정렬된 시세 목록 (?exchange=upbit&sort=volume&order=desc&limit=100&offset=0)
+
+    응답은 행 배열이고 전체 개수는 X-Total-Count 헤더로 준다.
+    정렬 순서는 스냅샷마다 한 번만 계산해서 모든 요청이 공유한다.
+    """
+    price_list = get_market_service().prices
+    exchange = request.GET.get('exchange', 'upbit')
+    sort = request.GET.get('sort', 'changePercent24h')
+    order = request.GET.get('order', 'desc')
+    if exchange not in price_list.engine.exchange_index:
+        return JsonResponse({'error': f'지원하지 않는 거래소입니다: {exchange}'}, status=400)
+    if sort not in SORT_FIELDS:
+        return JsonResponse({'error': f'sort는 {", ".join(SORT_FIELDS)} 중 하나여야 합니다.'}, status=400)
+    if order not in ('asc', 'desc'):
+        return JsonResponse({'error': 'order는 asc 또는 desc여야 합니다.'}, status=400)
+    try:
+        limit = int(request.GET.get('limit', PRICES_DEFAULT_LIMIT))
+        offset = int(request.GET.get('offset', 0))
+    except ValueError:
+        return JsonResponse({'error': 'limit/offset은 정수여야 합니다.'}, status=400)
+    limit = max(1, min(limit, PRICES_MAX_LIMIT))
+    offset = max(0, offset)
+    total, rows = price_list.page(exchange, sort, order == 'desc', offset, limit)
+    response = JsonResponse(rows, safe=False)
+    response['X-Total-Count'] = str(total)
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def candles(request):
+    """서버가 틱으로 만든 OHLCV 봉 (?symbol=BTC&interval=1m&exchange=upbit&limit=200)
+
+    Upbit REST를 호출하지 않고 메모리 링 버퍼에서 바로 읽는다. 오래된 봉부터 반환.
+    """
+    aggregator = get_market_service().candles
+    symbol = request.GET.get('symbol', '').upper()
+    exchange = request.GET.get('exchange', 'upbit')
+    interval = request.GET.get('interval', '1m')
+    if not symbol:
+        return JsonResponse({'error': 'symbol을 지정해주세요.'}, status=400)
+    if exchange not in aggregator.engine.exchange_index:
+        return JsonResponse({'error': f'지원하지 않는 거래소입니다: {exchange}'}, status=400)
+    if interval not in INTERVALS:
+        return JsonResponse({'error': f'interval은 {", ".join(INTERVALS)} 중 하나여야 합니다.'}, status=400)
+    try:
+        limit = int(request.GET.get('limit', CANDLES_DEFAULT_LIMIT))
+    except ValueError:
+        return JsonResponse({'error': 'limit은 정수여야 합니다.'}, status=400)
+    limit = max(1, min(limit, aggregator.capacity + 1))
+    rows = aggregator.candles(exchange, symbol, interval, limit)
+    if rows is None:
+        return JsonResponse({'error': '봉 데이터가 없습니다.'}, status=404)
+    return JsonResponse({'exchange': exchange, 'symbol': symbol, 'interval': interval, 'candles': rows})
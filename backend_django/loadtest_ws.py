@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+WebSocket 채팅 서버 부하 테스트
+asyncio로 클라이언트 N개를 붙이고 일정 속도로 auth/채팅 메시지를 보내면서
+팬아웃 지연(p50/p95/p99), 누락 프레임, 서버 CPU/RSS를 측정해 JSON 리포트로 남긴다
+
+    # 로컬 서버를 직접 띄워서 측정
+    python loadtest_ws.py --spawn --clients 2000 --rate 20 --duration 30 --output report.json
+    # 이미 떠 있는 서버 측정 (CPU/RSS는 --pid를 줄 때만)
+    python loadtest_ws.py --url ws://127.0.0.1:8001/ws --pid 12345
+    # MessagePack 바이너리 프레임으로 같은 부하 (서브프로토콜 "msgpack" 협상)
+    python loadtest_ws.py --spawn --clients 1000 --encoding msgpack --no-deflate
+    # 부하 생성기 자체가 병목이 되지 않도록 클라이언트를 여러 프로세스로 나눔
+    python loadtest_ws.py --spawn --clients 5000 --processes 8
+    # 기록된 틱을 10배속으로 재생하는 서버에 시세 구독자만 붙여서 팬아웃 측정 (채팅 없음)
+    python loadtest_ws.py --spawn --replay ./ticks --replay-speed 10 --path /ws/tickers --subscribe tickers --rate 0
+
+클라이언트 수가 많으면 `ulimit -n`을 충분히 올려야 한다.
+지연 시간은 같은 호스트의 단조 시계(time.monotonic)로 재므로 서버와 같은 머신에서 실행해야 한다.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import jwt
+import websockets
+
+# --encoding msgpack 용 (선택사항)
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# ws_fastapi.verify_token과 같은 기본 키 - 인증 트래픽 생성용
+DEFAULT_SECRET = "django-insecure-eg*x8n7i6f1zw9n_0f8(#$v65@&$0+5$9c0$*-ozlvzeq)95!^"
+MARKER = "lt"
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class ProcessSampler:
+    """/proc에서 서버 프로세스의 CPU 시간, RSS, 소켓 포함 write 바이트를 읽는다 (Linux)"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.rss_samples: List[float] = []
+        self.cpu_start: Optional[float] = None
+        self.cpu_end: Optional[float] = None
+        self.written_start: Optional[int] = None
+        self.written_end: Optional[int] = None
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+
+    def _cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        ticks = os.sysconf(os.sysconf_names["SC_CLK_TCK"])
+        # utime(14), stime(15) - 괄호 뒤부터 세면 11, 12번째
+        return (int(fields[11]) + int(fields[12])) / ticks
+
+    def _written_bytes(self) -> Optional[int]:
+        """write 계열 시스템 콜로 쓴 바이트 (wchar - 소켓 전송 포함, 압축 후 크기)"""
+        try:
+            with open(f"/proc/{self.pid}/io") as f:
+                for line in f:
+                    if line.startswith("wchar:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return None
+
+    def _rss_mb(self) -> float:
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        return 0.0
+
+    def start(self):
+        self.cpu_start = self._cpu_seconds()
+        self.written_start = self._written_bytes()
+        self.started_at = time.monotonic()
+        self.sample()
+
+    def sample(self):
+        try:
+            self.rss_samples.append(self._rss_mb())
+        except OSError:
+            pass
+
+    def stop(self):
+        try:
+            self.cpu_end = self._cpu_seconds()
+        except OSError:
+            self.cpu_end = self.cpu_start
+        self.written_end = self._written_bytes()
+        self.stopped_at = time.monotonic()
+
+    def report(self) -> dict:
+        wall = max(self.stopped_at - self.started_at, 1e-9)
+        cpu = (self.cpu_end or 0) - (self.cpu_start or 0)
+        return {
+            "pid": self.pid,
+            "cpu_seconds": round(cpu, 3),
+            "cpu_percent": round(cpu / wall * 100, 1),
+            "rss_mb_max": round(max(self.rss_samples), 1) if self.rss_samples else None,
+            "rss_mb_last": round(self.rss_samples[-1], 1) if self.rss_samples else None,
+            "written_bytes": self.written_end - self.written_start
+            if self.written_start is not None and self.written_end is not None else None,
+        }
+
+
+class LoadTest:
+    """프로세스 하나가 맡은 클라이언트들 - 0번 워커만 채팅 메시지를 보낸다"""
+
+    def __init__(self, args, clients: int, first_index: int, is_sender: bool):
+        self.args = args
+        self.clients = clients
+        self.first_index = first_index
+        self.is_sender = is_sender
+        self.connections: List = []
+        self.connect_errors = 0
+        self.latencies: List[float] = []
+        self.sent: List[str] = []
+        self.received: Dict[str, int] = {}
+        self.receive_errors = 0
+        self.throttled = 0
+        # 구독한 시세 토픽 프레임 (ticker_snapshot/ticker_delta/top_gainers)
+        self.market_frames = 0
+        self.market_bytes = 0
+        self.seq_gaps = 0
+
+    async def _open(self, index: int, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            try:
+                ws = await websockets.connect(
+                    self.args.url,
+                    open_timeout=30,
+                    max_queue=None,
+                    # 브라우저처럼 기본은 permessage-deflate 협상
+                    compression=None if self.args.no_deflate else "deflate",
+                    subprotocols=["msgpack"] if self.args.encoding == "msgpack" else None,
+                )
+            except Exception:
+                self.connect_errors += 1
+                return
+            if self.args.auth:
+                token = jwt.encode(
+                    {"user_id": index, "exp": int(time.time()) + 3600},
+                    self.args.secret,
+                    algorithm="HS256",
+                )
+                await ws.send(self._encode({"type": "auth", "token": token}))
+            for topic in self.args.subscribe or ():
+                await ws.send(self._encode({"type": "subscribe", "topic": topic}))
+            self.connections.append(ws)
+            asyncio.create_task(self._reader(ws))
+
+    def _encode(self, payload: dict):
+        """협상한 인코딩으로 보낼 프레임 (msgpack이면 바이너리)"""
+        if self.args.encoding == "msgpack":
+            return msgpack.packb(payload)
+        return json.dumps(payload)
+
+    def _handle(self, data, now: float):
+        if isinstance(data, list):
+            for item in data:
+                self._handle(item, now)
+            return
+        if data.get("type") == "message":
+            parts = str(data.get("message", "")).split(":")
+            if len(parts) == 3 and parts[0] == MARKER:
+                message_id = parts[1]
+                self.received[message_id] = self.received.get(message_id, 0) + 1
+                self.latencies.append((now - float(parts[2])) * 1000)
+        elif data.get("type") == "system" and str(data.get("id", "")).startswith("throttle_"):
+            self.throttled += 1
+
+    def _handle_market(self, data, raw, state: dict) -> bool:
+        """시세 프레임이면 집계하고 True - ticker_delta seq가 건너뛰면 누락으로 센다"""
+        kind = data.get("type")
+        if kind not in ("ticker_snapshot", "ticker_delta", "top_gainers"):
+            return False
+        self.market_frames += 1
+        self.market_bytes += len(raw)
+        seq = data.get("seq")
+        if kind == "ticker_delta" and state.get("seq") is not None and seq != state["seq"] + 1:
+            self.seq_gaps += 1
+        if seq is not None and kind != "top_gainers":
+            state["seq"] = seq
+        return True
+
+    async def _reader(self, ws):
+        state: dict = {}
+        try:
+            async for raw in ws:
+                now = time.monotonic()
+                data = msgpack.unpackb(raw) if isinstance(raw, bytes) else json.loads(raw)
+                if isinstance(data, dict):
+                    if data.get("type") == "ping":
+                        await ws.send(self._encode({"type": "pong"}))
+                        continue
+                    if self._handle_market(data, raw, state):
+                        continue
+                self._handle(data, now)
+        except websockets.ConnectionClosed:
+            pass
+        except Exception:
+            self.receive_errors += 1
+
+    async def _sender(self):
+        """전체 초당 rate개 - 보내는 클라이언트를 돌아가며 골라 연결별 속도 제한에 걸리지 않게 한다"""
+        interval = 1 / self.args.rate
+        deadline = time.monotonic() + self.args.duration
+        counter = 0
+        next_at = time.monotonic()
+        while time.monotonic() < deadline and self.connections:
+            ws = self.connections[counter % len(self.connections)]
+            message_id = str(counter)
+            payload = {
+                "type": "message",
+                "user": f"loadtest{counter % len(self.connections)}",
+                "message": f"{MARKER}:{message_id}:{time.monotonic()}",
+            }
+            try:
+                await ws.send(self._encode(payload))
+                self.sent.append(message_id)
+            except websockets.ConnectionClosed:
+                pass
+            counter += 1
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+
+    async def run(self, barrier) -> dict:
+        semaphore = asyncio.Semaphore(self.args.connect_concurrency)
+        started = time.monotonic()
+        await asyncio.gather(*(
+            self._open(self.first_index + i, semaphore) for i in range(self.clients)
+        ))
+        connect_seconds = time.monotonic() - started
+
+        # 모든 워커가 연결을 마친 뒤 동시에 시작
+        await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+        if self.is_sender and self.args.rate > 0:
+            await self._sender()
+        else:
+            await asyncio.sleep(self.args.duration)
+        # 마지막 메시지가 모두 도착할 때까지 대기
+        await asyncio.sleep(self.args.drain)
+
+        await asyncio.gather(*(ws.close() for ws in self.connections), return_exceptions=True)
+        return {
+            "connected": len(self.connections),
+            "connect_errors": self.connect_errors,
+            "connect_seconds": connect_seconds,
+            "sent": self.sent,
+            "received": self.received,
+            "latencies": self.latencies,
+            "throttled": self.throttled,
+            "receive_errors": self.receive_errors,
+            "market_frames": self.market_frames,
+            "market_bytes": self.market_bytes,
+            "seq_gaps": self.seq_gaps,
+        }
+
+
+def run_worker(args, clients: int, first_index: int, is_sender: bool, barrier) -> dict:
+    return asyncio.run(LoadTest(args, clients, first_index, is_sender).run(barrier))
+
+
+def merge_report(args, partials: List[dict], sampler: Optional[ProcessSampler]) -> dict:
+    """워커별 결과를 합쳐 하나의 리포트로 - 전송된 메시지는 연결된 모든 클라이언트가 받아야 한다"""
+    connected = sum(p["connected"] for p in partials)
+    sent = [message_id for p in partials for message_id in p["sent"]]
+    received: Dict[str, int] = {}
+    for p in partials:
+        for message_id, count in p["received"].items():
+            received[message_id] = received.get(message_id, 0) + count
+    expected = len(sent) * connected
+    delivered = sum(min(received.get(message_id, 0), connected) for message_id in sent)
+    latencies = sorted(value for p in partials for value in p["latencies"])
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "config": {
+            "url": args.url,
+            "clients": args.clients,
+            "processes": args.processes,
+            "rate": args.rate,
+            "duration": args.duration,
+            "auth": args.auth,
+            "deflate": not args.no_deflate,
+            "encoding": args.encoding,
+            "subscribe": args.subscribe,
+            "replay": args.replay,
+            "replay_speed": args.replay_speed if args.replay else None,
+        },
+        "connected": connected,
+        "connect_errors": sum(p["connect_errors"] for p in partials),
+        "connect_seconds": round(max(p["connect_seconds"] for p in partials), 2),
+        "messages_sent": len(sent),
+        "expected_deliveries": expected,
+        "delivered": delivered,
+        "dropped": expected - delivered,
+        "drop_rate": round((expected - delivered) / expected, 6) if expected else 0.0,
+        "throttled_notices": sum(p["throttled"] for p in partials),
+        "receive_errors": sum(p["receive_errors"] for p in partials),
+        "latency_ms": {
+            "p50": _round(percentile(latencies, 50)),
+            "p95": _round(percentile(latencies, 95)),
+            "p99": _round(percentile(latencies, 99)),
+            "max": _round(latencies[-1] if latencies else None),
+            "mean": _round(sum(latencies) / len(latencies) if latencies else None),
+        },
+        "market": {
+            "frames": sum(p["market_frames"] for p in partials),
+            "bytes": sum(p["market_bytes"] for p in partials),
+            "frames_per_client": round(sum(p["market_frames"] for p in partials) / connected, 1)
+            if connected else None,
+            "seq_gaps": sum(p["seq_gaps"] for p in partials),
+        },
+        "server": sampler.report() if sampler is not None else None,
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None else None
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def spawn_server(port: int, replay: Optional[str] = None, replay_speed: str = "1") -> subprocess.Popen:
+    """현재 디렉터리의 ws_fastapi를 uvicorn으로 띄우고 /health가 응답할 때까지 대기
+
+    replay를 주면 업스트림 대신 그 디렉터리의 틱 로그를 재생하는 시세 피드로 띄운다 (crypto.replay).
+    """
+    env = dict(os.environ)
+    if replay:
+        env.update({
+            "WS_MARKET_FEED": "true",
+            "CRYPTO_REPLAY_DIR": os.path.abspath(replay),
+            "CRYPTO_REPLAY_SPEED": replay_speed,
+        })
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "ws_fastapi:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+    )
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return process
+        except Exception:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("서버가 시작되지 않았습니다")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket 채팅 서버 부하 테스트")
+    parser.add_argument("--url", default="ws://127.0.0.1:8001/ws")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=10, help="전체 초당 채팅 메시지 수 (0이면 보내지 않음)")
+    parser.add_argument("--duration", type=float, default=20, help="메시지 전송 시간(초)")
+    parser.add_argument("--drain", type=float, default=3, help="전송 후 수신 대기 시간(초)")
+    parser.add_argument("--processes", type=int, default=1, help="클라이언트를 나눠 맡을 프로세스 수")
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--auth", action="store_true", help="연결마다 JWT auth 메시지 전송")
+    parser.add_argument("--no-deflate", action="store_true", help="permessage-deflate 협상 끔")
+    parser.add_argument("--encoding", choices=("json", "msgpack"), default="json",
+                        help="프레임 인코딩 (msgpack은 서브프로토콜로 협상)")
+    parser.add_argument("--secret", default=os.getenv("SECRET_KEY", DEFAULT_SECRET))
+    parser.add_argument("--pid", type=int, help="CPU/RSS를 잴 서버 프로세스 PID")
+    parser.add_argument("--spawn", action="store_true", help="로컬 서버를 직접 띄워서 측정")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--path", default="/ws", help="--spawn 서버의 WebSocket 경로 (시세 구독자는 /ws/tickers)")
+    parser.add_argument("--subscribe", action="append", help="연결마다 구독할 토픽 (예: tickers, gainers-upbit)")
+    parser.add_argument("--replay", help="--spawn 서버가 재생할 틱 로그 디렉터리")
+    parser.add_argument("--replay-speed", default="1", help="재생 배속 (1, 10, 100, max)")
+    parser.add_argument("--output", help="JSON 리포트 저장 경로 (없으면 표준 출력)")
+    args = parser.parse_args()
+    if args.encoding == "msgpack" and msgpack is None:
+        parser.error("--encoding msgpack에는 msgpack 패키지가 필요합니다")
+
+    server = None
+    if args.spawn:
+        server = spawn_server(args.port, args.replay, args.replay_speed)
+        args.url = f"ws://127.0.0.1:{args.port}{args.path}"
+        args.pid = server.pid
+    try:
+        sampler = ProcessSampler(args.pid) if args.pid else None
+        processes = max(1, args.processes)
+        # 워커들 + 측정을 시작할 메인 프로세스
+        manager = multiprocessing.Manager()
+        barrier = manager.Barrier(processes + 1)
+        per_worker = [args.clients // processes + (1 if i < args.clients % processes else 0)
+                      for i in range(processes)]
+        with multiprocessing.Pool(processes) as pool:
+            pending = pool.starmap_async(run_worker, [
+                (args, count, sum(per_worker[:i]), i == 0, barrier)
+                for i, count in enumerate(per_worker)
+            ])
+            barrier.wait()
+            print(f"연결 완료 - {args.duration}s 동안 초당 {args.rate}개 전송", file=sys.stderr)
+            if sampler is not None:
+                sampler.start()
+            while not pending.ready():
+                pending.wait(0.5)
+                if sampler is not None:
+                    sampler.sample()
+            if sampler is not None:
+                sampler.stop()
+            partials = pending.get()
+        report = merge_report(args, partials, sampler)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Post
+from .models import ChatMessage, Post
 
 
 @admin.register(Post)
@@ -21,4 +21,13 @@ class PostAdmin(admin.ModelAdmin):
     readonly_fields = ('view_count', 'created_at', 'updated_at')
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('author')
\ No newline at end of file
+        return super().get_queryset(request).select_related('author')
+
+
+@admin.register(ChatMessage)
+class ChatMessageAdmin(admin.ModelAdmin):
+    """채팅 메시지 관리자 인터페이스"""
+    list_display = ('topic', 'user_name', 'message', 'seq', 'created_at')
+    list_filter = ('topic',)
+    search_fields = ('user_name', 'message')
+    ordering = ('-id',)
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(default='lobby', max_length=32, verbose_name='채팅방')),
+                ('seq', models.BigIntegerField(blank=True, null=True, verbose_name='메시지 순번')),
+                ('user_id', models.BigIntegerField(blank=True, null=True, verbose_name='사용자 ID')),
+                ('user_name', models.CharField(max_length=50, verbose_name='닉네임')),
+                ('message', models.TextField(verbose_name='내용')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='작성일')),
+            ],
+            options={
+                'verbose_name': '채팅 메시지',
+                'verbose_name_plural': '채팅 메시지들',
+                'db_table': 'tb_chat_messages',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['topic', '-id'], name='chat_topic_id_idx')],
+            },
+        ),
+    ]
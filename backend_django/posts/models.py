@@ -35,4 +35,28 @@ class Post(models.Model):
     def increment_view_count(self):
         """조회수 증가"""
         self.view_count += 1
-        self.save(update_fields=['view_count'])
\ No newline at end of file
+        self.save(update_fields=['view_count'])
+
+
+class ChatMessage(models.Model):
+    """실시간 채팅 메시지 - WebSocket 서버가 모아서 일괄 저장 (write-behind)"""
+    topic = models.CharField(max_length=32, default='lobby', verbose_name="채팅방")
+    seq = models.BigIntegerField(blank=True, null=True, verbose_name="메시지 순번")
+    # WebSocket 서버가 검증 없이 일괄 저장하므로 FK 대신 ID만 보관
+    user_id = models.BigIntegerField(blank=True, null=True, verbose_name="사용자 ID")
+    user_name = models.CharField(max_length=50, verbose_name="닉네임")
+    message = models.TextField(verbose_name="내용")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="작성일")
+
+    class Meta:
+        verbose_name = "채팅 메시지"
+        verbose_name_plural = "채팅 메시지들"
+        db_table = "tb_chat_messages"
+        ordering = ['-id']
+        indexes = [
+            # 방별 키셋 페이지네이션: WHERE topic = ? AND id < ? ORDER BY id DESC
+            models.Index(fields=['topic', '-id'], name='chat_topic_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"[{self.topic}] {self.user_name}: {self.message[:30]}"
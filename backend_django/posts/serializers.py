@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Post
+from .models import ChatMessage, Post
 from accounts.serializers import UserSerializer
 
 
@@ -40,3 +40,10 @@ class PostCreateUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
         fields = ('title', 'content', 'summary', 'is_published')
+
+
+class ChatMessageSerializer(serializers.ModelSerializer):
+    """채팅 메시지 시리얼라이저"""
+    class Meta:
+        model = ChatMessage
+        fields = ('id', 'topic', 'seq', 'user_id', 'user_name', 'message', 'created_at')
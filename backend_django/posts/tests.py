@@ -1,3 +1,36 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from posts.models import ChatMessage
+
+
+class ChatHistoryTests(TestCase):
+    url = '/api/posts/chat/messages/'
+
+    def setUp(self):
+        self.client = APIClient()
+        for seq in range(1, 6):
+            ChatMessage.objects.create(topic='lobby', seq=seq, user_name='tester', message=f'msg {seq}')
+        ChatMessage.objects.create(topic='btc', seq=1, user_name='tester', message='other room')
+
+    def test_pages_with_before_until_exhausted(self):
+        response = self.client.get(self.url, {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['message'] for m in response.data['results']], ['msg 5', 'msg 4'])
+        self.assertIsNotNone(response.data['next_before'])
+
+        response = self.client.get(self.url, {'limit': 2, 'before': response.data['next_before']})
+        self.assertEqual([m['message'] for m in response.data['results']], ['msg 3', 'msg 2'])
+
+        response = self.client.get(self.url, {'limit': 2, 'before': response.data['next_before']})
+        self.assertEqual([m['message'] for m in response.data['results']], ['msg 1'])
+        self.assertIsNone(response.data['next_before'])
+
+    def test_filters_by_topic(self):
+        response = self.client.get(self.url, {'topic': 'btc'})
+        self.assertEqual(response.data['topic'], 'btc')
+        self.assertEqual([m['message'] for m in response.data['results']], ['other room'])
+
+    def test_invalid_limit_or_before_returns_400(self):
+        self.assertEqual(self.client.get(self.url, {'limit': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'before': 'x'}).status_code, 400)
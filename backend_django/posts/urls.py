@@ -1,10 +1,11 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
-from posts.views import PostViewSet
+from posts.views import PostViewSet, chat_history
 
 router = DefaultRouter()
 router.register(r'', PostViewSet, basename='post')
 
 urlpatterns = [
+    path('chat/messages/', chat_history, name='chat-history'),
     path('', include(router.urls)),
 ]
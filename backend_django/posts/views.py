@@ -1,10 +1,10 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
-from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.decorators import action, api_view, permission_classes
 from django.shortcuts import get_object_or_404
-from posts.models import Post
-from posts.serializers import PostSerializer, PostCreateUpdateSerializer
+from posts.models import ChatMessage, Post
+from posts.serializers import ChatMessageSerializer, PostSerializer, PostCreateUpdateSerializer
 from accounts.models import User
 
 class PostViewSet(viewsets.ModelViewSet):
@@ -64,4 +64,39 @@ class PostViewSet(viewsets.ModelViewSet):
             return self.get_paginated_response(serializer.data)
 
         serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+CHAT_HISTORY_DEFAULT_LIMIT = 50
+CHAT_HISTORY_MAX_LIMIT = 200
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def chat_history(request):
+    """채팅 기록 (최신순 키셋 페이지네이션)
+
+    ?topic=lobby&limit=50 으로 첫 페이지를 받고, 다음 페이지는 응답의 next_before를
+    before로 넘긴다. OFFSET 없이 (topic, id) 인덱스만 타므로 깊은 페이지도 비용이 같다.
+    """
+    topic = request.query_params.get('topic', 'lobby')
+    try:
+        limit = int(request.query_params.get('limit', CHAT_HISTORY_DEFAULT_LIMIT))
+        before = request.query_params.get('before')
+        before = int(before) if before else None
+    except ValueError:
+        return Response({"detail": "limit/before는 정수여야 합니다"}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, CHAT_HISTORY_MAX_LIMIT))
+
+    queryset = ChatMessage.objects.filter(topic=topic)
+    if before is not None:
+        queryset = queryset.filter(id__lt=before)
+    # 다음 페이지 존재 여부를 알기 위해 하나 더 조회
+    messages = list(queryset.order_by('-id')[:limit + 1])
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    return Response({
+        "topic": topic,
+        "results": ChatMessageSerializer(messages, many=True).data,
+        "next_before": messages[-1].id if has_more else None,
+    })
@@ -0,0 +1,335 @@
+import asyncio
+import json
+import math
+import os
+import time
+
+import numpy as np
+import pytest
+from django.core.cache.backends.locmem import LocMemCache
+
+from crypto.apps import is_server_process
+from crypto.candles import CandleAggregator
+from crypto.engine import MarketEngine
+from crypto.market_list import MarketListCache
+from crypto.feeds import BinanceTickerFeed, BybitTickerFeed
+from crypto.premium import PremiumCalculator
+from crypto.prices import PriceList
+from crypto.ranking import GainersIndex
+from crypto.replay import parse_speed
+from crypto.service import MarketService
+from crypto.ticklog import RECORD, TickLog, TickRecorder
+from crypto.upbit_feed import TickerTable, UpbitTickerFeed
+
+MARKETS = [
+    {"market": "KRW-BTC", "korean_name": "비트코인", "english_name": "Bitcoin"},
+    {"market": "KRW-ETH", "korean_name": "이더리움", "english_name": "Ethereum"},
+]
+
+
+def simple_ticker(code, price, rate=0.01):
+    """Upbit SIMPLE 포맷 ticker 프레임"""
+    return json.dumps({
+        "ty": "ticker", "cd": code, "tp": price, "scp": price * rate, "scr": rate,
+        "atp24h": 1e9, "hp": price * 1.1, "lp": price * 0.9, "h52wp": price * 2, "l52wp": price / 2,
+        "tms": 1700000000000,
+    })
+
+
+# 업스트림 프레임 → 최신 시세 테이블, 같은 값이면 변경으로 치지 않음
+def test_ticker_table_keeps_latest_values():
+    table = TickerTable()
+    table.set_markets(MARKETS)
+    changed = []
+    feed = UpbitTickerFeed(table, on_update=changed.append, market_loader=lambda: MARKETS)
+
+    feed.handle_message(simple_ticker("KRW-BTC", 100.0))
+    feed.handle_message(simple_ticker("KRW-ETH", 10.0))
+    snapshot = table.snapshot()
+    assert table.snapshot() is snapshot
+    feed.handle_message(simple_ticker("KRW-BTC", 100.0))
+    feed.handle_message(simple_ticker("KRW-BTC", 101.0))
+
+    assert changed == ["KRW-BTC", "KRW-ETH", "KRW-BTC"]
+    assert table.snapshot() is not snapshot
+    btc = table.get("KRW-BTC")
+    assert btc["symbol"] == "BTC" and btc["koreanName"] == "비트코인"
+    assert btc["price"] == 101.0
+    assert btc["changePercent24h"] == 1.0
+
+
+# 네 거래소 피드가 심볼 인덱스 하나를 공유하는 컬럼 배열로 정규화됨
+def test_market_engine_normalises_feeds():
+    engine = MarketEngine(capacity=2)
+    table = TickerTable()
+    table.set_markets(MARKETS)
+    UpbitTickerFeed(table, on_tick=engine.on_tick).handle_message(simple_ticker("KRW-BTC", 100.0))
+    BinanceTickerFeed(on_tick=engine.on_tick).handle_message(json.dumps([
+        {"s": "BTCUSDT", "c": "0.07", "p": "0.001", "P": "1.5", "q": "1000", "h": "0.08", "l": "0.06", "E": 1},
+        {"s": "ETHBTC", "c": "0.05"},
+        {"s": "ETHUSDT", "c": "0.007"},
+        {"s": "XRPUSDT", "c": "0.0005"},
+    ]))
+    BybitTickerFeed(lambda: ["BTC"], on_tick=engine.on_tick).handle_message(json.dumps({
+        "topic": "tickers.BTCUSDT", "ts": 2, "data": {
+            "symbol": "BTCUSDT", "lastPrice": "0.071", "prevPrice24h": "0.07", "price24hPcnt": "0.0142",
+            "turnover24h": "10", "highPrice24h": "0.072", "lowPrice24h": "0.069",
+        },
+    }))
+
+    # 용량 2에서 심볼 3개 → 배열이 늘어나도 기존 값 유지
+    assert engine.symbols == ["BTC", "ETH", "XRP"]
+    snapshot = engine.snapshot()
+    assert engine.snapshot() is snapshot
+    assert snapshot.columns["price"].shape == (4, 3)
+    upbit, bithumb, binance, bybit = range(4)
+    assert snapshot.columns["price"][upbit, 0] == 100.0
+    assert snapshot.columns["price"][binance, 2] == 0.0005
+    assert math.isnan(snapshot.columns["price"][bithumb, 0])
+    assert abs(snapshot.columns["change_percent"][bybit, 0] - 1.42) < 1e-9
+
+    # 같은 값이면 버전이 오르지 않음
+    version = engine.version
+    assert not engine.update("binance", "ETH", (0.007, None, None, None, None, None))
+    assert engine.version == version
+
+    btc = engine.symbol("BTC")
+    assert set(btc["exchanges"]) == {"upbit", "binance", "bybit"}
+    assert btc["exchanges"]["binance"]["quote"] == "USDT"
+    assert snapshot.to_dict(["upbit"])["data"]["upbit"]["price"] == [100.0, None, None]
+
+
+# 환율로 원화 환산한 프리미엄, 틱이 들어온 심볼 열만 다시 계산
+def test_premium_recomputes_changed_symbols():
+    engine = MarketEngine()
+    empty = (None,) * 5
+    engine.update("upbit", "BTC", (100_000.0,) + empty)
+    engine.update("upbit", "ETH", (5_000.0,) + empty)
+    engine.update("binance", "BTC", (80.0,) + empty)
+    engine.update("binance", "ETH", (4.0,) + empty)
+    calculator = PremiumCalculator(engine, rate=1_000.0)
+
+    result = calculator.result([("upbit", "binance"), ("binance", "upbit")])
+    assert result["symbols"] == ["BTC", "ETH"]
+    assert result["premium"]["upbit/binance"] == [25.0, 25.0]
+    assert result["premium"]["binance/upbit"] == [-20.0, -20.0]
+    assert calculator.full_updates == 1
+
+    engine.update("binance", "ETH", (5.0,) + empty)
+    assert calculator.result([("upbit", "binance")])["premium"]["upbit/binance"] == [25.0, 0.0]
+    assert (calculator.full_updates, calculator.incremental_updates) == (1, 1)
+    # 빗썸 시세가 없으면 None
+    assert calculator.result([("upbit", "bithumb")])["premium"]["upbit/bithumb"] == [None, None]
+
+    # 고정 환율이 없으면 Upbit KRW-USDT 시세를 쓰고, 환율이 바뀌면 전체 재계산
+    calculator = PremiumCalculator(engine, rate=None)
+    assert calculator.result([("upbit", "binance")])["premium"]["upbit/binance"] == [None, None]
+    engine.update("upbit", "USDT", (1_250.0,) + empty)
+    result = calculator.result([("upbit", "binance")])
+    assert result["usd_krw"] == 1_250.0
+    assert result["premium"]["upbit/binance"][:2] == [0.0, -20.0]
+    assert calculator.full_updates == 2
+
+
+# 상승률 순위: 상위 N개의 구성이나 순서가 바뀔 때만 알림
+def test_gainers_index_notifies_only_on_top_n_changes():
+    engine = MarketEngine()
+    events = []
+    gainers = GainersIndex(engine, push_n=2, on_change=events.append)
+
+    def tick(exchange, symbol, change_percent, price=1.0):
+        engine.update(exchange, symbol, (price, None, change_percent, None, None, None))
+
+    tick("upbit", "AAA", 5.0)
+    tick("upbit", "BBB", 3.0)
+    tick("upbit", "CCC", 1.0)
+    assert events == ["upbit", "upbit"]
+    # 3위 안에서만 움직이거나, 1위가 값만 바뀌면 알림 없음
+    tick("upbit", "CCC", 2.0)
+    tick("upbit", "AAA", 5.5)
+    assert events == ["upbit", "upbit"]
+    tick("upbit", "CCC", 4.0, price=7.0)
+    tick("binance", "AAA", 1.0)
+    assert events == ["upbit", "upbit", "upbit", "binance"]
+
+    assert gainers.top("upbit", 3) == [
+        {"symbol": "AAA", "change_percent": 5.5, "price": 1.0},
+        {"symbol": "CCC", "change_percent": 4.0, "price": 7.0},
+        {"symbol": "BBB", "change_percent": 3.0, "price": 1.0},
+    ]
+    # 등락률이 없어지면 순위에서 빠짐
+    tick("upbit", "AAA", None)
+    assert [row["symbol"] for row in gainers.top("upbit", 5)] == ["CCC", "BBB"]
+    assert events[-1] == "upbit"
+
+
+# 정렬 순서는 스냅샷마다 한 번만 계산하고 페이지 요청끼리 공유
+def test_price_list_shares_orderings_per_snapshot():
+    engine = MarketEngine()
+    for symbol, price, volume in [("BTC", 100.0, 5.0), ("ETH", 10.0, None), ("XRP", 1.0, 9.0)]:
+        engine.update("upbit", symbol, (price, None, None, volume, None, None))
+    engine.update("binance", "SOL", (3.0, None, None, 1.0, None, None))
+    prices = PriceList(engine, max_age_ms=0)
+
+    total, rows = prices.page("upbit", "volume", True, 0, 10)
+    assert total == 3
+    # 값이 없는 ETH는 방향과 관계없이 맨 뒤
+    assert [row["symbol"] for row in rows] == ["XRP", "BTC", "ETH"]
+    assert rows[2]["volume"] is None
+    assert [row["symbol"] for row in prices.page("upbit", "volume", False, 0, 10)[1]] == ["BTC", "XRP", "ETH"]
+    assert [row["symbol"] for row in prices.page("upbit", "symbol", True, 1, 1)[1]] == ["ETH"]
+    for offset in range(3):
+        prices.page("upbit", "volume", True, offset, 1)
+    assert prices.sorts == 3
+
+    # 버전이 바뀌면 다시 정렬
+    engine.update("upbit", "ETH", (10.0, None, None, 7.0, None, None))
+    assert [row["symbol"] for row in prices.page("upbit", "volume", True, 0, 2)[1]] == ["XRP", "ETH"]
+    assert prices.sorts == 4
+
+
+# 틱 → 1분/5분 봉, 링 버퍼는 마감된 봉 최근 capacity개 + 진행 중인 봉 하나만 유지
+def test_candle_aggregator_builds_bars_in_ring_buffer():
+    engine = MarketEngine()
+    aggregator = CandleAggregator(engine, exchanges="upbit", capacity=3)
+    hour = 1_699_999_200  # 정시
+
+    def tick(price, volume, second):
+        engine.update("upbit", "BTC", (price, None, None, volume, None, None), (hour + second) * 1000)
+
+    tick(100.0, 1000.0, 0)
+    tick(105.0, 1010.0, 10)
+    tick(95.0, 1015.0, 59)
+    tick(101.0, 1005.0, 61)   # 24시간 누적이 줄면 거래대금 0
+    tick(50.0, 2000.0, 30)    # 이미 지난 구간의 늦은 틱은 버림
+    engine.update("binance", "BTC", (1.0, None, None, None, None, None), 0)
+
+    assert aggregator.candles("upbit", "BTC", "1m", 10) == [
+        {"timestamp": hour * 1000, "open": 100.0, "high": 105.0, "low": 95.0, "close": 95.0, "volume": 15.0},
+        {"timestamp": (hour + 60) * 1000, "open": 101.0, "high": 101.0, "low": 101.0, "close": 101.0, "volume": 0.0},
+    ]
+    five = aggregator.candles("upbit", "BTC", "5m", 10)
+    assert len(five) == 1 and five[0]["low"] == 50.0 and five[0]["close"] == 50.0
+    assert aggregator.candles("binance", "BTC", "1m", 10) is None
+
+    for minute in range(2, 6):
+        tick(200.0 + minute, 3000.0, minute * 60)
+    bars = aggregator.candles("upbit", "BTC", "1m", 10)
+    assert [bar["timestamp"] - hour * 1000 for bar in bars] == [120_000, 180_000, 240_000, 300_000]
+    assert [bar["close"] for bar in aggregator.candles("upbit", "BTC", "1m", 2)] == [204.0, 205.0]
+
+
+# 틱 기록: 크기로 세그먼트를 나누고, memmap으로 시각 범위만 읽음
+def test_tick_log_rolls_segments_and_scans_ranges(tmp_path):
+    table = TickerTable()
+    table.set_markets(MARKETS)
+    recorder = TickRecorder(str(tmp_path), segment_bytes=RECORD.itemsize * 4, tickers=table)
+    for n in range(10):
+        recorder.append(n % 2, "BTC" if n % 3 else "DOGE", 100.0 + n, 5.0, timestamp=1_000 + n)
+    recorder.close()
+
+    log = TickLog(str(tmp_path))
+    assert log.stats()["segments"] == 3
+    assert log.stats()["records"] == 10
+    assert os.path.getsize(next(tmp_path.glob("ticks-00000000-1000.bin"))) == RECORD.itemsize * 4
+    chunks = list(log.scan(1_003, 1_008))
+    assert [len(chunk) for chunk in chunks] == [1, 4]
+    assert [int(t) for chunk in chunks for t in chunk["timestamp"]] == [1_003, 1_004, 1_005, 1_006, 1_007]
+    assert isinstance(chunks[0], np.memmap)
+    assert [log.symbol(int(i)) for i in chunks[1]["symbol"]] == ["BTC", "BTC", "DOGE", "BTC"]
+    # 마켓 코드는 Upbit 마켓 목록에 있는 심볼만
+    assert log.symbols.symbols == ["DOGE", "BTC"]
+    assert log.symbols.codes == [None, "KRW-BTC"]
+
+    # 재시작해도 심볼 id와 세그먼트 번호가 이어짐
+    recorder = TickRecorder(str(tmp_path))
+    # 기록 중인 디렉터리는 다른 기록기가 잠금을 얻지 못함
+    with pytest.raises(BlockingIOError):
+        TickRecorder(str(tmp_path))
+    recorder.append(2, "DOGE", 1.0, 0.0, timestamp=2_000)
+    recorder.close()
+    last = list(TickLog(str(tmp_path)).scan(2_000))
+    assert int(last[0]["symbol"][0]) == log.symbols.ids["DOGE"]
+    assert (tmp_path / "ticks-00000003-2000.bin").exists()
+
+
+# 재생: 기록된 틱이 라이브와 같은 경로로 테이블/엔진/캔들에 들어가고, 몇 번을 돌려도 같은 상태
+def test_replay_feeds_recorded_ticks_through_pipeline(tmp_path):
+    table = TickerTable()
+    table.set_markets(MARKETS)
+    recorder = TickRecorder(str(tmp_path), tickers=table)
+    hour = 1_699_999_200_000
+    for n in range(20):
+        recorder.append(0, "BTC", 100.0 + n, 1000.0 + n, timestamp=hour + n * 10_000)
+        recorder.append(2, "BTC", 0.07 + n / 1000, float("nan"), timestamp=hour + n * 10_000 + 1)
+    recorder.close()
+
+    def replay():
+        service = MarketService(enabled=True, replay_dir=str(tmp_path), replay_speed=parse_speed("max"))
+        updates = []
+        service.upbit.on_update = updates.append
+        asyncio.run(service.run())
+        return service, updates
+
+    service, updates = replay()
+    assert service.feeds[0].stats()["replayed"] == 40
+    assert service.feeds[0].finished
+    assert len(updates) == 20
+    assert service.tickers.get("KRW-BTC")["price"] == 119.0
+    assert service.tickers.get("KRW-BTC")["timestamp"] == hour + 190_000
+    engine = service.engine
+    assert engine.columns["price"][engine.exchange_index["binance"], engine.symbol_index["BTC"]] == 0.07 + 19 / 1000
+    bars = service.candles.candles("upbit", "BTC", "1m", 10)
+    assert [bar["open"] for bar in bars] == [100.0, 106.0, 112.0, 118.0]
+    assert service.recorder is None
+
+    again, _ = replay()
+    assert again.engine.snapshot().columns["price"].tobytes() == engine.snapshot().columns["price"].tobytes()
+    assert again.candles.candles("upbit", "BTC", "1m", 10) == bars
+
+
+# 마켓 목록 캐시: TTL이 지나면 이전 목록을 바로 주고 백그라운드에서 갱신, 본문이 같으면 ETag 유지
+def test_market_list_cache_serves_stale_while_refreshing():
+    bodies = [json.dumps(MARKETS), json.dumps(MARKETS), json.dumps(MARKETS[:1])]
+    list_cache = MarketListCache(LocMemCache("market-list-test", {}), fetch=lambda: bodies.pop(0), ttl=60)
+
+    first = list_cache.get()
+    assert list_cache.get() == first
+    assert list_cache.fetches == 1
+
+    def expire_and_refresh():
+        entry = list_cache.cache.get("crypto:upbit_market_all")
+        entry["fetched_at"] -= 61
+        list_cache.cache.set("crypto:upbit_market_all", entry)
+        assert list_cache.get()["fetched_at"] == entry["fetched_at"]
+        for _ in range(100):
+            if list_cache.cache.get("crypto:upbit_market_all")["fetched_at"] != entry["fetched_at"]:
+                break
+            time.sleep(0.01)
+        return list_cache.get()
+
+    same = expire_and_refresh()
+    assert list_cache.fetches == 2 and list_cache.background_refreshes == 1
+    assert (same["etag"], same["last_modified"]) == (first["etag"], first["last_modified"])
+    changed = expire_and_refresh()
+    assert changed["etag"] != first["etag"] and json.loads(changed["body"]) == MARKETS[:1]
+
+
+# 시세 수집은 실제 서버 프로세스에서만 시작 (리로더 감시 프로세스/관리 명령/ws_fastapi 제외)
+def test_market_service_starts_only_in_server_process(monkeypatch):
+    monkeypatch.delenv("RUN_MAIN", raising=False)
+    cases = [
+        (["manage.py", "migrate"], None, False),
+        (["manage.py", "runserver"], None, False),
+        (["manage.py", "runserver"], "true", True),
+        (["manage.py", "runserver", "--noreload"], None, True),
+        (["/usr/bin/gunicorn", "whyup.wsgi"], None, True),
+        (["ws_fastapi.py"], None, False),
+    ]
+    for argv, run_main, expected in cases:
+        monkeypatch.setattr("sys.argv", argv)
+        if run_main is None:
+            monkeypatch.delenv("RUN_MAIN", raising=False)
+        else:
+            monkeypatch.setenv("RUN_MAIN", run_main)
+        assert is_server_process() is expected, argv
@@ -0,0 +1,913 @@
+import asyncio
+import json
+import time
+
+import jwt
+import pytest
+
+from ws_backplane import InMemoryBackplane, InMemoryHub, RedisBackplane
+from ws_fastapi import (
+    ChatHistory, ConnectionManager, RateLimiter, TickerRelay, TokenBucket, TokenCache, WriteBehindBuffer,
+)
+
+
+class FakeWebSocket:
+    """전송된 프레임만 기록하는 가짜 WebSocket - delay만큼 늦게 보내는 느린 클라이언트도 흉내"""
+
+    def __init__(self, delay=0.0):
+        self.frames = []
+        self.closed = False
+        self.delay = delay
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+    async def send_text(self, message):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.frames.append(message)
+
+    async def send_bytes(self, message):
+        self.frames.append(message)
+
+
+# 레지스트리: 연결/해제는 소켓 키로 O(1), 같은 소켓을 두 번 등록하지 않음
+def test_registry_tracks_connections_and_users():
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=1000)
+        sockets = [FakeWebSocket() for _ in range(1000)]
+        for ws in sockets:
+            await manager.connect(ws)
+        await manager.connect(sockets[0])
+        user_ws = FakeWebSocket()
+        await manager.connect(user_ws, user_id="7")
+        for ws in sockets[::2]:
+            manager.disconnect(ws)
+        manager.disconnect(user_ws, "7")
+        return manager, sockets
+
+    manager, sockets = asyncio.run(run())
+    assert set(manager.active_connections) == set(sockets[1::2])
+    assert manager.user_connections == {}
+
+
+# 브로드캐스트: 느린 소켓이 있어도 나머지 연결에는 바로 전달 (소켓별로 따로 전송)
+def test_broadcast_fans_out_without_waiting_for_slow_socket():
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=1000, send_timeout=5)
+        slow = FakeWebSocket(delay=0.5)
+        fast = [FakeWebSocket() for _ in range(50)]
+        for ws in [slow] + fast:
+            await manager.connect(ws)
+        await manager.broadcast_json({"type": "message", "message": "hi"})
+        await asyncio.sleep(0.02)
+        delivered = [ws for ws in fast if any('"hi"' in f for f in ws.frames)]
+        for client in manager.active_connections.values():
+            client.stop()
+        return delivered, fast
+
+    delivered, fast = asyncio.run(run())
+    assert delivered == fast
+
+
+async def connect_stalled(manager, delay=10.0):
+    """첫 프레임(접속자 수)을 보내다 멈춘 클라이언트 - 이후 프레임은 송신 큐에 쌓임
+
+    큐에는 접속 직후의 접속자 수 브로드캐스트 하나가 남아 있다.
+    """
+    ws = FakeWebSocket(delay=delay)
+    await manager.connect(ws)
+    await asyncio.sleep(0.01)
+    return ws, manager.active_connections[ws]
+
+
+def queued_messages(client):
+    return [json.loads(payload).get("message") for _, payload in client.queue]
+
+
+# drop_oldest: 큐가 가득 차면 가장 오래된 프레임부터 버림
+def test_overflow_drop_oldest_keeps_latest_frames():
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=1000, max_queue=3,
+                                    overflow_policy="drop_oldest", send_timeout=30)
+        ws, client = await connect_stalled(manager)
+        for i in range(6):
+            await manager.broadcast_json({"type": "message", "message": f"m{i}"})
+        return manager, ws, client, queued_messages(client)
+
+    manager, ws, client, queued = asyncio.run(run())
+    assert queued == ["m3", "m4", "m5"]
+    # 접속자 수 프레임 + m0~m2
+    assert client.dropped == 4
+    assert ws in manager.active_connections
+
+
+# disconnect: 큐가 넘친 느린 소비자는 연결을 끊음
+def test_overflow_disconnect_evicts_slow_consumer():
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=1000, max_queue=2,
+                                    overflow_policy="disconnect", send_timeout=30)
+        slow, _ = await connect_stalled(manager)
+        fast = FakeWebSocket()
+        await manager.connect(fast)
+        await asyncio.sleep(0.01)
+        for i in range(3):
+            await manager.broadcast_json({"type": "message", "message": f"m{i}"})
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.01)
+        return manager, slow, fast
+
+    manager, slow, fast = asyncio.run(run())
+    assert list(manager.active_connections) == [fast]
+    assert slow.closed
+    assert sum('"message"' in f for f in fast.frames) == 3
+
+
+# conflate: 아직 보내지 못한 접속자 수 프레임은 최신 값 하나로 교체, 채팅은 그대로
+def test_overflow_conflate_replaces_pending_user_count():
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=1000, max_queue=10,
+                                    overflow_policy="conflate", send_timeout=30)
+        _, client = await connect_stalled(manager)
+        for count in (2, 3, 4):
+            await manager.broadcast_user_count(count)
+            await manager.broadcast_json({"type": "message", "message": f"after {count}"})
+        return [json.loads(payload) for _, payload in client.queue]
+
+    queued = asyncio.run(run())
+    counts = [frame["count"] for frame in queued if frame["type"] == "user_count"]
+    assert counts == [4]
+    assert [frame["message"] for frame in queued if frame["type"] == "message"] == [
+        "after 2", "after 3", "after 4"
+    ]
+
+
+# 배치 모드에서도 접속자 수 프레임은 채팅 배열에 섞이지 않고 큐에서 교체됨
+def test_batching_keeps_user_count_conflated():
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=1000, max_queue=10, overflow_policy="conflate",
+                                    send_timeout=30, batch_window_ms=20)
+        _, client = await connect_stalled(manager)
+        for count in (2, 3, 4):
+            await manager.broadcast_user_count(count)
+            await manager.broadcast_json({"type": "message", "message": f"after {count}"})
+        await asyncio.sleep(0.05)
+        return [(kind, json.loads(payload)) for kind, payload in client.queue]
+
+    queued = asyncio.run(run())
+    counts = [frame["count"] for kind, frame in queued if kind == "user_count"]
+    assert counts == [4]
+    batches = [frame for kind, frame in queued if kind == "message"]
+    assert len(batches) == 1
+    assert [item["message"] for item in batches[0]] == ["after 2", "after 3", "after 4"]
+
+
+# 전송 제한 시간을 넘긴 소켓은 제거되고 다른 연결은 계속 받음
+def test_send_timeout_evicts_stalled_socket():
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=1000, send_timeout=0.05)
+        stalled = FakeWebSocket(delay=1.0)
+        healthy = FakeWebSocket()
+        for ws in (stalled, healthy):
+            await manager.connect(ws)
+        await asyncio.sleep(0.1)
+        await manager.broadcast_json({"type": "message", "message": "still here"})
+        await asyncio.sleep(0.01)
+        return manager, stalled, healthy
+
+    manager, stalled, healthy = asyncio.run(run())
+    assert list(manager.active_connections) == [healthy]
+    assert stalled.closed
+    assert any('"still here"' in f for f in healthy.frames)
+
+
+# 브로드캐스트 프레임은 한 번만 인코딩하고 모든 수신자가 같은 문자열을 받음
+def test_broadcast_encodes_payload_once(monkeypatch):
+    import ws_fastapi
+
+    calls = []
+
+    def counting_dumps(obj):
+        calls.append(obj)
+        return ws_fastapi.json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=1000)
+        sockets = [FakeWebSocket() for _ in range(20)]
+        for ws in sockets:
+            await manager.connect(ws)
+        await asyncio.sleep(0.01)
+        monkeypatch.setattr(ws_fastapi, "json_dumps", counting_dumps)
+        await manager.broadcast_json({"type": "message", "message": "한 번만"})
+        await asyncio.sleep(0.01)
+        return sockets
+
+    sockets = asyncio.run(run())
+    assert len(calls) == 1
+    frames = [ws.frames[-1] for ws in sockets]
+    assert all(frame is frames[0] for frame in frames)
+
+
+# 선택된 JSON 백엔드: 공백 없는 출력, 한글은 이스케이프하지 않음, 같은 백엔드로 파싱
+def test_json_backend_round_trip():
+    import ws_fastapi
+
+    assert ws_fastapi.JSON_BACKEND in ("orjson", "msgspec", "json")
+    frame = ws_fastapi.json_dumps({"type": "message", "message": "안녕", "seq": 1})
+    assert isinstance(frame, str)
+    assert frame == '{"type":"message","message":"안녕","seq":1}'
+    assert ws_fastapi.json_loads(frame) == {"type": "message", "message": "안녕", "seq": 1}
+
+
+class NegotiationSocket:
+    """negotiate_encoding이 보는 부분만 (제안한 서브프로토콜, 쿼리 파라미터)"""
+
+    def __init__(self, subprotocols=(), query=None):
+        self.scope = {"subprotocols": list(subprotocols)}
+        self.query_params = query or {}
+
+
+# 인코딩 협상: 서브프로토콜 > ?encoding= > JSON 기본, msgpack이 없으면 JSON으로
+def test_negotiate_encoding(monkeypatch):
+    pytest.importorskip("msgpack")
+    import ws_fastapi
+    from ws_fastapi import negotiate_encoding
+
+    assert negotiate_encoding(NegotiationSocket(["msgpack"])) == ("msgpack", "msgpack")
+    assert negotiate_encoding(NegotiationSocket(["json", "msgpack"])) == ("msgpack", "msgpack")
+    assert negotiate_encoding(NegotiationSocket(query={"encoding": "msgpack"})) == ("msgpack", None)
+    assert negotiate_encoding(NegotiationSocket(["json"])) == ("json", "json")
+    assert negotiate_encoding(NegotiationSocket()) == ("json", None)
+    assert negotiate_encoding(NegotiationSocket(query={"encoding": "cbor"})) == ("json", None)
+
+    monkeypatch.setattr(ws_fastapi, "msgpack", None)
+    assert negotiate_encoding(NegotiationSocket(["msgpack"])) == ("json", None)
+    assert negotiate_encoding(NegotiationSocket(["msgpack", "json"])) == ("json", "json")
+    assert negotiate_encoding(NegotiationSocket(query={"encoding": "msgpack"})) == ("json", None)
+
+
+# 브로드캐스트당 MessagePack 변환은 한 번 - 모든 msgpack 연결이 같은 바이트를 받음
+def test_broadcast_shares_one_msgpack_frame(monkeypatch):
+    msgpack = pytest.importorskip("msgpack")
+    import ws_fastapi
+
+    conversions = []
+    original = ws_fastapi.json_to_msgpack
+
+    def counting(frame):
+        conversions.append(frame)
+        return original(frame)
+
+    monkeypatch.setattr(ws_fastapi, "json_to_msgpack", counting)
+
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=1000, batch_window_ms=0)
+        binary = [FakeWebSocket() for _ in range(3)]
+        text = FakeWebSocket()
+        for ws in binary:
+            await manager.connect(ws, encoding="msgpack")
+        await manager.connect(text)
+        # 접속 직후의 접속자 수 브로드캐스트가 끝난 뒤부터 셈
+        await asyncio.sleep(0.01)
+        for ws in binary + [text]:
+            ws.frames.clear()
+        conversions.clear()
+        await manager.broadcast_json({"type": "message", "message": "hi"})
+        await asyncio.sleep(0.01)
+        return binary, text
+
+    binary, text = asyncio.run(run())
+    assert len(conversions) == 1
+    frames = [ws.frames[-1] for ws in binary]
+    assert all(frame is frames[0] for frame in frames)
+    assert msgpack.unpackb(frames[0]) == {"type": "message", "message": "hi"}
+    assert json.loads(text.frames[-1]) == {"type": "message", "message": "hi"}
+
+
+def count_user_count_frames(sockets):
+    return sum(1 for ws in sockets for frame in ws.frames if '"user_count"' in frame)
+
+
+# 5천 명 재접속 폭주 시 접속자 수 프레임 수 측정
+def test_presence_coalesces_reconnect_wave():
+    clients = 5000
+    batch = 250
+    interval_ms = 50
+
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=interval_ms)
+        first_wave = [FakeWebSocket() for _ in range(clients)]
+        for ws in first_wave:
+            await manager.connect(ws)
+        await asyncio.sleep(interval_ms / 1000 * 2)
+
+        # 배포 직후처럼 전원 해제 후 배치 단위로 재접속
+        for ws in first_wave:
+            manager.disconnect(ws)
+        second_wave = [FakeWebSocket() for _ in range(clients)]
+        started = asyncio.get_running_loop().time()
+        for i in range(0, clients, batch):
+            for ws in second_wave[i:i + batch]:
+                await manager.connect(ws)
+            await asyncio.sleep(0.005)
+        elapsed = asyncio.get_running_loop().time() - started
+        await asyncio.sleep(interval_ms / 1000 * 2)
+        return manager, second_wave, elapsed
+
+    manager, sockets, elapsed = asyncio.run(run())
+    frames = count_user_count_frames(sockets)
+    # 접속/해제마다 브로드캐스트하면 약 N²/2 프레임
+    naive = clients * (clients + 1) // 2
+    # 합치면 연결당 개인 프레임 1개 + 간격당 전체 브로드캐스트 1회
+    ticks = int(elapsed * 1000 / interval_ms) + 2
+    print(f"user_count frames: {frames} (naive {naive}, ticks {ticks})")
+    assert frames <= clients * (ticks + 1)
+    assert frames * 100 < naive
+    assert len(manager.active_connections) == clients
+    # 마지막으로 받은 접속자 수는 최종 값
+    assert f'"count":{clients}' in [f for f in sockets[0].frames if '"user_count"' in f][-1]
+
+
+# 접속자 수가 그대로면 전체 브로드캐스트하지 않음
+def test_presence_skips_unchanged_count():
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=20)
+        stable = FakeWebSocket()
+        leaving = FakeWebSocket()
+        await manager.connect(stable)
+        await manager.connect(leaving)
+        await asyncio.sleep(0.05)
+        before = len(stable.frames)
+
+        manager.disconnect(leaving)
+        await manager.connect(FakeWebSocket())
+        await asyncio.sleep(0.05)
+        return len(stable.frames) - before
+
+    assert asyncio.run(run()) == 0
+
+
+# 재접속 시 since 이후의 채팅만 다시 전송
+def test_resume_replays_only_missed_messages():
+    async def run():
+        manager = ConnectionManager()
+        manager.history = ChatHistory(maxlen=5)
+        for i in range(8):
+            await manager.broadcast_chat({"type": "message", "message": f"m{i}"})
+        returning = FakeWebSocket()
+        await manager.connect(returning)
+        await manager.resume(returning, since=6)
+        stale = FakeWebSocket()
+        await manager.connect(stale)
+        await manager.resume(stale, since=1)
+        await asyncio.sleep(0.01)
+        return returning, stale
+
+    returning, stale = asyncio.run(run())
+    chats = lambda ws: [json.loads(f) for f in ws.frames if '"user_count"' not in f]
+    assert [m["seq"] for m in chats(returning)] == [7, 8]
+    # 버퍼(최근 5개)보다 오래된 구간은 잘렸음을 알린 뒤 남은 것만 전송
+    stale_frames = chats(stale)
+    assert stale_frames[0]["type"] == "history_truncated"
+    assert [m["seq"] for m in stale_frames[1:]] == [4, 5, 6, 7, 8]
+
+
+class SlowSeqBackplane(InMemoryBackplane):
+    """순번 발급이 요청마다 다른 시간만큼 걸리는 백플레인 (Redis INCR 왕복 흉내)"""
+
+    def __init__(self, delays):
+        super().__init__()
+        self.delays = list(delays)
+
+    async def next_seq(self) -> int:
+        seq = await super().next_seq()
+        # 순번은 요청 순서대로 발급되지만 응답은 늦게 도착할 수 있음
+        await asyncio.sleep(self.delays.pop(0))
+        return seq
+
+
+# 순번 발급이 늦게 끝나는 메시지가 있어도 전송/히스토리는 seq 순서
+def test_broadcast_chat_keeps_seq_order():
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=1000,
+                                    backplane=SlowSeqBackplane([0.03, 0.0, 0.02, 0.0]))
+        await manager.start()
+        ws = FakeWebSocket()
+        await manager.connect(ws)
+        await asyncio.gather(*(
+            manager.broadcast_chat({"type": "message", "message": f"m{i}"}) for i in range(4)
+        ))
+        await asyncio.sleep(0.01)
+        await manager.close()
+        return manager, ws
+
+    manager, ws = asyncio.run(run())
+    chats = [json.loads(f) for f in ws.frames if '"message"' in f]
+    assert [m["seq"] for m in chats] == [1, 2, 3, 4]
+    assert [seq for seq, _ in manager.history.buffer] == [1, 2, 3, 4]
+
+
+# 다른 노드에서 뒤바뀐 순서로 온 메시지도 히스토리에는 seq 순서로, 버퍼보다 오래된 것은 버림
+def test_history_orders_out_of_order_frames():
+    history = ChatHistory(maxlen=3)
+    for seq in (2, 4, 3, 5, 1, 4):
+        history.append(seq, f"m{seq}")
+    assert [seq for seq, _ in history.buffer] == [3, 4, 5]
+    assert history.since(3) == ["m4", "m5"]
+
+
+# 막 시작한 노드(빈 히스토리)에 resume하면 누락 가능성을 알림
+def test_resume_on_empty_history_reports_truncation():
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=1000)
+        ws = FakeWebSocket()
+        await manager.connect(ws)
+        await manager.resume(ws, since=42)
+        await asyncio.sleep(0.01)
+        return [json.loads(f) for f in ws.frames if '"user_count"' not in f]
+
+    frames = asyncio.run(run())
+    assert [f["type"] for f in frames] == ["history_truncated"]
+    assert frames[0]["since"] == 42 and frames[0]["oldest_seq"] is None
+
+
+# 서버 재시작 전 순번으로 resume하면 잘림을 알리고 버퍼 전체를 다시 보냄
+def test_resume_past_latest_seq_reports_restart():
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=1000)
+        ws = FakeWebSocket()
+        await manager.connect(ws)
+        for i in range(3):
+            await manager.broadcast_chat({"type": "message", "message": f"m{i}"})
+        await asyncio.sleep(0.01)
+        ws.frames.clear()
+        await manager.resume(ws, since=500)
+        await asyncio.sleep(0.01)
+        return [json.loads(f) for f in ws.frames if '"user_count"' not in f]
+
+    frames = asyncio.run(run())
+    assert frames[0]["type"] == "history_truncated"
+    assert (frames[0]["since"], frames[0]["oldest_seq"], frames[0]["latest_seq"]) == (500, 1, 3)
+    assert [f["seq"] for f in frames[1:]] == [1, 2, 3]
+
+
+# 코인별 채팅방 메시지는 구독자에게만 전달
+def test_topic_publish_reaches_only_subscribers():
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=10)
+        btc = [FakeWebSocket() for _ in range(2)]
+        others = [FakeWebSocket() for _ in range(3)]
+        for ws in btc + others:
+            await manager.connect(ws)
+        for ws in btc:
+            assert manager.subscribe(ws, "KRW-BTC")
+        assert not manager.subscribe(others[0], "bad topic!")
+        await manager.publish_topic("KRW-BTC", {"type": "message", "message": "to the moon"})
+        await asyncio.sleep(0.05)
+        manager.unsubscribe(btc[1], "KRW-BTC")
+        await asyncio.sleep(0.05)
+        return manager, btc, others
+
+    manager, btc, others = asyncio.run(run())
+    for ws in btc:
+        assert sum('"to the moon"' in f for f in ws.frames) == 1
+    for ws in others:
+        assert not any('"to the moon"' in f for f in ws.frames)
+        assert not any('"room_count"' in f for f in ws.frames)
+    room_counts = [json.loads(f)["count"] for f in btc[0].frames if '"room_count"' in f]
+    assert room_counts[-1] == 1
+    assert manager.room_count("KRW-BTC") == 1
+
+
+# 같은 사용자의 새 연결이 기존 연결을 대체하면 기존 연결의 구독도 정리, 구독자 수는 바로 반영
+def test_replaced_connection_leaves_topics():
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=1000)
+        old, new = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(old, user_id="7")
+        assert manager.subscribe(old, "KRW-BTC")
+        await asyncio.sleep(0.01)
+        await manager.connect(new, user_id="7")
+        assert manager.room_count("KRW-BTC") == 0
+        assert manager.subscribe(new, "KRW-BTC")
+        assert manager.room_count("KRW-BTC") == 1
+        return manager, old, new
+
+    manager, old, new = asyncio.run(run())
+    assert old.closed
+    assert [client.websocket for client in manager.topics["KRW-BTC"]] == [new]
+    assert manager.user_connections == {"7": new}
+
+
+# 배치 모드: 창 동안의 브로드캐스트가 배열 프레임 하나로 묶임
+def test_batching_coalesces_frames_per_window():
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=1000, batch_window_ms=20, batch_max_size=8)
+        ws = FakeWebSocket()
+        await manager.connect(ws)
+        await asyncio.sleep(0.05)
+        before = len(ws.frames)
+        for i in range(10):
+            await manager.broadcast_json({"type": "message", "message": f"m{i}"})
+        await asyncio.sleep(0.05)
+        return ws.frames[before:]
+
+    frames = [json.loads(f) for f in asyncio.run(run())]
+    # 최대 8개에서 한 번 끊기고 나머지 2개는 창이 끝날 때 전송
+    assert [len(batch) for batch in frames] == [8, 2]
+    assert [m["message"] for batch in frames for m in batch] == [f"m{i}" for i in range(10)]
+
+
+# 하트비트: 응답 없는 연결은 한 번에 정리되고 살아있는 연결은 ping을 받음
+def test_heartbeat_reaps_idle_connections():
+    async def run():
+        manager = ConnectionManager(
+            presence_interval_ms=10, heartbeat_interval=0.02, heartbeat_timeout=0.1
+        )
+        await manager.start()
+        try:
+            alive = FakeWebSocket()
+            idle = [FakeWebSocket() for _ in range(5)]
+            # JSON pong을 구현하지 않은 클라이언트는 프로토콜 ping/pong에 맡기고 정리하지 않음
+            silent = FakeWebSocket()
+            for ws in [alive, silent] + idle:
+                await manager.connect(ws)
+            for ws in [alive] + idle:
+                manager.pong(ws)
+            for _ in range(10):
+                await asyncio.sleep(0.02)
+                manager.pong(alive)
+            return manager, alive, silent, idle
+        finally:
+            await manager.close()
+
+    manager, alive, silent, idle = asyncio.run(run())
+    assert list(manager.active_connections) == [alive, silent]
+    assert not silent.closed
+    assert manager.reaped == 5
+    assert all(ws.closed for ws in idle)
+    assert any('"ping"' in f for f in alive.frames)
+    assert last_user_count(alive) == 2
+
+
+def last_user_count(ws):
+    frames = [f for f in ws.frames if '"user_count"' in f]
+    return json.loads(frames[-1])["count"] if frames else None
+
+
+async def run_two_workers(backplane_a, backplane_b):
+    """워커 두 개에 각각 클라이언트를 붙이고 한쪽에서 채팅 브로드캐스트"""
+    worker_a = ConnectionManager(presence_interval_ms=10, backplane=backplane_a)
+    worker_b = ConnectionManager(presence_interval_ms=10, backplane=backplane_b)
+    await worker_a.start()
+    await worker_b.start()
+    try:
+        clients_a = [FakeWebSocket() for _ in range(3)]
+        clients_b = [FakeWebSocket() for _ in range(2)]
+        for ws in clients_a:
+            await worker_a.connect(ws)
+        for ws in clients_b:
+            await worker_b.connect(ws)
+        await asyncio.sleep(0.2)
+
+        await worker_a.broadcast_json({"type": "message", "message": "hello"})
+        await asyncio.sleep(0.2)
+        return clients_a, clients_b
+    finally:
+        await worker_a.close()
+        await worker_b.close()
+
+
+def assert_cluster_delivery(clients_a, clients_b):
+    for ws in clients_a + clients_b:
+        assert any('"hello"' in f for f in ws.frames)
+        # 중복 수신 없음
+        assert sum('"hello"' in f for f in ws.frames) == 1
+        assert last_user_count(ws) == 5
+
+
+# 메모리 백플레인으로 워커 간 채팅/접속자 수 공유
+def test_in_memory_backplane_relays_between_workers():
+    hub = InMemoryHub()
+    clients_a, clients_b = asyncio.run(
+        run_two_workers(InMemoryBackplane(hub), InMemoryBackplane(hub))
+    )
+    assert_cluster_delivery(clients_a, clients_b)
+
+
+# fakeredis로 Redis pub/sub 백플레인 검증
+def test_redis_backplane_relays_between_workers():
+    fakeredis = pytest.importorskip("fakeredis")
+
+    async def run():
+        server = fakeredis.FakeServer()
+        make_client = lambda: fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        return await run_two_workers(
+            RedisBackplane(client=make_client()), RedisBackplane(client=make_client())
+        )
+
+    clients_a, clients_b = asyncio.run(run())
+    assert_cluster_delivery(clients_a, clients_b)
+
+
+# /metrics: 브로드캐스트/접속 메트릭이 Prometheus 텍스트로 노출
+def test_metrics_exposition():
+    import ws_fastapi
+
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=1000)
+        sockets = [FakeWebSocket() for _ in range(3)]
+        for ws in sockets:
+            await manager.connect(ws)
+        await manager.broadcast_json({"type": "message", "message": "안녕"})
+        await asyncio.sleep(0.01)
+        manager.disconnect(sockets[0])
+
+    before = ws_fastapi.BROADCAST_DURATION.count
+    asyncio.run(run())
+    text = ws_fastapi.metrics.render()
+    assert ws_fastapi.BROADCAST_DURATION.count > before
+    assert "# TYPE ws_broadcast_duration_seconds histogram" in text
+    assert 'ws_broadcast_duration_seconds_bucket{le="+Inf"}' in text
+    assert 'ws_disconnects_total{reason="client"}' in text
+    assert ws_fastapi.SEND_LATENCY.count >= 3
+    # 한글 프레임은 UTF-8 바이트 수로 계산
+    assert ws_fastapi.frame_size('{"message":"안녕"}') == len('{"message":"안녕"}'.encode("utf-8"))
+
+
+# 채팅 저장: 개수가 차거나 시간이 지나면 스레드에서 일괄 저장, 종료 시 남은 것도 저장
+def test_write_behind_buffer_batches_inserts():
+    batches = []
+
+    async def run():
+        writer = WriteBehindBuffer(batches.append, batch_size=10, interval_ms=30)
+        for i in range(25):
+            writer.add({"message": f"m{i}"})
+        await asyncio.sleep(0.01)
+        # 10개짜리 두 묶음은 바로, 나머지 5개는 아직 대기
+        sizes_before_timer = [len(batch) for batch in batches]
+        await asyncio.sleep(0.05)
+        writer.add({"message": "last"})
+        await writer.close()
+        return writer, sizes_before_timer
+
+    writer, sizes_before_timer = asyncio.run(run())
+    assert sizes_before_timer == [10, 10]
+    assert [len(batch) for batch in batches] == [10, 10, 5, 1]
+    assert [r["message"] for batch in batches for r in batch][-1] == "last"
+    assert writer.stats()["written"] == 26
+
+
+# 시세 중계: seq가 붙은 스냅샷 이후에는 바뀐 마켓의 바뀐 필드만 전송
+def test_ticker_relay_sends_snapshot_then_deltas():
+    def ticker(code, price, volume=1e9):
+        return {"code": code, "trade_price": price, "signed_change_price": 10.0,
+                "signed_change_rate": 0.01, "acc_trade_price_24h": volume, "high_price": 200.0,
+                "low_price": 50.0, "timestamp": 1}
+
+    async def run():
+        manager = ConnectionManager(presence_interval_ms=1000)
+        relay = TickerRelay(manager, interval_ms=10)
+        subscriber, other = FakeWebSocket(), FakeWebSocket()
+        for ws in (subscriber, other):
+            await manager.connect(ws)
+        assert manager.subscribe(subscriber, "tickers")
+
+        def update(*args, **kwargs):
+            relay.mark_changed(relay.table.update(ticker(*args, **kwargs)))
+
+        update("KRW-BTC", 100.0)
+        update("KRW-ETH", 10.0)
+        snapshot = relay.snapshot_frame()
+        update("KRW-BTC", 101.0)
+        update("KRW-BTC", 102.0, volume=2e9)
+        update("KRW-ETH", 10.0)
+        await asyncio.sleep(0.03)
+        update("KRW-XRP", 1.0)
+        await asyncio.sleep(0.03)
+        return json.loads(snapshot), subscriber.frames, other.frames
+
+    snapshot, frames, other_frames = asyncio.run(run())
+    deltas = [json.loads(f) for f in frames if '"ticker_delta"' in f]
+    assert not any('"ticker_delta"' in f for f in other_frames)
+    # 스냅샷 직전 대기 중이던 변경은 먼저 내보내서 스냅샷과 같은 seq가 됨
+    assert deltas[0]["seq"] == snapshot["seq"] == 1
+    assert {t["code"] for t in snapshot["tickers"]} == {"KRW-BTC", "KRW-ETH"}
+    # 값이 그대로인 ETH는 빠지고 BTC는 바뀐 필드만
+    assert deltas[1] == {"type": "ticker_delta", "seq": 2,
+                         "tickers": {"KRW-BTC": {"price": 102.0, "volume": 2e9}}}
+    # 새 마켓은 전체 행
+    assert deltas[2]["seq"] == 3
+    assert deltas[2]["tickers"]["KRW-XRP"]["symbol"] == "XRP"
+
+
+# /ws/tickers: 시세 구독자는 채팅 접속자 수/로비에 잡히지 않고 시세 토픽만 구독 가능
+def test_tickers_endpoint_is_separate_from_chat(monkeypatch):
+    pytest.importorskip("httpx")
+    from starlette.testclient import TestClient
+
+    import ws_fastapi
+
+    chat, market = ConnectionManager(presence_interval_ms=1000), ConnectionManager(presence=False)
+    monkeypatch.setattr(ws_fastapi, "manager", chat)
+    monkeypatch.setattr(ws_fastapi, "market_manager", market)
+    monkeypatch.setattr(ws_fastapi, "ticker_relay", TickerRelay(market))
+    client = TestClient(ws_fastapi.app)
+    with client.websocket_connect("/ws/tickers") as ws:
+        ws.send_json({"type": "subscribe", "topic": "tickers"})
+        subscribed, snapshot = ws.receive_json(), ws.receive_json()
+        ws.send_json({"type": "subscribe", "topic": "KRW-BTC"})
+        rejected = ws.receive_json()
+        counts = len(chat.active_connections), len(market.active_connections)
+
+    assert subscribed == {"type": "subscribed", "topic": "tickers", "timestamp": subscribed["timestamp"]}
+    assert snapshot["type"] == "ticker_snapshot" and snapshot["seq"] == 0
+    # 시세 전용 엔드포인트에서는 채팅방을 구독할 수 없음
+    assert rejected["type"] == "system"
+    assert counts == (0, 1)
+
+
+# 채팅 /ws에서는 시세 토픽을 채팅방으로 구독하거나 메시지를 보낼 수 없고, 잘못된 토픽은 무시
+def test_chat_endpoint_rejects_market_topics(monkeypatch):
+    pytest.importorskip("httpx")
+    from starlette.testclient import TestClient
+
+    import ws_fastapi
+
+    persisted = []
+    monkeypatch.setattr(ws_fastapi, "manager", ConnectionManager(presence_interval_ms=1000))
+    monkeypatch.setattr(ws_fastapi, "persist_chat", lambda payload, topic, user: persisted.append(topic))
+    client = TestClient(ws_fastapi.app)
+
+    def receive(ws):
+        # 접속자 수/방 인원 알림은 건너뜀
+        while True:
+            message = ws.receive_json()
+            if message["type"] not in ("user_count", "room_count"):
+                return message
+
+    with client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "subscribe", "topic": "tickers"})
+        rejected = receive(ws)
+        ws.send_json({"type": "message", "topic": "gainers-upbit", "user": "a", "message": "hi"})
+        # 문자열이 아닌 토픽/객체가 아닌 프레임도 연결을 끊지 않고 무시
+        ws.send_json({"type": "message", "topic": ["KRW-BTC"], "user": "a", "message": "hi"})
+        ws.send_json({"type": "message", "topic": {"a": 1}, "user": "a", "message": "hi"})
+        ws.send_json(["not", "an", "object"])
+        ws.send_json({"type": "subscribe", "topic": "KRW-BTC"})
+        subscribed = receive(ws)
+
+    assert rejected["type"] == "system"
+    # 시세 토픽 메시지는 무시되고 다음 요청이 바로 처리됨
+    assert subscribed["type"] == "subscribed" and subscribed["topic"] == "KRW-BTC"
+    assert persisted == []
+    # 시세 연결은 배치 없이 프레임 단위로 보냄 (ticker_delta가 배열로 나가지 않도록)
+    assert ws_fastapi.market_manager.batch_window == 0
+
+
+# 토큰 캐시: exp가 지난 항목은 무효, 크기를 넘으면 가장 오래 안 쓴 토큰부터 제거
+def test_token_cache_expiry_and_lru_eviction():
+    cache = TokenCache(maxsize=2)
+    cache.put("expired", {"user_id": 1, "exp": time.time() - 1})
+    assert cache.get("expired") is None
+    assert cache.stats()["size"] == 0
+
+    cache.put("a", {"user_id": 1, "exp": time.time() + 60})
+    cache.put("b", {"user_id": 2})
+    assert cache.get("a")["user_id"] == 1
+    cache.put("c", {"user_id": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 2, "hit_rate": 0.6}
+
+
+# 같은 토큰으로 다시 인증하면 서명 검증 없이 캐시에서, 조회 결과는 /metrics로 노출
+def test_verify_token_cached_skips_verification_on_hit(monkeypatch):
+    import ws_fastapi
+
+    calls = []
+    verify = ws_fastapi.verify_token
+
+    def counting_verify(token):
+        calls.append(token)
+        return verify(token)
+
+    monkeypatch.setattr(ws_fastapi, "verify_token", counting_verify)
+    monkeypatch.setattr(ws_fastapi, "token_cache", TokenCache())
+    token = jwt.encode({"user_id": 7, "exp": int(time.time()) + 60},
+                       "django-insecure-eg*x8n7i6f1zw9n_0f8(#$v65@&$0+5$9c0$*-ozlvzeq)95!^",
+                       algorithm="HS256")
+    hits = ws_fastapi.TOKEN_CACHE_HIT.value
+
+    async def run():
+        return [await ws_fastapi.verify_token_cached(token) for _ in range(3)]
+
+    payloads = asyncio.run(run())
+    assert [p["user_id"] for p in payloads] == [7, 7, 7]
+    assert calls == [token]
+    assert ws_fastapi.TOKEN_CACHE_HIT.value == hits + 2
+    text = ws_fastapi.metrics.render()
+    assert 'ws_token_cache_lookups_total{result="hit"}' in text
+    assert 'ws_token_cache_lookups_total{result="miss"}' in text
+
+
+# 토큰 버킷: burst만큼 바로 허용, 이후에는 초당 rate개씩 다시 채워짐
+def test_token_bucket_allows_burst_then_refills():
+    bucket = TokenBucket(rate=2, capacity=3)
+    now = bucket.updated
+    assert [bucket.consume(now) for _ in range(4)] == [True, True, True, False]
+    assert bucket.consume(now + 0.5)
+    assert not bucket.consume(now + 0.5)
+    assert bucket.is_full(now + 10)
+
+
+# 크기 제한은 문자 수가 아니라 UTF-8 바이트 기준, 인증 사용자는 사용자별 버킷도 적용
+def test_rate_limiter_counts_bytes_and_user_buckets():
+    import ws_fastapi
+
+    limiter = RateLimiter(rate=0.001, burst=2, max_frame_size=100)
+    korean = '{"type":"message","message":"' + "가" * 30 + '"}'
+    assert len(korean) < 100 < ws_fastapi.frame_size(korean)
+    assert limiter.check(ws_fastapi.frame_size(korean), limiter.new_bucket()) == "oversized"
+
+    # 같은 사용자가 연결을 여러 개 열어도 사용자 버킷은 하나
+    results = [limiter.check(10, limiter.new_bucket(), user_id="7") for _ in range(3)]
+    assert results == [None, None, "rate_limited"]
+    assert limiter.stats()["oversized"] == 1 and limiter.stats()["rate_limited"] == 1
+
+
+# 사용자 버킷에서 거부된 프레임은 연결 버킷을 쓰지 않고, 사용자 버킷은 LRU로 개수 제한
+def test_rate_limiter_charges_buckets_only_when_allowed():
+    limiter = RateLimiter(rate=0.001, burst=2, max_frame_size=100)
+    limiter.check(10, limiter.new_bucket(), user_id="7")
+    limiter.check(10, limiter.new_bucket(), user_id="7")
+    connection = limiter.new_bucket()
+    assert limiter.check(10, connection, user_id="7") == "rate_limited"
+    assert connection.tokens == 2
+    # 같은 연결로 인증 전(사용자 버킷 없이) 보내면 연결 버킷은 그대로 남아 있음
+    assert [limiter.check(10, connection) for _ in range(3)] == [None, None, "rate_limited"]
+
+    limiter.MAX_USER_BUCKETS = 2
+    for user_id in ("a", "b"):
+        limiter.check(10, limiter.new_bucket(), user_id=user_id)
+    limiter.check(10, limiter.new_bucket(), user_id="a")
+    limiter.check(10, limiter.new_bucket(), user_id="c")
+    assert list(limiter.user_buckets) == ["a", "c"]
+
+
+def run_limited_session(monkeypatch, penalty, frames, until="system"):
+    """속도 제한(burst 2)을 건 /ws 엔드포인트에 프레임을 보내고 until 타입 프레임(또는 종료)까지 받은 목록"""
+    pytest.importorskip("httpx")
+    from starlette.testclient import TestClient
+    from starlette.websockets import WebSocketDisconnect
+
+    import ws_fastapi
+
+    limiter = RateLimiter(rate=0.001, burst=2, max_frame_size=100, penalty=penalty)
+    monkeypatch.setattr(ws_fastapi, "rate_limiter", limiter)
+    monkeypatch.setattr(ws_fastapi, "manager", ConnectionManager(presence_interval_ms=1000))
+    received = []
+    # lifespan(시세 피드 등)은 띄우지 않음
+    client = TestClient(ws_fastapi.app)
+    with client.websocket_connect("/ws") as ws:
+        received.append(ws.receive_json())
+        for frame in frames:
+            ws.send_text(frame)
+        try:
+            while True:
+                message = ws.receive_json()
+                received.append(message)
+                if message.get("type") == until:
+                    break
+        except WebSocketDisconnect as e:
+            received.append({"closed": e.code})
+    return limiter, received
+
+
+# notice: 제한을 넘은 프레임은 무시하고 안내 메시지 전송
+def test_rate_limit_notice_penalty(monkeypatch):
+    pong = '{"type":"pong"}'
+    limiter, received = run_limited_session(monkeypatch, "notice", [pong, pong, pong])
+    assert received[-1]["type"] == "system" and received[-1]["id"].startswith("throttle_")
+    assert limiter.counters["rate_limited"] == 1
+
+
+# disconnect: 제한을 넘으면 1008로 연결 종료
+def test_rate_limit_disconnect_penalty(monkeypatch):
+    pong = '{"type":"pong"}'
+    limiter, received = run_limited_session(monkeypatch, "disconnect", [pong, pong, pong])
+    assert received[-1] == {"closed": 1008}
+    assert limiter.counters["disconnected"] == 1
+
+
+# drop: 조용히 무시하고 연결은 유지 (이후 허용된 프레임은 정상 처리)
+def test_rate_limit_drop_penalty(monkeypatch):
+    oversized = '{"type":"pong","pad":"' + "가" * 40 + '"}'
+    resume = '{"type":"resume","since":5}'
+    limiter, received = run_limited_session(monkeypatch, "drop", [oversized, resume],
+                                            until="history_truncated")
+    assert [m.get("type") for m in received if m.get("type") != "user_count"] == ["history_truncated"]
+    assert limiter.counters["oversized"] == 1 and limiter.counters["allowed"] == 1
@@ -0,0 +1,237 @@
+"""
+WebSocket 서버 백플레인
+여러 워커/노드의 ConnectionManager 사이에서 브로드캐스트와 접속자 수를 공유한다
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 백플레인 종류: none | memory | redis
+BACKPLANE = os.getenv("WS_BACKPLANE", "none")
+# Django 설정(whyup.settings)과 같은 환경 변수 - FastAPI 프로세스에서 Django 설정을 읽지 않도록 직접 읽음
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# 노드 생존 신호 주기/만료 (초) - 만료된 노드의 접속자 수는 합산에서 제외
+NODE_HEARTBEAT_INTERVAL = float(os.getenv("WS_NODE_HEARTBEAT_INTERVAL", "5"))
+NODE_TTL = float(os.getenv("WS_NODE_TTL", "15"))
+
+CHANNEL = "ws:broadcast"
+COUNTS_KEY = "ws:connections"
+HEARTBEAT_KEY = "ws:heartbeat"
+SEQ_KEY = "ws:chat_seq"
+
+# 다른 노드에서 받은 (kind, message)를 처리하는 콜백
+MessageHandler = Callable[[str, str], Awaitable[None]]
+
+
+def _encode(node_id: str, kind: str, message: str) -> str:
+    return f"{node_id}\n{kind}\n{message}"
+
+
+def _decode(data: str):
+    node_id, kind, message = data.split("\n", 2)
+    return node_id, kind, message
+
+
+class Backplane(ABC):
+    """백플레인 인터페이스 - 자기 노드가 보낸 메시지는 다시 받지 않는다"""
+
+    def __init__(self, node_id: Optional[str] = None):
+        self.node_id = node_id or uuid.uuid4().hex[:12]
+        self._handler: Optional[MessageHandler] = None
+
+    async def start(self, handler: MessageHandler):
+        self._handler = handler
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def publish(self, kind: str, message: str):
+        """다른 노드로 (kind, message) 전송"""
+
+    @abstractmethod
+    async def set_local_count(self, count: int, topic: Optional[str] = None) -> bool:
+        """이 노드의 연결 수(topic이 있으면 해당 방 구독자 수) 저장 - 값이 바뀌었으면 True"""
+
+    @abstractmethod
+    async def total_connections(self, topic: Optional[str] = None) -> int:
+        """클러스터 전체 연결 수 (topic이 있으면 해당 방 구독자 수)"""
+
+    @abstractmethod
+    async def next_seq(self) -> int:
+        """클러스터 전체에서 단조 증가하는 채팅 메시지 순번"""
+
+
+class InMemoryHub:
+    """같은 프로세스 안의 InMemoryBackplane들이 공유하는 메시지 허브 (테스트/단일 프로세스용)"""
+
+    def __init__(self):
+        self.backplanes: List["InMemoryBackplane"] = []
+        # (topic, node_id) → 연결 수 - 전체 접속자는 topic None
+        self.counts: Dict[tuple, int] = {}
+        self.seq = 0
+
+
+class InMemoryBackplane(Backplane):
+    def __init__(self, hub: Optional[InMemoryHub] = None, node_id: Optional[str] = None):
+        super().__init__(node_id)
+        self.hub = hub or InMemoryHub()
+
+    async def start(self, handler: MessageHandler):
+        await super().start(handler)
+        self.hub.backplanes.append(self)
+
+    async def close(self):
+        if self in self.hub.backplanes:
+            self.hub.backplanes.remove(self)
+        for key in [key for key in self.hub.counts if key[1] == self.node_id]:
+            del self.hub.counts[key]
+
+    async def publish(self, kind: str, message: str):
+        for backplane in list(self.hub.backplanes):
+            if backplane is not self and backplane._handler is not None:
+                asyncio.ensure_future(backplane._handler(kind, message))
+
+    async def set_local_count(self, count: int, topic: Optional[str] = None) -> bool:
+        key = (topic, self.node_id)
+        changed = self.hub.counts.get(key, 0) != count
+        if count:
+            self.hub.counts[key] = count
+        else:
+            self.hub.counts.pop(key, None)
+        return changed
+
+    async def total_connections(self, topic: Optional[str] = None) -> int:
+        return sum(count for (key_topic, _), count in self.hub.counts.items() if key_topic == topic)
+
+    async def next_seq(self) -> int:
+        self.hub.seq += 1
+        return self.hub.seq
+
+
+class RedisBackplane(Backplane):
+    """Redis pub/sub 기반 백플레인
+
+    브로드캐스트는 CHANNEL로 중계하고, 노드별 접속자 수는 해시에 저장해 합산한다.
+    테스트에서는 client에 fakeredis.aioredis.FakeRedis를 넘길 수 있다.
+    """
+
+    def __init__(self, url: Optional[str] = None, client=None, node_id: Optional[str] = None,
+                 heartbeat_interval: float = NODE_HEARTBEAT_INTERVAL, node_ttl: float = NODE_TTL):
+        super().__init__(node_id)
+        if client is None:
+            import redis.asyncio as aioredis
+
+            client = aioredis.from_url(url or REDIS_URL, decode_responses=True)
+        self.redis = client
+        self.heartbeat_interval = heartbeat_interval
+        self.node_ttl = node_ttl
+        self._pubsub = None
+        self._tasks: List[asyncio.Task] = []
+        # 이 노드가 값을 써 둔 방별 카운터 (종료 시 정리, 변경 여부 판단)
+        self._room_counts: Dict[str, int] = {}
+
+    async def start(self, handler: MessageHandler):
+        await super().start(handler)
+        self._pubsub = self.redis.pubsub()
+        await self._pubsub.subscribe(CHANNEL)
+        await self._heartbeat()
+        self._tasks = [
+            asyncio.create_task(self._reader()),
+            asyncio.create_task(self._heartbeat_loop()),
+        ]
+        logger.info(f"Redis 백플레인 시작: 노드 {self.node_id}")
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        try:
+            await self.redis.hdel(COUNTS_KEY, self.node_id)
+            for topic in self._room_counts:
+                await self.redis.hdel(self._counts_key(topic), self.node_id)
+            await self.redis.hdel(HEARTBEAT_KEY, self.node_id)
+            if self._pubsub is not None:
+                await self._pubsub.unsubscribe(CHANNEL)
+                await self._pubsub.aclose()
+        except Exception as e:
+            logger.warning(f"Redis 백플레인 종료 오류: {str(e)}")
+
+    async def _reader(self):
+        while True:
+            try:
+                item = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if item is None:
+                    continue
+                data = item["data"]
+                if isinstance(data, bytes):
+                    data = data.decode("utf-8")
+                node_id, kind, message = _decode(data)
+                if node_id != self.node_id and self._handler is not None:
+                    await self._handler(kind, message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"백플레인 수신 오류: {str(e)}")
+                await asyncio.sleep(1)
+
+    async def _heartbeat(self):
+        await self.redis.hset(HEARTBEAT_KEY, self.node_id, time.time())
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self._heartbeat()
+            except Exception as e:
+                logger.warning(f"백플레인 heartbeat 실패: {str(e)}")
+
+    async def publish(self, kind: str, message: str):
+        await self.redis.publish(CHANNEL, _encode(self.node_id, kind, message))
+
+    @staticmethod
+    def _counts_key(topic: Optional[str]) -> str:
+        return COUNTS_KEY if topic is None else f"{COUNTS_KEY}:{topic}"
+
+    async def set_local_count(self, count: int, topic: Optional[str] = None) -> bool:
+        if topic is None:
+            await self.redis.hset(COUNTS_KEY, self.node_id, count)
+            return True
+        if self._room_counts.get(topic, 0) == count:
+            return False
+        if count:
+            await self.redis.hset(self._counts_key(topic), self.node_id, count)
+            self._room_counts[topic] = count
+        else:
+            await self.redis.hdel(self._counts_key(topic), self.node_id)
+            self._room_counts.pop(topic, None)
+        return True
+
+    async def total_connections(self, topic: Optional[str] = None) -> int:
+        counts = await self.redis.hgetall(self._counts_key(topic))
+        heartbeats = await self.redis.hgetall(HEARTBEAT_KEY)
+        deadline = time.time() - self.node_ttl
+        total = 0
+        for node_id, count in counts.items():
+            if float(heartbeats.get(node_id, 0)) >= deadline:
+                total += int(count)
+        return total
+
+    async def next_seq(self) -> int:
+        return int(await self.redis.incr(SEQ_KEY))
+
+
+def create_backplane(kind: str = BACKPLANE) -> Optional[Backplane]:
+    """WS_BACKPLANE 설정에 맞는 백플레인 생성 (none이면 단일 프로세스 모드)"""
+    if kind == "redis":
+        return RedisBackplane()
+    if kind == "memory":
+        return InMemoryBackplane()
+    return None
@@ -5,19 +5,101 @@ WebSocket 서버 (FastAPI)
 """
 
 import asyncio
+import hashlib
 import json
 import logging
+import os
+import re
+import time
+from bisect import bisect_left
+from collections import OrderedDict, deque
 from datetime import datetime
-from typing import Dict, List
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import jwt
 from pydantic import BaseModel
 
+from crypto.service import MarketService
+from crypto.upbit_feed import FIELD_NAMES
+from ws_backplane import Backplane, create_backplane
+from ws_metrics import LATENCY_BUCKETS, LoopLagMonitor, Registry
+
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# JSON 인코더 선택 (orjson > msgspec > 표준 json)
+# 브로드캐스트 프레임은 한 번만 인코딩해서 모든 수신자에게 같은 문자열을 보낸다
+try:
+    import orjson
+
+    JSON_BACKEND = "orjson"
+    json_loads = orjson.loads
+
+    def json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+except ImportError:
+    try:
+        import msgspec
+
+        JSON_BACKEND = "msgspec"
+        _msgspec_encoder = msgspec.json.Encoder()
+        _msgspec_decoder = msgspec.json.Decoder()
+        json_loads = _msgspec_decoder.decode
+
+        def json_dumps(obj) -> str:
+            return _msgspec_encoder.encode(obj).decode("utf-8")
+    except ImportError:
+        JSON_BACKEND = "json"
+        json_loads = json.loads
+
+        def json_dumps(obj) -> str:
+            return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+# MessagePack 바이너리 프레임 (선택사항) - ?encoding=msgpack 또는 서브프로토콜 "msgpack"으로 협상
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+
+
+def json_to_msgpack(frame: str) -> bytes:
+    """이미 인코딩된 JSON 프레임을 MessagePack으로 변환 (브로드캐스트당 한 번)"""
+    return msgpack.packb(json_loads(frame))
+
+
+def negotiate_encoding(websocket: WebSocket) -> Tuple[str, Optional[str]]:
+    """(프레임 인코딩, 응답할 서브프로토콜) - 기본은 JSON 텍스트 프레임"""
+    offered = websocket.scope.get("subprotocols") or []
+    if msgpack is not None:
+        if ENCODING_MSGPACK in offered:
+            return ENCODING_MSGPACK, ENCODING_MSGPACK
+        if websocket.query_params.get("encoding") == ENCODING_MSGPACK:
+            return ENCODING_MSGPACK, None
+    if ENCODING_JSON in offered:
+        return ENCODING_JSON, ENCODING_JSON
+    return ENCODING_JSON, None
+
+
+async def receive_frame(websocket: WebSocket):
+    """텍스트(JSON)/바이너리(MessagePack) 프레임을 파싱하지 않은 채로 수신"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    data = message.get("bytes")
+    return data if data is not None else message["text"]
+
+
+def parse_frame(data):
+    if isinstance(data, bytes):
+        return msgpack.unpackb(data) if msgpack is not None else json_loads(data)
+    return json_loads(data)
+
 app = FastAPI(title="WebSocket Chat Server", version="1.0.0")
 
 # CORS 설정
@@ -29,77 +111,860 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 브로드캐스트 시 소켓 하나당 전송 제한 시간 (초)
+SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+# 연결별 송신 큐 최대 길이
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+# 송신 큐가 가득 찼을 때의 정책: drop_oldest | disconnect | conflate
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DISCONNECT = "disconnect"
+OVERFLOW_CONFLATE = "conflate"
+OVERFLOW_POLICY = os.getenv("WS_OVERFLOW_POLICY", OVERFLOW_CONFLATE)
+# 동시접속자 수 브로드캐스트 최소 간격 (밀리초) - 그 사이의 접속/해제는 한 번으로 합쳐짐
+PRESENCE_INTERVAL_MS = int(os.getenv("WS_PRESENCE_INTERVAL_MS", "500"))
+# 재접속 시 다시 보내줄 최근 채팅 메시지 수 (송신 큐보다 작게 유지)
+HISTORY_SIZE = int(os.getenv("WS_HISTORY_SIZE", "200"))
+# 토픽(코인별 채팅방) - 로비는 모든 연결이 속한 전체 방
+LOBBY = "lobby"
+TOPIC_PATTERN = re.compile(r"^[A-Za-z0-9_\-]{1,32}$")
+MAX_TOPICS_PER_CONNECTION = int(os.getenv("WS_MAX_TOPICS_PER_CONNECTION", "20"))
+# 마이크로 배치: 창(밀리초) 동안 모은 브로드캐스트를 JSON 배열 프레임 하나로 전송 (0이면 끔)
+BATCH_WINDOW_MS = int(os.getenv("WS_BATCH_WINDOW_MS", "0"))
+BATCH_MAX_SIZE = int(os.getenv("WS_BATCH_MAX_SIZE", "64"))
+# 하트비트 (0이면 끔)
+# - 프로토콜 ping/pong: uvicorn이 주기마다 ping을 보내고 제한 시간 안에 pong이 없으면 닫음 (모든 클라이언트)
+# - JSON {"type": "ping"}: {"type": "pong"}으로 한 번이라도 응답한 클라이언트만
+#   제한 시간 동안 아무 프레임도 안 보내면 정리 (pong을 구현하지 않은 클라이언트는 정리하지 않음)
+HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "25"))
+HEARTBEAT_TIMEOUT = float(os.getenv("WS_HEARTBEAT_TIMEOUT", "60"))
+# 이벤트 루프 지연 측정 주기 (초, 0이면 끔)
+LOOP_LAG_INTERVAL = float(os.getenv("WS_LOOP_LAG_INTERVAL", "0.5"))
+
+# /metrics 로 내보내는 메트릭 - 핫패스에서는 미리 만들어 둔 객체의 숫자만 갱신
+metrics = Registry()
+CONNECTS = metrics.counter("ws_connects_total", "Accepted WebSocket connections")
+DISCONNECTS = metrics.counter(
+    "ws_disconnects_total", "Closed WebSocket connections by reason", labelnames=("reason",)
+)
+DISCONNECT_CLIENT = DISCONNECTS.labels("client")
+DISCONNECT_EVICTED = DISCONNECTS.labels("evicted")
+DISCONNECT_IDLE = DISCONNECTS.labels("idle")
+DISCONNECT_REPLACED = DISCONNECTS.labels("replaced")
+BROADCAST_DURATION = metrics.histogram(
+    "ws_broadcast_duration_seconds", "Time to fan a frame out to local send queues"
+)
+BROADCAST_RECIPIENTS = metrics.counter(
+    "ws_broadcast_recipients_total", "Frames enqueued by broadcasts"
+)
+SEND_LATENCY = metrics.histogram(
+    "ws_send_seconds", "Per-frame socket send latency",
+    buckets=(0.0001, 0.00025) + LATENCY_BUCKETS,
+)
+OUTBOUND_BYTES = metrics.counter("ws_outbound_bytes_total", "Payload bytes enqueued for sending")
+AUTH_RESULTS = metrics.counter(
+    "ws_auth_total", "WebSocket auth messages by result", labelnames=("result",)
+)
+AUTH_SUCCESS = AUTH_RESULTS.labels("success")
+AUTH_FAILURE = AUTH_RESULTS.labels("failure")
+TOKEN_CACHE_LOOKUPS = metrics.counter(
+    "ws_token_cache_lookups_total", "Verified-JWT cache lookups by result", labelnames=("result",)
+)
+TOKEN_CACHE_HIT = TOKEN_CACHE_LOOKUPS.labels("hit")
+TOKEN_CACHE_MISS = TOKEN_CACHE_LOOKUPS.labels("miss")
+TICKER_RESYNCS = metrics.counter(
+    "ws_ticker_resyncs_total", "Ticker snapshots resent after a client detected a sequence gap"
+)
+LOOP_LAG = metrics.gauge("ws_event_loop_lag_last_seconds", "Most recent event loop lag sample")
+LOOP_LAG_HISTOGRAM = metrics.histogram("ws_event_loop_lag_seconds", "Event loop lag")
+
+
+def frame_size(payload) -> int:
+    """전송 바이트 수 - ASCII 문자열은 인코딩 없이 길이로 계산"""
+    if isinstance(payload, str) and not payload.isascii():
+        return len(payload.encode("utf-8"))
+    return len(payload)
+
+
+class ClientConnection:
+    """소켓 하나에 대한 제한된 송신 큐와 전용 writer 태스크
+
+    느린 클라이언트는 자기 큐만 채우므로 다른 연결이나 브로드캐스트 루프를 막지 않는다.
+    """
+
+    def __init__(self, websocket: WebSocket, manager: "ConnectionManager",
+                 max_queue: int = SEND_QUEUE_SIZE, overflow_policy: str = OVERFLOW_POLICY):
+        self.websocket = websocket
+        self.manager = manager
+        self.user_id: Optional[str] = None
+        self.encoding = ENCODING_JSON
+        # 구독 중인 토픽 (로비 제외)
+        self.topics: Set[str] = set()
+        self.max_queue = max_queue
+        self.overflow_policy = overflow_policy
+        # 프레임은 [kind, payload] 형태 - user_count 프레임은 큐 안에서 그대로 교체(conflate)
+        self.queue: Deque[list] = deque()
+        self.dropped = 0
+        self.sent = 0
+        self._pending_count: Optional[list] = None
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._writer_task: Optional[asyncio.Task] = None
+        # 마지막으로 클라이언트에게서 프레임을 받은 시각 (하트비트 판정용)
+        self.last_seen = time.monotonic()
+        # JSON pong에 응답한 적 있는 클라이언트만 유휴 정리 대상
+        self.answers_ping = False
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.queue)
+
+    def start(self):
+        self._writer_task = asyncio.create_task(self._writer())
+
+    def enqueue(self, message: str, kind: str = "message") -> bool:
+        """프레임을 큐에 넣는다. 연결을 끊어야 하면 False 반환"""
+        if self._closed:
+            return False
+        if (kind == "user_count" and self.overflow_policy == OVERFLOW_CONFLATE
+                and self._pending_count is not None):
+            # 아직 전송되지 않은 접속자 수 프레임은 최신 값으로 교체
+            self._pending_count[1] = message
+            return True
+        if len(self.queue) >= self.max_queue:
+            if self.overflow_policy == OVERFLOW_DISCONNECT:
+                return False
+            dropped = self.queue.popleft()
+            if dropped is self._pending_count:
+                self._pending_count = None
+            self.dropped += 1
+        frame = [kind, message]
+        if kind == "user_count":
+            self._pending_count = frame
+        self.queue.append(frame)
+        self._ready.set()
+        return True
+
+    async def _writer(self):
+        try:
+            while not self._closed:
+                if not self.queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                frame = self.queue.popleft()
+                if frame is self._pending_count:
+                    self._pending_count = None
+                payload = frame[1]
+                if isinstance(payload, bytes):
+                    send = self.websocket.send_bytes(payload)
+                else:
+                    send = self.websocket.send_text(payload)
+                started = time.perf_counter()
+                await asyncio.wait_for(send, timeout=self.manager.send_timeout)
+                SEND_LATENCY.observe(time.perf_counter() - started)
+                self.sent += 1
+        except Exception as e:
+            # 전송 실패/타임아웃 - 연결 정리
+            logger.info(f"송신 실패로 연결 제거: {str(e) or type(e).__name__}")
+            self.manager.evict([self])
+
+    async def close(self):
+        """writer 태스크 정리 후 소켓 종료"""
+        self.stop()
+        try:
+            await self.websocket.close()
+        except:
+            pass
+
+    def stop(self):
+        # writer 태스크는 대기 중이던 이벤트에서 깨어나 스스로 종료
+        self._closed = True
+        self.queue.clear()
+        self._pending_count = None
+        self._ready.set()
+
+    def stats(self) -> dict:
+        return {
+            "user_id": self.user_id,
+            "encoding": self.encoding,
+            "topics": sorted(self.topics),
+            "queue_depth": self.queue_depth,
+            "dropped": self.dropped,
+            "sent": self.sent,
+        }
+
+
+class ChatHistory:
+    """최근 채팅 프레임 링 버퍼 - 재접속한 클라이언트에게 놓친 메시지만 다시 보낸다"""
+
+    def __init__(self, maxlen: int = HISTORY_SIZE):
+        # (seq, 인코딩된 프레임) - 가득 차면 가장 오래된 항목부터 밀려남
+        self.buffer: Deque[tuple] = deque(maxlen=maxlen)
+
+    def append(self, seq: int, frame: str):
+        if not self.buffer or seq > self.buffer[-1][0]:
+            self.buffer.append((seq, frame))
+            return
+        # 다른 노드의 메시지는 순번이 뒤바뀌어 도착할 수 있음 - seq 순서를 유지하며 끼워 넣음
+        seqs = [item[0] for item in self.buffer]
+        position = bisect_left(seqs, seq)
+        if position < len(seqs) and seqs[position] == seq:
+            return
+        if len(self.buffer) == self.buffer.maxlen:
+            if position == 0:
+                return
+            self.buffer.popleft()
+            position -= 1
+        self.buffer.insert(position, (seq, frame))
+
+    @property
+    def oldest_seq(self) -> Optional[int]:
+        return self.buffer[0][0] if self.buffer else None
+
+    @property
+    def latest_seq(self) -> Optional[int]:
+        return self.buffer[-1][0] if self.buffer else None
+
+    def since(self, seq: int) -> List[str]:
+        """seq 이후의 프레임 (버퍼 크기로 제한되므로 선형 탐색)"""
+        return [frame for frame_seq, frame in self.buffer if frame_seq > seq]
+
+
 # 연결된 클라이언트 관리
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, send_timeout: float = SEND_TIMEOUT, max_queue: int = SEND_QUEUE_SIZE,
+                 overflow_policy: str = OVERFLOW_POLICY,
+                 presence_interval_ms: int = PRESENCE_INTERVAL_MS,
+                 backplane: Optional[Backplane] = None,
+                 batch_window_ms: int = BATCH_WINDOW_MS, batch_max_size: int = BATCH_MAX_SIZE,
+                 heartbeat_interval: float = HEARTBEAT_INTERVAL,
+                 heartbeat_timeout: float = HEARTBEAT_TIMEOUT,
+                 presence: bool = True):
+        # 딕셔너리 기반 레지스트리 - 추가/제거/조회 모두 O(1)
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
         self.user_connections: Dict[str, WebSocket] = {}
+        self.send_timeout = send_timeout
+        self.max_queue = max_queue
+        self.overflow_policy = overflow_policy
+        # 접속자 수/방 인원 알림 여부 (시세 전용 연결은 끔)
+        self.presence = presence
+        # 접속자 수 브로드캐스트 합치기(coalescing) 상태
+        self.presence_interval = presence_interval_ms / 1000
+        self._presence_handle: Optional[asyncio.TimerHandle] = None
+        self._last_presence_at = float("-inf")
+        self._last_published_count: Optional[int] = None
+        # 여러 워커/노드 간 브로드캐스트 중계 (없으면 단일 프로세스 모드)
+        self.backplane = backplane
+        self._cluster_count: Optional[int] = None
+        self._last_local_count: Optional[int] = None
+        # 최근 채팅 메시지 (resume 요청 처리용)
+        self.history = ChatHistory()
+        self._seq = 0
+        self._chat_lock = asyncio.Lock()
+        # 토픽 → 구독 연결 인덱스 - 토픽 발행은 해당 방 구독자만 순회
+        self.topics: Dict[str, Set[ClientConnection]] = {}
+        self._dirty_topics: Set[str] = set()
+        self._room_counts: Dict[str, int] = {}
+        # 마이크로 배치 상태 - 방(로비는 None) → 대기 중인 프레임
+        self.batch_window = batch_window_ms / 1000
+        self.batch_max_size = batch_max_size
+        self._batches: Dict[Optional[str], List[str]] = {}
+        self._batch_handle: Optional[asyncio.TimerHandle] = None
+        # 하트비트/유휴 연결 정리
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.reaped = 0
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.backplane is not None:
+            await self.backplane.start(self._on_backplane_message)
+        if self.heartbeat_interval > 0:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def close(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        if self.backplane is not None:
+            await self.backplane.close()
+
+    def touch(self, websocket: WebSocket):
+        """클라이언트에게서 프레임을 받았음을 기록 (pong 포함 모든 프레임)"""
+        client = self.active_connections.get(websocket)
+        if client is not None:
+            client.last_seen = time.monotonic()
+
+    def pong(self, websocket: WebSocket):
+        """JSON pong 수신 - 이후로는 응답이 끊기면 유휴 연결로 정리"""
+        client = self.active_connections.get(websocket)
+        if client is not None:
+            client.answers_ping = True
+            client.last_seen = time.monotonic()
 
-    async def connect(self, websocket: WebSocket, user_id: str = None):
-        await websocket.accept()
+    def reap_idle(self) -> int:
+        """제한 시간 동안 응답 없는 연결을 한 번에 제거 - 접속자 수 갱신은 evict에서 한 번만
+
+        JSON pong을 보낸 적 없는 클라이언트는 uvicorn의 프로토콜 ping/pong에 맡긴다.
+        """
+        deadline = time.monotonic() - self.heartbeat_timeout
+        idle = [client for client in self.active_connections.values()
+                if client.answers_ping and client.last_seen < deadline]
+        if idle:
+            self.evict(idle, reason=DISCONNECT_IDLE)
+            self.reaped += len(idle)
+            logger.info(f"응답 없는 연결 {len(idle)}개 정리")
+        return len(idle)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                self.reap_idle()
+                if self.active_connections:
+                    # ping은 배치에 섞지 않고 바로 큐에 넣는다
+                    self._deliver(self.active_connections.values(), json_dumps({
+                        "type": "ping",
+                        "timestamp": datetime.now().isoformat()
+                    }), kind="ping")
+            except Exception as e:
+                logger.error(f"하트비트 오류: {str(e)}")
+
+    async def _on_backplane_message(self, kind: str, message: str):
+        """다른 노드에서 온 메시지 - 로컬 연결에만 전달"""
+        if kind == "presence":
+            if message:
+                self._dirty_topics.add(message)
+            self.notify_presence_changed()
+            return
+        if kind.startswith("topic:"):
+            self._fanout_topic(kind[len("topic:"):], message)
+            return
+        if kind == "message":
+            self._remember(message)
+        self._fanout(message, kind)
+
+    def _remember(self, frame: str, seq: Optional[int] = None):
+        if seq is None:
+            seq = json_loads(frame).get("seq")
+        if seq is not None:
+            self.history.append(seq, frame)
+
+    async def next_message_seq(self) -> int:
+        """채팅 메시지 순번 - 백플레인이 있으면 클러스터 전체에서 단조 증가"""
+        if self.backplane is not None:
+            return await self.backplane.next_seq()
+        self._seq += 1
+        return self._seq
+
+    async def broadcast_chat(self, payload: dict):
+        """순번을 붙여 채팅 메시지를 브로드캐스트하고 히스토리에 보관
+
+        순번 발급(백플레인이면 Redis INCR)부터 전송까지 한 번에 하나씩 처리해서
+        이 노드가 보내는 메시지는 항상 seq 순서대로 나가고 히스토리에 쌓인다.
+        """
+        async with self._chat_lock:
+            payload["seq"] = await self.next_message_seq()
+            frame = json_dumps(payload)
+            self._remember(frame, payload["seq"])
+            await self.broadcast(frame, kind="message")
+
+    async def resume(self, websocket: WebSocket, since: int):
+        """since 이후 놓친 채팅 메시지만 다시 전송"""
+        oldest, latest = self.history.oldest_seq, self.history.latest_seq
+        # since가 최신 순번보다 크면 서버 재시작 전의 순번 (재시작하면 1부터 다시 매김)
+        restarted = latest is not None and since > latest
+        if oldest is None or since < oldest - 1 or restarted:
+            # 버퍼 범위를 벗어난 구간(또는 막 시작해서 비어 있는 버퍼)은 복구할 수 없음을 알림
+            await self.send_personal_message(json_dumps({
+                "type": "history_truncated",
+                "since": since,
+                "oldest_seq": oldest,
+                "latest_seq": latest,
+                "timestamp": datetime.now().isoformat()
+            }), websocket)
+        if restarted:
+            # 클라이언트의 순번은 이전 서버 것이므로 버퍼에 있는 메시지를 모두 보냄
+            since = 0
+        for frame in self.history.since(since):
+            await self.send_personal_message(frame, websocket)
+
+    def subscribe(self, websocket: WebSocket, topic: str) -> bool:
+        """연결을 토픽에 구독 - 이름이 잘못됐거나 구독 수 제한을 넘으면 False"""
+        client = self.active_connections.get(websocket)
+        if client is None or not TOPIC_PATTERN.match(topic) or topic == LOBBY:
+            return False
+        if topic in client.topics:
+            return True
+        if len(client.topics) >= MAX_TOPICS_PER_CONNECTION:
+            return False
+        client.topics.add(topic)
+        self.topics.setdefault(topic, set()).add(client)
+        self.notify_room_changed(topic)
+        return True
+
+    def unsubscribe(self, websocket: WebSocket, topic: str):
+        client = self.active_connections.get(websocket)
+        if client is not None and topic in client.topics:
+            self._leave_topics(client, [topic])
+
+    def _leave_topics(self, client: ClientConnection, topics):
+        for topic in list(topics):
+            client.topics.discard(topic)
+            subscribers = self.topics.get(topic)
+            if subscribers is None:
+                continue
+            subscribers.discard(client)
+            if not subscribers:
+                del self.topics[topic]
+            self.notify_room_changed(topic)
+
+    def room_count(self, topic: str) -> int:
+        """토픽 구독자 수 (백플레인이 있으면 마지막으로 확인한 클러스터 합계)"""
+        if self.backplane is not None and topic in self._room_counts:
+            return self._room_counts[topic]
+        return len(self.topics.get(topic, ()))
+
+    async def publish_topic(self, topic: str, payload: dict):
+        """토픽 구독자에게만 전송 - 비용은 전체 연결 수가 아니라 방 크기에 비례"""
+        payload["topic"] = topic
+        frame = json_dumps(payload)
+        self._fanout_topic(topic, frame)
+        if self.backplane is not None:
+            try:
+                await self.backplane.publish(f"topic:{topic}", frame)
+            except Exception as e:
+                logger.error(f"백플레인 전송 실패: {str(e)}")
+
+    def _fanout_topic(self, topic: str, frame: str, kind: str = "message"):
+        subscribers = self.topics.get(topic)
+        if not subscribers:
+            return
+        if self.batch_window and kind == "message":
+            self._add_to_batch(topic, frame)
+        else:
+            self._deliver(subscribers, frame, kind)
+
+    @property
+    def user_count(self) -> int:
+        """클러스터 전체 접속자 수 (백플레인이 없으면 이 프로세스의 연결 수)"""
+        local = len(self.active_connections)
+        if self.backplane is None or self._cluster_count is None:
+            return local
+        return self._cluster_count + local - (self._last_local_count or 0)
+
+    async def connect(self, websocket: WebSocket, user_id: str = None,
+                      encoding: str = ENCODING_JSON, subprotocol: Optional[str] = None):
+        await websocket.accept(subprotocol=subprotocol)
         
         # 중복 연결 방지 - 더 엄격한 체크
         if websocket not in self.active_connections:
-            self.active_connections.append(websocket)
+            client = ClientConnection(websocket, self, self.max_queue, self.overflow_policy)
+            client.user_id = user_id
+            client.encoding = encoding
+            self.active_connections[websocket] = client
+            client.start()
+            CONNECTS.inc()
             if user_id:
                 # 같은 사용자의 기존 연결이 있으면 제거
-                if user_id in self.user_connections:
-                    old_websocket = self.user_connections[user_id]
-                    if old_websocket in self.active_connections:
-                        self.active_connections.remove(old_websocket)
-                        try:
-                            await old_websocket.close()
-                        except:
-                            pass
+                old_websocket = self.user_connections.get(user_id)
+                old_client = self.active_connections.pop(old_websocket, None) if old_websocket else None
+                if old_client is not None:
+                    DISCONNECT_REPLACED.inc()
+                    self._leave_topics(old_client, old_client.topics)
+                    await old_client.close()
                 self.user_connections[user_id] = websocket
             logger.info(f"클라이언트 연결됨. 총 연결: {len(self.active_connections)}")
             
-            # 동시접속자 수 브로드캐스트
-            await self.broadcast_user_count()
+            # 새 연결에는 현재 접속자 수를 바로 보내고, 전체 브로드캐스트는 합쳐서 처리
+            if self.presence:
+                client.enqueue(self._encode_for(client, json_dumps(self._user_count_message())),
+                               kind="user_count")
+            self.notify_presence_changed()
         else:
             logger.warning("이미 연결된 클라이언트입니다.")
 
     def disconnect(self, websocket: WebSocket, user_id: str = None):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.active_connections.pop(websocket, None)
+        if client is not None:
+            self._leave_topics(client, client.topics)
+            client.stop()
+            DISCONNECT_CLIENT.inc()
             logger.info(f"WebSocket 연결 제거됨. 총 연결: {len(self.active_connections)}")
         
-        if user_id and user_id in self.user_connections:
-            if self.user_connections[user_id] == websocket:
-                del self.user_connections[user_id]
-                logger.info(f"사용자 {user_id} 연결 해제됨")
+        if user_id and self.user_connections.get(user_id) is websocket:
+            del self.user_connections[user_id]
+            logger.info(f"사용자 {user_id} 연결 해제됨")
         
         logger.info(f"클라이언트 연결 해제됨. 총 연결: {len(self.active_connections)}")
-        
-        # 동시접속자 수 브로드캐스트는 WebSocket 핸들러에서 처리
+        self.notify_presence_changed()
+
+    def evict(self, clients: List[ClientConnection], reason=DISCONNECT_EVICTED):
+        """송신 실패/큐 초과 연결을 일괄 제거하고 소켓을 닫는다"""
+        removed = 0
+        for client in clients:
+            if self.active_connections.pop(client.websocket, None) is not None:
+                removed += 1
+                reason.inc()
+            self._leave_topics(client, client.topics)
+            if client.user_id and self.user_connections.get(client.user_id) is client.websocket:
+                del self.user_connections[client.user_id]
+            client.stop()
+            asyncio.ensure_future(client.close())
+        if removed:
+            logger.info(f"{removed}개 연결 제거됨. 총 연결: {len(self.active_connections)}")
+            self.notify_presence_changed()
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+        client = self.active_connections.get(websocket)
+        if client is None:
+            await websocket.send_text(message)
+            return
+        payload = self._encode_for(client, message)
+        OUTBOUND_BYTES.inc(frame_size(payload))
+        if not client.enqueue(payload):
+            self.evict([client])
+
+    @staticmethod
+    def _encode_for(client: ClientConnection, frame: str):
+        if client.encoding == ENCODING_MSGPACK:
+            return json_to_msgpack(frame)
+        return frame
 
-    async def broadcast(self, message: str):
-        # 중복 전송 방지를 위한 세트 사용
-        sent_connections = set()
-        for connection in self.active_connections:
+    async def broadcast(self, message: str, kind: str = "message"):
+        """모든 연결의 송신 큐에 프레임을 넣고, 백플레인이 있으면 다른 노드에도 중계"""
+        self._fanout(message, kind)
+        if self.backplane is not None:
             try:
-                if connection not in sent_connections:
-                    await connection.send_text(message)
-                    sent_connections.add(connection)
-            except:
-                # 연결이 끊어진 경우 제거
-                if connection in self.active_connections:
-                    self.active_connections.remove(connection)
-
-    async def broadcast_user_count(self):
-        """동시접속자 수를 모든 클라이언트에게 브로드캐스트"""
-        user_count = len(self.active_connections)
-        count_message = {
+                await self.backplane.publish(kind, message)
+            except Exception as e:
+                logger.error(f"백플레인 전송 실패: {str(e)}")
+
+    def _fanout(self, message: str, kind: str = "message"):
+        """로컬 연결 전체(로비)에 전송 - 배치 모드면 채팅 메시지만 창(window) 동안 모아서 한 프레임으로
+
+        접속자 수/방 인원 같은 다른 종류는 kind를 유지해야 큐에서 교체(conflate)되므로 바로 보낸다.
+        """
+        if self.batch_window and kind == "message":
+            self._add_to_batch(None, message)
+        else:
+            self._deliver(self.active_connections.values(), message, kind)
+
+    def _deliver(self, clients, frame: str, kind: str = "message"):
+        """연결들의 송신 큐에 프레임 추가 - 실제 전송은 연결별 writer 태스크가 담당"""
+        # MessagePack 연결이 있으면 바이너리 프레임도 브로드캐스트당 한 번만 만든다
+        started = time.perf_counter()
+        binary = None
+        binary_clients = 0
+        overflowed = []
+        clients = list(clients)
+        for client in clients:
+            payload = frame
+            if client.encoding == ENCODING_MSGPACK:
+                if binary is None:
+                    binary = json_to_msgpack(frame)
+                payload = binary
+                binary_clients += 1
+            if not client.enqueue(payload, kind):
+                overflowed.append(client)
+        # 메트릭은 연결마다가 아니라 브로드캐스트당 한 번만 갱신
+        BROADCAST_DURATION.observe(time.perf_counter() - started)
+        BROADCAST_RECIPIENTS.inc(len(clients))
+        if clients:
+            size = (len(clients) - binary_clients) * frame_size(frame)
+            if binary_clients:
+                size += binary_clients * len(binary)
+            OUTBOUND_BYTES.inc(size)
+        if overflowed:
+            # 큐가 넘친 느린 소비자 일괄 제거 (disconnect 정책)
+            self.evict(overflowed)
+
+    def _add_to_batch(self, topic: Optional[str], frame: str):
+        """배치 모드: 방(로비는 None)별로 프레임을 모았다가 창이 끝나거나 최대 개수가 되면 전송"""
+        frames = self._batches.setdefault(topic, [])
+        frames.append(frame)
+        if len(frames) >= self.batch_max_size:
+            self._flush_batch(topic)
+        elif self._batch_handle is None:
+            self._batch_handle = asyncio.get_running_loop().call_later(
+                self.batch_window, self._flush_batches
+            )
+
+    def _flush_batches(self):
+        self._batch_handle = None
+        for topic in list(self._batches):
+            self._flush_batch(topic)
+
+    def _flush_batch(self, topic: Optional[str]):
+        frames = self._batches.pop(topic, None)
+        if not frames:
+            return
+        # 이미 인코딩된 프레임을 이어 붙여 JSON 배열 하나로 - 다시 직렬화하지 않음
+        frame = frames[0] if len(frames) == 1 else "[" + ",".join(frames) + "]"
+        clients = self.active_connections.values() if topic is None else self.topics.get(topic, ())
+        self._deliver(clients, frame)
+
+    async def broadcast_json(self, payload: dict, kind: str = "message"):
+        """페이로드를 한 번만 직렬화하고 같은 프레임을 모든 연결에 전송"""
+        await self.broadcast(json_dumps(payload), kind)
+
+    def queue_stats(self) -> List[dict]:
+        """연결별 송신 큐 깊이 - 느린 클라이언트 확인용"""
+        return [client.stats() for client in self.active_connections.values()]
+
+    def _user_count_message(self, count: Optional[int] = None) -> dict:
+        return {
             "type": "user_count",
-            "count": user_count,
+            "count": self.user_count if count is None else count,
             "timestamp": datetime.now().isoformat()
         }
-        await self.broadcast(json.dumps(count_message))
 
-manager = ConnectionManager()
+    async def broadcast_user_count(self, count: Optional[int] = None):
+        """동시접속자 수를 이 노드의 모든 클라이언트에게 즉시 브로드캐스트
+
+        다른 노드는 각자 클러스터 합계를 계산해 보내므로 백플레인으로 중계하지 않는다.
+        """
+        message = self._user_count_message(count)
+        self._last_published_count = message["count"]
+        self._fanout(json_dumps(message), kind="user_count")
+
+    def notify_presence_changed(self):
+        """접속자 수 변경 알림 - presence_interval 당 최대 한 번, 값이 바뀐 경우에만 브로드캐스트
+
+        재접속 폭주 시 접속/해제마다 전체 브로드캐스트하면 O(N²) 프레임이 나가므로 합쳐서 보낸다.
+        """
+        if not self.presence or self._presence_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        delay = max(0.0, self._last_presence_at + self.presence_interval - loop.time())
+        self._presence_handle = loop.call_later(delay, self._flush_presence)
+
+    def notify_room_changed(self, topic: str):
+        """토픽 구독자 수 변경 알림 - 전체 접속자 수와 같은 주기로 합쳐서 전송"""
+        if not self.presence:
+            return
+        self._dirty_topics.add(topic)
+        self.notify_presence_changed()
+
+    def _publish_room_count(self, topic: str, count: int):
+        if self._room_counts.get(topic) == count:
+            return
+        if count:
+            self._room_counts[topic] = count
+        else:
+            self._room_counts.pop(topic, None)
+        self._fanout_topic(topic, json_dumps({
+            "type": "room_count",
+            "topic": topic,
+            "count": count,
+            "timestamp": datetime.now().isoformat()
+        }), kind="room_count")
+
+    def _flush_presence(self):
+        self._presence_handle = None
+        self._last_presence_at = asyncio.get_running_loop().time()
+        topics, self._dirty_topics = self._dirty_topics, set()
+        if self.backplane is None:
+            if len(self.active_connections) != self._last_published_count:
+                asyncio.ensure_future(self.broadcast_user_count())
+            for topic in topics:
+                self._publish_room_count(topic, len(self.topics.get(topic, ())))
+            return
+        asyncio.ensure_future(self._sync_cluster_presence(topics))
+
+    async def _sync_cluster_presence(self, topics: Set[str] = frozenset()):
+        """이 노드의 연결/구독자 수를 공유 카운터에 반영하고 클러스터 합계를 브로드캐스트"""
+        try:
+            local = len(self.active_connections)
+            if local != self._last_local_count:
+                await self.backplane.set_local_count(local)
+                self._last_local_count = local
+                # 다른 노드도 합계를 다시 읽도록 알림 (자기 노드 값이 바뀐 경우에만)
+                await self.backplane.publish("presence", "")
+            self._cluster_count = await self.backplane.total_connections()
+            room_totals = {}
+            for topic in topics:
+                local_room = len(self.topics.get(topic, ()))
+                if await self.backplane.set_local_count(local_room, topic):
+                    await self.backplane.publish("presence", topic)
+                room_totals[topic] = await self.backplane.total_connections(topic)
+        except Exception as e:
+            logger.error(f"클러스터 접속자 수 동기화 실패: {str(e)}")
+            return
+        if self._cluster_count != self._last_published_count:
+            await self.broadcast_user_count(self._cluster_count)
+        for topic, count in room_totals.items():
+            self._publish_room_count(topic, count)
+
+manager = ConnectionManager(backplane=create_backplane())
+# 시세 전용 연결 (/ws/tickers) - 채팅 로비 브로드캐스트와 접속자 수에 섞이지 않도록 따로 관리
+# 시세 프레임은 seq 순서가 중요하고 클라이언트가 배열을 읽지 않으므로 마이크로 배치를 쓰지 않는다
+market_manager = ConnectionManager(presence=False, batch_window_ms=0)
+
+# 서버가 Upbit 시세를 한 번만 구독해서 /ws/tickers 의 "tickers" 토픽 구독자에게 중계 (false면 끔)
+MARKET_FEED_ENABLED = os.getenv("WS_MARKET_FEED", "true").lower() == "true"
+TICKER_TOPIC = "tickers"
+# 거래소별 상승률 상위 N 토픽 (예: "gainers-upbit") - 구성이나 순서가 바뀔 때만 전송
+GAINERS_TOPIC_PREFIX = "gainers-"
+# 이 간격(밀리초) 동안 바뀐 마켓을 모아 프레임 하나로 전송
+TICKER_INTERVAL_MS = int(os.getenv("WS_TICKER_INTERVAL_MS", "250"))
+
+
+def is_market_topic(topic: str) -> bool:
+    """시세 전용 토픽 (tickers, gainers-*) - 채팅방으로 구독하거나 메시지를 보낼 수 없음"""
+    return topic == TICKER_TOPIC or topic.startswith(GAINERS_TOPIC_PREFIX)
+
+
+class TickerRelay:
+    """업스트림 시세 → 최신 시세 테이블 → 구독 중인 클라이언트
+
+    업스트림 연결 수는 접속자 수와 무관하게 노드당 하나. 각 노드가 직접 구독하므로
+    백플레인으로 중계하지 않고 로컬 구독자에게만 보낸다.
+
+    구독하면 seq가 붙은 전체 스냅샷을 한 번 보내고, 이후에는 직전 프레임 이후 바뀐
+    마켓의 바뀐 필드만 seq를 1씩 올려 보낸다 (ticker_delta). 클라이언트는 seq가 건너뛰면
+    {"type": "resync", "topic": "tickers"}로 스냅샷을 다시 요청한다.
+    """
+
+    def __init__(self, manager: ConnectionManager, interval_ms: int = TICKER_INTERVAL_MS):
+        self.manager = manager
+        self.interval = interval_ms / 1000
+        # Upbit 최신 시세 테이블 + 멀티 거래소 엔진 (crypto.service)
+        self.service = MarketService(enabled=MARKET_FEED_ENABLED, on_upbit_update=self.mark_changed)
+        self.table = self.service.tickers
+        self.gainers = self.service.gainers
+        self.gainers.on_change = self.mark_gainers_changed
+        self.seq = 0
+        # 마지막으로 보낸 프레임 기준의 마켓별 값 (델타 계산 기준)
+        self.sent: Dict[str, list] = {}
+        self._changed: Set[str] = set()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._gainers_changed: Set[str] = set()
+        self._gainers_handle: Optional[asyncio.TimerHandle] = None
+
+    def start(self):
+        self.service.start_task()
+
+    def stop(self):
+        self.service.stop()
+
+    def mark_changed(self, code: str):
+        self._changed.add(code)
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.interval, self.flush)
+
+    def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        codes, self._changed = self._changed, set()
+        if not codes:
+            return
+        # 구독자가 없어도 기준값은 갱신해야 다음 스냅샷 이후 델타가 맞음
+        subscribed = bool(self.manager.topics.get(TICKER_TOPIC))
+        changes = {}
+        for code in codes:
+            values = self.table.rows.get(code)
+            if values is None:
+                continue
+            previous = self.sent.get(code)
+            self.sent[code] = values
+            if not subscribed:
+                continue
+            if previous is None:
+                # 처음 보는 마켓은 이름까지 포함한 전체 행
+                changes[code] = self.table.get(code)
+                continue
+            fields = {
+                name: value
+                for name, value, old in zip(FIELD_NAMES, values, previous)
+                if value != old
+            }
+            if fields:
+                changes[code] = fields
+        if not changes:
+            return
+        self.seq += 1
+        self.manager._fanout_topic(TICKER_TOPIC, json_dumps({
+            "type": "ticker_delta",
+            "seq": self.seq,
+            "tickers": changes,
+        }), kind="tickers")
+
+    def mark_gainers_changed(self, exchange: str):
+        """상위 N개 구성/순서가 바뀐 거래소 (GainersIndex.on_change)"""
+        self._gainers_changed.add(exchange)
+        if self._gainers_handle is None:
+            self._gainers_handle = asyncio.get_running_loop().call_later(
+                self.interval, self.flush_gainers
+            )
+
+    def flush_gainers(self):
+        self._gainers_handle = None
+        exchanges, self._gainers_changed = self._gainers_changed, set()
+        for exchange in exchanges:
+            topic = GAINERS_TOPIC_PREFIX + exchange
+            if self.manager.topics.get(topic):
+                self.manager._fanout_topic(topic, self.gainers_frame(exchange), kind="top_gainers")
+
+    def gainers_frame(self, exchange: str) -> str:
+        return json_dumps({"type": "top_gainers", **self.gainers.result(exchange, self.gainers.push_n)})
+
+    def gainers_exchange(self, topic: str) -> Optional[str]:
+        """상승률 토픽 이름 → 거래소 (gainers-upbit → upbit), 아니면 None"""
+        if not topic.startswith(GAINERS_TOPIC_PREFIX):
+            return None
+        exchange = topic[len(GAINERS_TOPIC_PREFIX):]
+        return exchange if exchange in self.service.engine.exchange_index else None
+
+    def snapshot_frame(self) -> str:
+        """구독 직후(또는 resync 요청 시) 보내는 전체 시세
+
+        대기 중인 변경을 먼저 내보내서 스냅샷과 seq 이후 델타의 기준을 맞춘다.
+        """
+        self.flush()
+        return json_dumps({
+            "type": "ticker_snapshot",
+            "seq": self.seq,
+            "version": self.table.version,
+            "tickers": self.table.snapshot(),
+        })
+
+
+ticker_relay = TickerRelay(market_manager)
+loop_lag_monitor = LoopLagMonitor(LOOP_LAG, LOOP_LAG_HISTOGRAM, LOOP_LAG_INTERVAL)
+
+# 현재 값 지표는 수집(scrape) 시점에 계산
+metrics.gauge("ws_active_connections", "Connections on this process",
+              lambda: len(manager.active_connections))
+metrics.gauge("ws_cluster_connections", "Connections across the cluster",
+              lambda: manager.user_count)
+metrics.gauge("ws_ticker_connections", "Ticker-only connections (/ws/tickers) on this process",
+              lambda: len(market_manager.active_connections))
+metrics.gauge("ws_topics", "Topics with at least one local subscriber", lambda: len(manager.topics))
+metrics.gauge("ws_send_queue_frames", "Frames waiting in per-connection send queues",
+              lambda: sum(client.queue_depth for client in manager.active_connections.values()))
+
+
+@app.on_event("startup")
+async def startup():
+    await manager.start()
+    await market_manager.start()
+    loop_lag_monitor.start()
+    ticker_relay.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    loop_lag_monitor.stop()
+    ticker_relay.stop()
+    if chat_writer is not None:
+        await chat_writer.close()
+    await manager.close()
+    await market_manager.close()
 
 # JWT 토큰 검증
 def verify_token(token: str) -> dict:
@@ -108,7 +973,7 @@ def verify_token(token: str) -> dict:
         # Django의 SECRET_KEY 사용
         SECRET_KEY = "django-insecure-eg*x8n7i6f1zw9n_0f8(#$v65@&$0+5$9c0$*-ozlvzeq)95!^"
         payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        logger.info(f"토큰 검증 성공: {payload}")
+        logger.debug(f"토큰 검증 성공: user_id={payload.get('user_id')}")
         return payload
     except jwt.ExpiredSignatureError as e:
         logger.error(f"토큰 만료: {str(e)}")
@@ -120,6 +985,298 @@ def verify_token(token: str) -> dict:
         logger.error(f"토큰 검증 오류: {str(e)}")
         raise HTTPException(status_code=401, detail="토큰 검증 중 오류가 발생했습니다")
 
+# 검증된 토큰 캐시 크기 (재접속마다 다시 보내는 auth 메시지의 HMAC 검증 생략)
+TOKEN_CACHE_SIZE = int(os.getenv("WS_TOKEN_CACHE_SIZE", "10000"))
+
+
+class TokenCache:
+    """검증된 JWT 페이로드 LRU 캐시 - 키는 토큰의 SHA-256 다이제스트, exp가 지나면 무효"""
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        payload = self._entries.get(key)
+        if payload is not None:
+            exp = payload.get("exp")
+            if exp is None or exp > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                TOKEN_CACHE_HIT.inc()
+                return payload
+            del self._entries[key]
+        self.misses += 1
+        TOKEN_CACHE_MISS.inc()
+        return None
+
+    def put(self, token: str, payload: dict):
+        key = self._key(token)
+        self._entries[key] = payload
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+token_cache = TokenCache()
+metrics.gauge("ws_token_cache_entries", "Verified JWTs held in the token cache",
+              lambda: len(token_cache._entries))
+
+
+async def verify_token_cached(token: str) -> dict:
+    """캐시를 먼저 확인하고, 없으면 이벤트 루프 밖(스레드)에서 검증"""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+    payload = await asyncio.to_thread(verify_token, token)
+    token_cache.put(token, payload)
+    return payload
+
+# 수신 프레임 속도 제한 (토큰 버킷) - 연결별, 인증 후에는 사용자별로도 적용
+RATE_LIMIT_PER_SEC = float(os.getenv("WS_RATE_LIMIT_PER_SEC", "5"))
+RATE_LIMIT_BURST = float(os.getenv("WS_RATE_LIMIT_BURST", "10"))
+# 파싱 전에 거르는 최대 프레임 크기 (UTF-8 바이트)
+MAX_FRAME_SIZE = int(os.getenv("WS_MAX_FRAME_SIZE", "4096"))
+# 이보다 큰 프레임은 uvicorn이 버퍼에 다 받기 전에 연결을 끊음 (1009) - 그 사이는 위 제한의 벌칙 적용
+MAX_WIRE_FRAME_SIZE = int(os.getenv("WS_MAX_WIRE_FRAME_SIZE", str(MAX_FRAME_SIZE * 4)))
+# 제한 초과 시 처리: drop(무시) | notice(무시 + 안내) | disconnect(연결 종료)
+PENALTY_DROP = "drop"
+PENALTY_NOTICE = "notice"
+PENALTY_DISCONNECT = "disconnect"
+RATE_LIMIT_PENALTY = os.getenv("WS_RATE_LIMIT_PENALTY", PENALTY_NOTICE)
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self, now: float, cost: float = 1.0) -> bool:
+        """토큰을 쓰지 않고 cost만큼 남았는지만 확인"""
+        self._refill(now)
+        return self.tokens >= cost
+
+    def consume(self, now: float, cost: float = 1.0) -> bool:
+        if not self.available(now, cost):
+            return False
+        self.tokens -= cost
+        return True
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class RateLimiter:
+    """수신 경로 보호 - 한 클라이언트가 N개를 보내 N×접속자 수만큼 전송을 유발하지 못하게 한다"""
+
+    # 사용자별 버킷 최대 개수 - 넘으면 가장 오래 안 쓴 사용자부터 제거 (LRU)
+    MAX_USER_BUCKETS = 10000
+
+    def __init__(self, rate: float = RATE_LIMIT_PER_SEC, burst: float = RATE_LIMIT_BURST,
+                 max_frame_size: int = MAX_FRAME_SIZE, penalty: str = RATE_LIMIT_PENALTY):
+        self.rate = rate
+        self.burst = burst
+        self.max_frame_size = max_frame_size
+        self.penalty = penalty
+        self.user_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.counters = {
+            "allowed": 0,
+            "rate_limited": 0,
+            "oversized": 0,
+            "disconnected": 0,
+        }
+
+    def new_bucket(self) -> TokenBucket:
+        return TokenBucket(self.rate, self.burst)
+
+    def _user_bucket(self, user_id: str, now: float) -> TokenBucket:
+        bucket = self.user_buckets.get(user_id)
+        if bucket is None:
+            bucket = self.user_buckets[user_id] = self.new_bucket()
+            while len(self.user_buckets) > self.MAX_USER_BUCKETS:
+                self.user_buckets.popitem(last=False)
+        else:
+            self.user_buckets.move_to_end(user_id)
+        return bucket
+
+    def check(self, size: int, bucket: TokenBucket, user_id: Optional[str] = None) -> Optional[str]:
+        """허용이면 None, 아니면 거부 사유 (oversized | rate_limited)"""
+        if size > self.max_frame_size:
+            self.counters["oversized"] += 1
+            return "oversized"
+        now = time.monotonic()
+        buckets = [bucket, self._user_bucket(user_id, now)] if user_id else [bucket]
+        # 두 버킷을 모두 확인한 뒤에만 차감 - 사용자 버킷에서 거부된 프레임이 연결 버킷을 쓰지 않도록
+        if not all(item.available(now) for item in buckets):
+            self.counters["rate_limited"] += 1
+            return "rate_limited"
+        for item in buckets:
+            item.consume(now)
+        self.counters["allowed"] += 1
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_sec": self.rate,
+            "burst": self.burst,
+            "penalty": self.penalty,
+            "user_buckets": len(self.user_buckets),
+            **self.counters,
+        }
+
+
+rate_limiter = RateLimiter()
+
+# 채팅 메시지 저장 (write-behind) - 메시지마다 DB에 쓰지 않고 모아서 bulk insert
+PERSIST_MESSAGES = os.getenv("WS_PERSIST_MESSAGES", "true").lower() == "true"
+PERSIST_BATCH_SIZE = int(os.getenv("WS_PERSIST_BATCH_SIZE", "100"))
+PERSIST_INTERVAL_MS = int(os.getenv("WS_PERSIST_INTERVAL_MS", "1000"))
+# DB가 느리거나 죽었을 때 메모리에 쌓아 둘 최대 메시지 수 (넘으면 오래된 것부터 버림)
+PERSIST_MAX_PENDING = int(os.getenv("WS_PERSIST_MAX_PENDING", "10000"))
+
+
+class WriteBehindBuffer:
+    """레코드를 모아 두었다가 개수/시간 기준으로 sink에 일괄 전달
+
+    sink는 동기 함수로, 이벤트 루프를 막지 않도록 스레드에서 실행한다.
+    한 번에 하나의 flush만 돌기 때문에 DB에는 순서대로 한 묶음씩 들어간다.
+    """
+
+    def __init__(self, sink: Callable[[List[dict]], None], batch_size: int = PERSIST_BATCH_SIZE,
+                 interval_ms: int = PERSIST_INTERVAL_MS, max_pending: int = PERSIST_MAX_PENDING):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.interval = interval_ms / 1000
+        self.max_pending = max_pending
+        self.pending: Deque[dict] = deque()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._drain = False
+
+    def add(self, record: dict):
+        if len(self.pending) >= self.max_pending:
+            self.pending.popleft()
+            self.dropped += 1
+        self.pending.append(record)
+        if len(self.pending) >= self.batch_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.interval, self._on_timer)
+
+    def _on_timer(self):
+        # 시간이 지나면 batch_size에 못 미치는 나머지도 저장
+        self._timer = None
+        self._drain = True
+        self._start_flush()
+
+    def _start_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self.flush())
+
+    async def flush(self, drain: bool = False):
+        """batch_size 단위로 sink에 전달 - drain이면 남은 것까지 모두"""
+        while self.pending and (drain or self._drain or len(self.pending) >= self.batch_size):
+            batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+            try:
+                await asyncio.to_thread(self.sink, batch)
+                self.written += len(batch)
+                self.batches += 1
+            except Exception as e:
+                self.failed += len(batch)
+                logger.error(f"채팅 메시지 저장 실패 ({len(batch)}개): {str(e)}")
+        self._drain = False
+        if self.pending and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.interval, self._on_timer)
+
+    async def close(self):
+        """종료 시 남은 메시지 저장"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flush_task is not None:
+            await self._flush_task
+        await self.flush(drain=True)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.pending),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+_django_ready = False
+
+
+def save_chat_messages(records: List[dict]):
+    """Django ORM으로 채팅 메시지 일괄 저장 (워커 스레드에서 호출)"""
+    global _django_ready
+    if not _django_ready:
+        import django
+
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "whyup.settings")
+        django.setup()
+        _django_ready = True
+    from django.db import close_old_connections
+    from posts.models import ChatMessage as ChatMessageModel
+
+    try:
+        ChatMessageModel.objects.bulk_create([ChatMessageModel(**record) for record in records])
+    finally:
+        # 요청 사이클 밖의 스레드라 Django가 정리해 주지 않음 - 끊기거나 오래된 연결을 닫아 다음 배치가 새로 연결
+        close_old_connections()
+
+
+chat_writer = WriteBehindBuffer(save_chat_messages) if PERSIST_MESSAGES else None
+
+
+def persist_chat(payload: dict, topic: str, user_info: Optional[dict]):
+    """브로드캐스트한 채팅 메시지를 저장 버퍼에 추가 (이 노드에서 보낸 것만)"""
+    if chat_writer is None:
+        return
+    chat_writer.add({
+        "topic": topic,
+        "seq": payload.get("seq"),
+        "user_id": user_info.get("user_id") if user_info else None,
+        "user_name": str(payload.get("user", ""))[:50],
+        "message": payload.get("message", ""),
+        "created_at": datetime.now().astimezone(),
+    })
+
 # 메시지 모델
 class ChatMessage(BaseModel):
     type: str
@@ -129,24 +1286,56 @@ class ChatMessage(BaseModel):
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    encoding, subprotocol = negotiate_encoding(websocket)
+    await manager.connect(websocket, encoding=encoding, subprotocol=subprotocol)
     user_info = None
-    
-    # 연결 즉시 동시접속자 수 전송
-    await manager.broadcast_user_count()
+    bucket = rate_limiter.new_bucket()
+    last_notice = 0.0
     
     try:
         while True:
             # 클라이언트로부터 메시지 수신
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
+            data = await receive_frame(websocket)
+            client = manager.active_connections.get(websocket)
+            if client is None:
+                # writer 태스크가 이미 정리한 연결 (전송 제한 시간 초과/큐 초과)
+                raise WebSocketDisconnect(1011)
+            manager.touch(websocket)
+            
+            # 파싱 전에 크기/속도 제한 확인
+            rejected = rate_limiter.check(
+                frame_size(data), bucket, user_info.get("user_id") if user_info else None
+            )
+            if rejected:
+                if rate_limiter.penalty == PENALTY_DISCONNECT:
+                    rate_limiter.counters["disconnected"] += 1
+                    logger.warning(f"수신 제한 초과로 연결 종료: {rejected}")
+                    await websocket.close(code=1008)
+                    raise WebSocketDisconnect(1008)
+                now = time.monotonic()
+                if rate_limiter.penalty == PENALTY_NOTICE and now - last_notice >= 1.0:
+                    # 안내 메시지도 초당 한 번까지만
+                    last_notice = now
+                    await manager.send_personal_message(json_dumps({
+                        "type": "system",
+                        "id": f"throttle_{datetime.now().timestamp()}",
+                        "message": "메시지를 너무 빠르게 보내고 있습니다. 잠시 후 다시 시도해주세요."
+                        if rejected == "rate_limited" else "메시지가 너무 깁니다.",
+                        "timestamp": datetime.now().isoformat()
+                    }), websocket)
+                continue
+            message_data = parse_frame(data)
+            if not isinstance(message_data, dict):
+                # 객체가 아닌 JSON (배열/숫자 등)은 무시
+                continue
             
             # 인증 메시지 처리
             if message_data.get("type") == "auth":
                 token = message_data.get("token")
                 if token:
                     try:
-                        user_info = verify_token(token)
+                        user_info = await verify_token_cached(token)
+                        AUTH_SUCCESS.inc()
                         logger.info(f"사용자 인증됨: {user_info.get('user_id')}")
                         
                         # 인증 성공 메시지 전송
@@ -157,9 +1346,10 @@ async def websocket_endpoint(websocket: WebSocket):
                             "timestamp": datetime.now().isoformat()
                         }
                         await manager.send_personal_message(
-                            json.dumps(auth_response), websocket
+                            json_dumps(auth_response), websocket
                         )
                     except Exception as e:
+                        AUTH_FAILURE.inc()
                         logger.error(f"인증 실패: {str(e)}")
                         # 인증 실패해도 연결은 유지
                         error_response = {
@@ -169,10 +1359,49 @@ async def websocket_endpoint(websocket: WebSocket):
                             "timestamp": datetime.now().isoformat()
                         }
                         await manager.send_personal_message(
-                            json.dumps(error_response), websocket
+                            json_dumps(error_response), websocket
                         )
                         # continue 제거 - 인증 실패해도 채팅 가능
             
+            # 하트비트 응답 - 이후로는 응답이 끊기면 유휴 연결로 정리
+            elif message_data.get("type") == "pong":
+                manager.pong(websocket)
+            
+            # 재접속 시 놓친 메시지 요청: {"type": "resume", "since": 마지막으로 받은 seq}
+            elif message_data.get("type") == "resume":
+                try:
+                    since = int(message_data.get("since", 0))
+                except (TypeError, ValueError):
+                    since = 0
+                await manager.resume(websocket, since)
+            
+            # 코인별 채팅방 구독/해제: {"type": "subscribe", "topic": "KRW-BTC"}
+            elif message_data.get("type") == "subscribe":
+                topic = str(message_data.get("topic", ""))
+                if not is_market_topic(topic) and manager.subscribe(websocket, topic):
+                    await manager.send_personal_message(json_dumps({
+                        "type": "subscribed",
+                        "topic": topic,
+                        "count": manager.room_count(topic),
+                        "timestamp": datetime.now().isoformat()
+                    }), websocket)
+                else:
+                    await manager.send_personal_message(json_dumps({
+                        "type": "system",
+                        "id": f"error_{datetime.now().timestamp()}",
+                        "message": "채팅방에 참여할 수 없습니다.",
+                        "timestamp": datetime.now().isoformat()
+                    }), websocket)
+            
+            elif message_data.get("type") == "unsubscribe":
+                topic = str(message_data.get("topic", ""))
+                manager.unsubscribe(websocket, topic)
+                await manager.send_personal_message(json_dumps({
+                    "type": "unsubscribed",
+                    "topic": topic,
+                    "timestamp": datetime.now().isoformat()
+                }), websocket)
+            
             # 일반 메시지 처리
             elif message_data.get("type") == "message":
                 # 인증 여부와 관계없이 메시지 처리
@@ -188,7 +1417,17 @@ async def websocket_endpoint(websocket: WebSocket):
                     "timestamp": datetime.now().isoformat()
                 }
                 
-                await manager.broadcast(json.dumps(broadcast_message))
+                topic = message_data.get("topic") or LOBBY
+                if not isinstance(topic, str) or not TOPIC_PATTERN.match(topic) or is_market_topic(topic):
+                    # 잘못된 토픽(문자열이 아니거나 이름 규칙 위반)이나 시세 토픽에는 채팅을 보내거나 저장하지 않음
+                    continue
+                if topic == LOBBY:
+                    await manager.broadcast_chat(broadcast_message)
+                    persist_chat(broadcast_message, topic, user_info)
+                elif topic in client.topics:
+                    # 코인별 채팅방 - 해당 방 구독자에게만 전송
+                    await manager.publish_topic(topic, broadcast_message)
+                    persist_chat(broadcast_message, topic, user_info)
                 logger.info(f"메시지 브로드캐스트: {message_data.get('user')} - {message_data.get('message')}")
     
     except WebSocketDisconnect:
@@ -197,16 +1436,78 @@ async def websocket_endpoint(websocket: WebSocket):
             user_id = user_info.get('user_id')
         manager.disconnect(websocket, user_id)
         logger.info("클라이언트 연결이 끊어짐")
-        # 연결 해제 시 동시접속자 수 업데이트
-        await manager.broadcast_user_count()
     except Exception as e:
         logger.error(f"WebSocket 오류: {str(e)}")
         user_id = None
         if user_info:
             user_id = user_info.get('user_id')
         manager.disconnect(websocket, user_id)
-        # 오류 발생 시에도 동시접속자 수 업데이트
-        await manager.broadcast_user_count()
+
+
+@app.websocket("/ws/tickers")
+async def tickers_endpoint(websocket: WebSocket):
+    """시세 전용 연결 - 채팅 로비/접속자 수에 포함되지 않고 시세 토픽만 구독
+
+        {"type": "subscribe", "topic": "tickers"}        → ticker_snapshot 이후 ticker_delta
+        {"type": "subscribe", "topic": "gainers-upbit"}  → top_gainers
+        {"type": "resync", "topic": "tickers"}           → ticker_snapshot (seq가 건너뛰었을 때)
+    """
+    encoding, subprotocol = negotiate_encoding(websocket)
+    await market_manager.connect(websocket, encoding=encoding, subprotocol=subprotocol)
+    bucket = rate_limiter.new_bucket()
+
+    try:
+        while True:
+            data = await receive_frame(websocket)
+            client = market_manager.active_connections.get(websocket)
+            if client is None:
+                raise WebSocketDisconnect(1011)
+            market_manager.touch(websocket)
+            # 구독 요청만 받는 연결이라 제한을 넘는 프레임은 안내 없이 버림
+            if rate_limiter.check(frame_size(data), bucket, None):
+                continue
+            message_data = parse_frame(data)
+            message_type = message_data.get("type")
+            topic = str(message_data.get("topic", ""))
+
+            if message_type == "subscribe":
+                gainers_exchange = ticker_relay.gainers_exchange(topic)
+                if (topic == TICKER_TOPIC or gainers_exchange) and market_manager.subscribe(websocket, topic):
+                    await market_manager.send_personal_message(json_dumps({
+                        "type": "subscribed",
+                        "topic": topic,
+                        "timestamp": datetime.now().isoformat()
+                    }), websocket)
+                    if topic == TICKER_TOPIC:
+                        await market_manager.send_personal_message(ticker_relay.snapshot_frame(), websocket)
+                    else:
+                        await market_manager.send_personal_message(
+                            ticker_relay.gainers_frame(gainers_exchange), websocket
+                        )
+                else:
+                    await market_manager.send_personal_message(json_dumps({
+                        "type": "system",
+                        "id": f"error_{datetime.now().timestamp()}",
+                        "message": "구독할 수 없는 시세 토픽입니다.",
+                        "timestamp": datetime.now().isoformat()
+                    }), websocket)
+
+            elif message_type == "resync":
+                if topic == TICKER_TOPIC and TICKER_TOPIC in client.topics:
+                    TICKER_RESYNCS.inc()
+                    await market_manager.send_personal_message(ticker_relay.snapshot_frame(), websocket)
+
+            elif message_type == "unsubscribe":
+                market_manager.unsubscribe(websocket, topic)
+
+            elif message_type == "pong":
+                market_manager.pong(websocket)
+
+    except WebSocketDisconnect:
+        market_manager.disconnect(websocket)
+    except Exception as e:
+        logger.error(f"시세 WebSocket 오류: {str(e)}")
+        market_manager.disconnect(websocket)
 
 @app.get("/")
 async def root():
@@ -217,7 +1518,57 @@ async def health_check():
     return {
         "status": "healthy",
         "active_connections": len(manager.active_connections),
+        "cluster_connections": manager.user_count,
+        "ticker_connections": len(market_manager.active_connections),
+        "reaped_connections": manager.reaped,
+        "json_backend": JSON_BACKEND,
+        "token_cache": token_cache.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "chat_persistence": chat_writer.stats() if chat_writer is not None else None,
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus 스크레이프용 - 로컬에서는 curl localhost:8001/metrics 로 확인"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/tickers")
+async def tickers():
+    """서버가 유지하는 최신 시세 스냅샷"""
+    return {
+        "version": ticker_relay.table.version,
+        "tickers": ticker_relay.table.snapshot(),
+        "feed": ticker_relay.service.stats(),
+    }
+
+@app.get("/rooms")
+async def room_stats():
+    """토픽별 구독자 수"""
+    return {
+        "rooms": {topic: manager.room_count(topic) for topic in manager.topics},
+    }
+
+@app.get("/connections")
+async def connection_stats():
+    """연결별 송신 큐 깊이/드롭 수 (깊은 순)"""
+    stats = sorted(manager.queue_stats(), key=lambda item: item["queue_depth"], reverse=True)
+    return {
+        "overflow_policy": manager.overflow_policy,
+        "max_queue": manager.max_queue,
+        "connections": stats,
+    }
+
 if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8001")),
+        # 클라이언트가 지원하면 permessage-deflate 압축 협상
+        ws_per_message_deflate=os.getenv("WS_PER_MESSAGE_DEFLATE", "true").lower() == "true",
+        ws_max_size=MAX_WIRE_FRAME_SIZE,
+        # 프로토콜 수준 하트비트 - JSON pong을 구현하지 않은 클라이언트도 끊긴 연결은 정리됨
+        ws_ping_interval=HEARTBEAT_INTERVAL or None,
+        ws_ping_timeout=HEARTBEAT_TIMEOUT or None,
+    )
@@ -0,0 +1,200 @@
+"""
+WebSocket 서버 메트릭
+외부 라이브러리 없이 Prometheus 텍스트 포맷(/metrics)으로 내보낸다
+
+이벤트 루프 하나에서만 갱신하므로 잠금 없이 숫자만 더한다 (핫패스 비용은 덧셈 몇 번).
+현재 값만 의미 있는 지표(연결 수 등)는 수집 시점에 콜백으로 읽어 핫패스에서 아예 빠진다.
+"""
+
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 지연 시간 히스토그램 기본 구간 (초)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        # 레이블 값 튜플 → 자식 메트릭 (레이블이 없으면 자기 자신만)
+        self._children: Dict[Tuple[str, ...], "Metric"] = {}
+
+    def labels(self, *values: str) -> "Metric":
+        """레이블 값별 자식 메트릭 - 핫패스에서는 미리 받아 두고 재사용"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+            child.labelnames = self.labelnames
+        return child
+
+    @abstractmethod
+    def _new_child(self) -> "Metric":
+        """레이블 값 하나에 해당하는 같은 종류의 메트릭"""
+
+    @abstractmethod
+    def _samples(self, labels: Tuple[str, ...]) -> List[str]:
+        """노출 형식의 샘플 줄"""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        if self.labelnames:
+            for key, child in sorted(self._children.items()):
+                lines.extend(child._samples(key))
+        else:
+            lines.extend(self._samples(()))
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.value = 0
+
+    def _new_child(self):
+        return Counter(self.name, self.help)
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def _samples(self, labels):
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(self.value)}"]
+
+
+class Gauge(Metric):
+    """현재 값 - func가 있으면 수집할 때 호출해서 읽는다"""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, func: Optional[Callable[[], float]] = None,
+                 labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.func = func
+        self.value = 0
+
+    def _new_child(self):
+        return Gauge(self.name, self.help)
+
+    def set(self, value: float):
+        self.value = value
+
+    def _samples(self, labels):
+        value = self.func() if self.func is not None else self.value
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                 labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 마지막 칸은 +Inf - 관측 시에는 해당 구간 하나만 증가시키고 누적은 내보낼 때 계산
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def _new_child(self):
+        return Histogram(self.name, self.help, self.buckets)
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def _samples(self, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(
+                f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            )
+        label_str = _format_labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{label_str} {_format_value(self.sum)}")
+        lines.append(f"{self.name}_count{label_str} {self.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, func: Optional[Callable[[], float]] = None,
+              labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, func, labelnames))
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                  labelnames: Sequence[str] = ()) -> Histogram:
+        return self.register(Histogram(name, help, buckets, labelnames))
+
+    def render(self) -> str:
+        """Prometheus 텍스트 포맷 (text/plain; version=0.0.4)"""
+        lines = []
+        for metric in self.metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.error(f"메트릭 수집 실패 {metric.name}: {str(e)}")
+        return "\n".join(lines) + "\n"
+
+
+class LoopLagMonitor:
+    """interval마다 깨어나 예정보다 늦게 깬 시간을 이벤트 루프 지연으로 기록"""
+
+    def __init__(self, gauge: Gauge, histogram: Histogram, interval: float = 0.5):
+        self.gauge = gauge
+        self.histogram = histogram
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - expected)
+            self.gauge.set(lag)
+            self.histogram.observe(lag)
@@ -41,6 +41,8 @@ export default function ChatPage() {
     let websocket: WebSocket | null = null
     let reconnectTimeout: NodeJS.Timeout | null = null
     let isConnecting = false
+    // 마지막으로 받은 채팅 메시지 순번 (재접속 시 놓친 메시지만 요청)
+    let lastSeq: number | null = null
 
     const connectWebSocket = () => {
       // 이미 연결 중이거나 연결되어 있으면 중복 연결 방지
@@ -72,50 +74,74 @@ export default function ChatPage() {
             token: token
           }))
         }
+
+        // 재접속이면 끊긴 동안의 메시지 요청
+        if (lastSeq !== null) {
+          websocket!.send(JSON.stringify({
+            type: 'resume',
+            since: lastSeq
+          }))
+        }
       }
 
-      websocket.onmessage = (event) => {
-        try {
-          const data = JSON.parse(event.data)
-          
-          if (data.type === 'message') {
-            setMessages(prev => {
-              // 중복 메시지 방지
-              const isDuplicate = prev.some(msg => msg.id === data.id)
-              if (isDuplicate) return prev
-              
-              return [...prev, {
-                id: data.id,
-                user: data.user,
-                message: data.message,
-                timestamp: new Date(data.timestamp),
-                type: 'user'
-              }]
-            })
-          } else if (data.type === 'system') {
-            // 인증 완료 메시지는 표시하지 않음
-            if (data.message && data.message.includes('인증이 완료되었습니다')) {
-              console.log('인증 완료:', data.message)
-              return
-            }
+      // 배치 모드에서는 여러 메시지가 JSON 배열 한 프레임으로 옴
+      const handleData = (data: any) => {
+        if (data.type === 'message') {
+          if (typeof data.seq === 'number' && (lastSeq === null || data.seq > lastSeq)) {
+            lastSeq = data.seq
+          }
+          setMessages(prev => {
+            // 중복 메시지 방지
+            const isDuplicate = prev.some(msg => msg.id === data.id)
+            if (isDuplicate) return prev
             
-            setMessages(prev => {
-              // 중복 메시지 방지
-              const isDuplicate = prev.some(msg => msg.id === data.id)
-              if (isDuplicate) return prev
-              
-              return [...prev, {
-                id: data.id,
-                user: '시스템',
-                message: data.message,
-                timestamp: new Date(data.timestamp),
-                type: 'system'
-              }]
-            })
-          } else if (data.type === 'user_count') {
-            // 동시접속자 수 업데이트
-            setUserCount(data.count)
+            return [...prev, {
+              id: data.id,
+              user: data.user,
+              message: data.message,
+              timestamp: new Date(data.timestamp),
+              type: 'user'
+            }]
+          })
+        } else if (data.type === 'history_truncated') {
+          // 서버가 재시작해 순번이 1부터 다시 시작됨 - 이어서 오는 메시지로 다시 맞춤
+          if (typeof data.latest_seq === 'number' && data.since > data.latest_seq) {
+            lastSeq = null
           }
+        } else if (data.type === 'system') {
+          // 인증 완료 메시지는 표시하지 않음
+          if (data.message && data.message.includes('인증이 완료되었습니다')) {
+            console.log('인증 완료:', data.message)
+            return
+          }
+          
+          setMessages(prev => {
+            // 중복 메시지 방지
+            const isDuplicate = prev.some(msg => msg.id === data.id)
+            if (isDuplicate) return prev
+            
+            return [...prev, {
+              id: data.id,
+              user: '시스템',
+              message: data.message,
+              timestamp: new Date(data.timestamp),
+              type: 'system'
+            }]
+          })
+        } else if (data.type === 'user_count') {
+          // 동시접속자 수 업데이트
+          setUserCount(data.count)
+        } else if (data.type === 'ping') {
+          // 서버 하트비트 응답 (응답이 없으면 유휴 연결로 정리됨)
+          websocket?.send(JSON.stringify({ type: 'pong' }))
+        }
+      }
+
+      websocket.onmessage = (event) => {
+        try {
+          const parsed = JSON.parse(event.data)
+          const frames = Array.isArray(parsed) ? parsed : [parsed]
+          frames.forEach(handleData)
         } catch (error) {
           console.error('메시지 파싱 오류:', error)
         }
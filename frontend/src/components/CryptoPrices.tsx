@@ -21,7 +21,10 @@ export default function CryptoPrices() {
   useEffect(() => {
     const fetchPrices = async () => {
       try {
-        const response = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/api/crypto/prices`)
+        // 정렬은 서버가 스냅샷마다 한 번만 해 둔 순서를 그대로 사용 (가격 표시가 $라서 USDT 거래소 기준)
+        const response = await fetch(
+          `${process.env.NEXT_PUBLIC_API_URL}/api/crypto/prices?exchange=binance&sort=volume&order=desc&limit=20`
+        )
         if (response.ok) {
           const data = await response.json()
           setPrices(data)
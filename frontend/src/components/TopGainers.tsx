@@ -1,12 +1,12 @@
 'use client'
 
-import { useState } from 'react'
+import { useMemo, useState } from 'react'
 import { ArrowUpIcon, ArrowDownIcon } from '@heroicons/react/24/outline'
 import { useUpbitWebSocket } from '@/hooks/useUpbitWebSocket'
 import CryptoAnalysisModal from './CryptoAnalysisModal'
 
 export default function TopGainers() {
-  const { cryptoData, loading, error } = useUpbitWebSocket()
+  const { cryptoData, loading, error, topGainers: topSymbols } = useUpbitWebSocket({ topGainers: true })
   const [selectedCrypto, setSelectedCrypto] = useState<any>(null)
   const [isModalOpen, setIsModalOpen] = useState(false)
 
@@ -20,6 +20,14 @@ export default function TopGainers() {
     setSelectedCrypto(null)
   }
 
+  // 순위는 서버가 유지하므로 전체 정렬 없이 상위 심볼만 찾아서 표시
+  const topGainers = useMemo(() => {
+    const bySymbol = new Map(cryptoData.map(crypto => [crypto.symbol, crypto] as const))
+    return topSymbols
+      .map(symbol => bySymbol.get(symbol))
+      .filter((crypto): crypto is NonNullable<typeof crypto> => !!crypto && crypto.changePercent24h > 0)
+  }, [cryptoData, topSymbols])
+
   if (loading) {
     return (
       <div className="bg-white dark:bg-gray-800 rounded-lg shadow-md p-6">
@@ -46,11 +54,6 @@ export default function TopGainers() {
     )
   }
 
-  const topGainers = cryptoData
-    .filter(crypto => crypto.changePercent24h > 0)
-    .sort((a, b) => b.changePercent24h - a.changePercent24h)
-    .slice(0, 5)
-
   return (
     <div className="bg-white dark:bg-gray-800 rounded-lg shadow-md p-6">
       <h2 className="text-xl font-bold text-gray-900 dark:text-white mb-4">
@@ -2,40 +2,21 @@
 
 import { useState, useEffect, useRef } from 'react'
 
-interface UpbitTicker {
-  type: string
+// 서버(ws_fastapi)가 Upbit를 한 번만 구독해서 중계하는 시세 행
+interface ServerTicker {
   code: string
-  opening_price: number
-  high_price: number
-  low_price: number
-  trade_price: number
-  prev_closing_price: number
-  acc_trade_price: number
-  change: string
-  change_price: number
-  signed_change_price: number
-  change_rate: number
-  signed_change_rate: number
-  ask_bid: string
-  trade_volume: number
-  acc_trade_volume: number
-  trade_date: string
-  trade_time: string
-  trade_timestamp: number
-  acc_ask_volume: number
-  acc_bid_volume: number
-  highest_52_week_price: number
-  highest_52_week_date: string
-  lowest_52_week_price: number
-  lowest_52_week_date: string
-  market_state: string
-  is_trading_suspended: boolean
-  delisting_date: string | null
-  market_warning: string
+  symbol: string
+  koreanName: string
+  englishName: string
+  price: number
+  change24h: number
+  changePercent24h: number
+  volume: number
+  high24h: number
+  low24h: number
+  high52w: number
+  low52w: number
   timestamp: number
-  acc_trade_price_24h: number
-  acc_trade_volume_24h: number
-  stream_type: string
 }
 
 interface CryptoData {
@@ -53,153 +34,150 @@ interface CryptoData {
   low52w: number
 }
 
-interface UpbitMarket {
-  market: string
-  korean_name: string
-  english_name: string
-  market_event: {
-    warning: boolean
-    caution: {
-      PRICE_FLUCTUATIONS: boolean
-      TRADING_VOLUME_SOARING: boolean
-      DEPOSIT_AMOUNT_SOARING: boolean
-      GLOBAL_PRICE_DIFFERENCES: boolean
-      CONCENTRATION_OF_SMALL_ACCOUNTS: boolean
-    }
-  }
+const toCryptoData = (ticker: ServerTicker): CryptoData => ({
+  symbol: ticker.symbol,
+  name: getCoinName(ticker.symbol),
+  koreanName: ticker.koreanName,
+  englishName: ticker.englishName,
+  price: ticker.price,
+  change24h: ticker.change24h,
+  changePercent24h: ticker.changePercent24h,
+  volume: ticker.volume, // 거래대금 (원)
+  high24h: ticker.high24h,
+  low24h: ticker.low24h,
+  high52w: ticker.high52w,
+  low52w: ticker.low52w
+})
+
+interface HookOptions {
+  // 서버가 유지하는 상승률 상위 목록도 받을지 (구성/순서가 바뀔 때만 push)
+  topGainers?: boolean
 }
 
-export function useUpbitWebSocket() {
+export function useUpbitWebSocket(options: HookOptions = {}) {
   const [cryptoData, setCryptoData] = useState<CryptoData[]>([])
+  const [topGainers, setTopGainers] = useState<string[]>([])
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
   const wsRef = useRef<WebSocket | null>(null)
   const reconnectTimeoutRef = useRef<NodeJS.Timeout | null>(null)
+  // 마지막으로 반영한 시세 프레임 seq (스냅샷을 받기 전이면 null)
+  const seqRef = useRef<number | null>(null)
   const [markets, setMarkets] = useState<string[]>([])
   const [marketInfo, setMarketInfo] = useState<Map<string, {koreanName: string, englishName: string}>>(new Map())
   
   // 디버그 모드 확인
   const isDebug = process.env.NODE_ENV === 'development' && process.env.NEXT_PUBLIC_DEBUG_WEBSOCKET === 'true'
-  const marketInfoRef = useRef<Map<string, {koreanName: string, englishName: string}>>(new Map())
 
-  // 업비트 마켓 목록 가져오기
-  const fetchMarkets = async () => {
+  // 전체 시세 교체 (서버 스냅샷)
+  const applySnapshot = (tickers: ServerTicker[]) => {
+    const marketInfoMap = new Map<string, {koreanName: string, englishName: string}>()
+    tickers.forEach(ticker => {
+      marketInfoMap.set(ticker.code, {
+        koreanName: ticker.koreanName,
+        englishName: ticker.englishName
+      })
+    })
+    setMarkets(tickers.map(ticker => ticker.code))
+    setMarketInfo(marketInfoMap)
+    setCryptoData(
+      tickers.map(toCryptoData).sort((a, b) => b.changePercent24h - a.changePercent24h)
+    )
+    if (tickers.length > 0) setLoading(false)
+  }
+
+  // 바뀐 마켓의 바뀐 필드만 반영 (새 마켓은 전체 행으로 옴)
+  const applyDelta = (changes: Record<string, Partial<ServerTicker>>) => {
+    const updates = new Map<string, Partial<ServerTicker>>(
+      Object.entries(changes).map(([code, fields]) =>
+        [code.replace(/^KRW-/, ''), fields] as [string, Partial<ServerTicker>]
+      )
+    )
+    setCryptoData(prev => {
+      const next = prev.map(item => {
+        const fields = updates.get(item.symbol)
+        if (!fields) return item
+        updates.delete(item.symbol)
+        return { ...item, ...fields, symbol: item.symbol, name: item.name }
+      })
+      if (updates.size === 0) return next
+      // 새로 생긴 마켓
+      const added = Array.from(updates.values()).map(fields => toCryptoData(fields as ServerTicker))
+      return [...next, ...added].sort((a, b) => b.changePercent24h - a.changePercent24h)
+    })
+    setLoading(false)
+  }
+
+  // 첫 화면은 서버가 이미 들고 있는 스냅샷으로 바로 그림
+  const fetchSnapshot = async () => {
     try {
-      if (isDebug) console.log('업비트 마켓 목록 가져오기 시작...')
       const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
-      const response = await fetch(`${apiUrl}/api/crypto/upbit/market/all`)
+      const response = await fetch(`${apiUrl}/api/crypto/tickers`)
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`)
       }
-      const data: UpbitMarket[] = await response.json()
-      
-      if (isDebug) console.log('업비트 마켓 데이터 길이:', data.length)
-      
-      // KRW 마켓만 필터링
-      const krwMarkets = data
-        .filter(market => market.market.startsWith('KRW-'))
-        .map(market => market.market)
-      
-      if (isDebug) console.log('업비트 KRW 마켓 개수:', krwMarkets.length)
-      
-      // 마켓 정보 맵 생성
-      const marketInfoMap = new Map<string, {koreanName: string, englishName: string}>()
-      data
-        .filter(market => market.market.startsWith('KRW-'))
-        .forEach(market => {
-          marketInfoMap.set(market.market, {
-            koreanName: market.korean_name,
-            englishName: market.english_name
-          })
-        })
-      
-      setMarkets(krwMarkets)
-      setMarketInfo(marketInfoMap)
-      marketInfoRef.current = marketInfoMap
-      return krwMarkets
+      const data: { tickers: ServerTicker[] } = await response.json()
+      if (isDebug) console.log('시세 스냅샷 마켓 개수:', data.tickers.length)
+      applySnapshot(data.tickers)
     } catch (err) {
-      console.error('업비트 마켓 목록 가져오기 실패:', err)
-      setError('업비트 마켓 목록을 가져올 수 없습니다.')
-      return []
+      console.error('시세 스냅샷 가져오기 실패:', err)
     }
   }
 
-  const connectWebSocket = async () => {
+  // 상승률 상위 심볼 순서 (Upbit 기준)
+  const fetchTopGainers = async () => {
     try {
-      // 먼저 마켓 목록을 가져옴
-      const marketList = await fetchMarkets()
-      if (marketList.length === 0) {
-        setError('마켓 목록을 가져올 수 없습니다.')
-        return
+      const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
+      const response = await fetch(`${apiUrl}/api/crypto/top-gainers?n=5&exchange=upbit`)
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`)
       }
+      const data: { gainers: { symbol: string }[] } = await response.json()
+      setTopGainers(data.gainers.map(gainer => gainer.symbol))
+    } catch (err) {
+      console.error('상승률 순위 가져오기 실패:', err)
+    }
+  }
 
-      // 마켓 정보가 로드될 때까지 잠시 대기
-      await new Promise(resolve => setTimeout(resolve, 100))
-
-      const ws = new WebSocket('wss://api.upbit.com/websocket/v1')
+  const connectWebSocket = () => {
+    try {
+      // 채팅(/ws)과 분리된 시세 전용 엔드포인트 - 로비/접속자 수에 잡히지 않음
+      const wsUrl = (process.env.NEXT_PUBLIC_WS_URL || 'wss://whyup-ggn1.onrender.com/ws') + '/tickers'
+      const ws = new WebSocket(wsUrl)
       
       ws.onopen = () => {
-        if (isDebug) console.log('업비트 웹소켓 연결됨')
+        if (isDebug) console.log('시세 웹소켓 연결됨')
         setError(null)
-        
-        // 업비트 웹소켓 구독 메시지 (배열 형태로 전송)
-        const subscribeMessage = [
-          { ticket: 'upbit-ticker' },
-          {
-            type: 'ticker',
-            codes: marketList
-          },
-          { format: 'DEFAULT' }
-        ]
-        
-        ws.send(JSON.stringify(subscribeMessage))
+        seqRef.current = null
+        // 구독하면 서버가 seq가 붙은 전체 스냅샷을 보내고 이후에는 바뀐 필드만 보냄
+        ws.send(JSON.stringify({ type: 'subscribe', topic: 'tickers' }))
+        if (options.topGainers) {
+          ws.send(JSON.stringify({ type: 'subscribe', topic: 'gainers-upbit' }))
+        }
       }
 
-      ws.onmessage = async (event) => {
+      ws.onmessage = (event) => {
         try {
-          // 업비트 웹소켓은 바이너리 데이터를 전송하므로 Blob을 텍스트로 변환
-          let data: UpbitTicker
-          
-          if (event.data instanceof Blob) {
-            const text = await event.data.text()
-            data = JSON.parse(text)
-          } else {
-            data = JSON.parse(event.data)
-          }
-          
-          if (data.type === 'ticker') {
-            const symbol = data.code.replace('KRW-', '')
-            const marketData = marketInfoRef.current.get(data.code)
-            
-            if (isDebug) console.log('Processing ticker for', data.code, 'marketData:', marketData)
-            
-            const cryptoInfo: CryptoData = {
-              symbol: symbol,
-              name: getCoinName(symbol),
-              koreanName: marketData?.koreanName || symbol,
-              englishName: marketData?.englishName || symbol,
-              price: data.trade_price,
-              change24h: data.signed_change_price,
-              changePercent24h: data.signed_change_rate * 100,
-              volume: data.acc_trade_price_24h, // 거래대금 (원)
-              high24h: data.high_price,
-              low24h: data.low_price,
-              high52w: data.highest_52_week_price,
-              low52w: data.lowest_52_week_price
+          const data = JSON.parse(event.data)
+          if (data.type === 'ticker_snapshot') {
+            seqRef.current = data.seq
+            applySnapshot(data.tickers)
+          } else if (data.type === 'ticker_delta') {
+            // 스냅샷 이전 프레임은 무시
+            if (seqRef.current === null || data.seq <= seqRef.current) return
+            if (data.seq !== seqRef.current + 1) {
+              // 중간 프레임이 빠졌으면 스냅샷을 다시 받음
+              if (isDebug) console.log('시세 seq 누락:', seqRef.current, '→', data.seq)
+              seqRef.current = null
+              ws.send(JSON.stringify({ type: 'resync', topic: 'tickers' }))
+              return
             }
-
-            setCryptoData(prev => {
-              const existing = prev.find(item => item.symbol === cryptoInfo.symbol)
-              if (existing) {
-                return prev.map(item => 
-                  item.symbol === cryptoInfo.symbol ? cryptoInfo : item
-                )
-              } else {
-                return [...prev, cryptoInfo].sort((a, b) => b.changePercent24h - a.changePercent24h)
-              }
-            })
-            
-            setLoading(false)
+            seqRef.current = data.seq
+            applyDelta(data.tickers)
+          } else if (data.type === 'top_gainers') {
+            setTopGainers(data.gainers.map((gainer: { symbol: string }) => gainer.symbol))
+          } else if (data.type === 'ping') {
+            ws.send(JSON.stringify({ type: 'pong' }))
           }
         } catch (err) {
           console.error('웹소켓 데이터 파싱 오류:', err)
@@ -207,7 +185,7 @@ export function useUpbitWebSocket() {
       }
 
       ws.onclose = () => {
-        if (isDebug) console.log('업비트 웹소켓 연결 종료')
+        if (isDebug) console.log('시세 웹소켓 연결 종료')
         // 3초 후 재연결 시도
         reconnectTimeoutRef.current = setTimeout(() => {
           connectWebSocket()
@@ -215,7 +193,7 @@ export function useUpbitWebSocket() {
       }
 
       ws.onerror = (error) => {
-        console.error('업비트 웹소켓 오류:', error)
+        console.error('시세 웹소켓 오류:', error)
         setError('웹소켓 연결 오류가 발생했습니다.')
       }
 
@@ -228,6 +206,8 @@ export function useUpbitWebSocket() {
 
 
   useEffect(() => {
+    fetchSnapshot()
+    if (options.topGainers) fetchTopGainers()
     connectWebSocket()
 
     return () => {
@@ -235,12 +215,13 @@ export function useUpbitWebSocket() {
         clearTimeout(reconnectTimeoutRef.current)
       }
       if (wsRef.current) {
+        wsRef.current.onclose = null
         wsRef.current.close()
       }
     }
   }, [])
 
-  return { cryptoData, loading, error, markets, marketInfo }
+  return { cryptoData, loading, error, markets, marketInfo, topGainers }
 }
 
 // 코인 이름 매핑 함수